@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+'''
+Makespan of an oversubscribed local workload with and without admission
+control, e.g.
+
+    python benchmarks/admission.py 64 200
+
+runs 64 jobs, each touching 200 MB and burning CPU, with the fork executor.
+`unlimited` launches everything at once as plato 0.1.4 did, `admitted` keeps
+jobs submitted until their core (and memory) is free.
+
+Admission pays off once jobs oversubscribe memory and the machine swaps.
+Without swap, `unlimited` jobs over physical memory are killed by the OOM
+killer instead, so pick a total below it on such machines.
+'''
+import os
+import sys
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_PATH)
+
+JOB_SCRIPT = '''
+import sys
+data = bytearray(int(sys.argv[1]) * 1024 * 1024)
+for rounds in xrange(20):
+    for offset in xrange(0, len(data), 4096):
+        data[offset] = rounds
+'''
+
+
+def create_scheduler(state_path, cores, memory):
+    from ConfigParser import ConfigParser
+    from plato.schedule import Scheduler
+    config = ConfigParser()
+    config.add_section('scheduler')
+    config.set('scheduler', 'isinteractive', '1')
+    config.set('scheduler', 'reports_path',
+               os.path.join(state_path, 'reports'))
+    config.set('scheduler', 'attachments_path',
+               os.path.join(state_path, 'attachments'))
+    config.add_section('local')
+    config.set('local', 'pidfiles_path', os.path.join(state_path, 'pidfiles'))
+    config.set('local', 'cores', str(cores))
+    config.set('local', 'memory', str(memory))
+    for folder in ('reports', 'attachments', 'pidfiles'):
+        os.mkdir(os.path.join(state_path, folder))
+    return Scheduler.create('LOCAL', state_path, config)
+
+
+def measure(cores, memory, count, megabytes):
+    state_path = tempfile.mkdtemp()
+    try:
+        script_path = os.path.join(state_path, 'job.py')
+        with open(script_path, 'w') as script:
+            script.write(JOB_SCRIPT)
+        scheduler = create_scheduler(state_path, cores, memory)
+        command = '%s %s %d' % (sys.executable, script_path, megabytes)
+        started_at = time.time()
+        scheduler.submit_many([command] * count,
+                              resources={'memory': megabytes})
+        done = 0
+        while done < count:
+            scheduler.complete_finished_jobs()
+            scheduler.submit_jobs()
+            scheduler.runner.wait_events(1)
+            done = len(scheduler.monitor.load_jobs(['done', 'failed']))
+        return time.time() - started_at
+    finally:
+        shutil.rmtree(state_path)
+
+
+def main(count, megabytes):
+    print '%-10s %8s %8s %12s %12s' % ('mode', 'jobs', 'MB/job', 'total (s)',
+                                       'jobs/sec')
+    unlimited = count * megabytes * 1000
+    # Zero memory is physical memory of the machine.
+    for mode, cores, memory in (('unlimited', unlimited, unlimited),
+                                ('admitted', multiprocessing.cpu_count(), 0)):
+        elapsed = measure(cores, memory, count, megabytes)
+        print '%-10s %8d %8d %12.2f %12.2f' % (mode, count, megabytes,
+                                               elapsed, count / elapsed)
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args or [64, 200]))
@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+'''
+Time spent importing modules, reported like `python -X importtime` (which
+Python 2 lacks), e.g.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget 100 'import plato.application'
+
+runs the statement (by default, loading bin/plato as the command line does
+before parsing arguments) in a fresh interpreter and prints self and
+cumulative microseconds of every module imported. With a budget (ms) it
+exits with 1 if the whole statement took longer.
+'''
+import os
+import sys
+import time
+import subprocess
+import __builtin__
+
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_PATH = os.path.join(ROOT_PATH, 'src')
+CLI_STATEMENT = "import imp; imp.load_source('plato_cli', %r)" % \
+    os.path.join(ROOT_PATH, 'bin', 'plato')
+
+
+class ImportTimer(object):
+
+    def __init__(self):
+        self.original_import = __builtin__.__import__
+        # Stack of [name, started at, time spent in nested imports]
+        self.stack = list()
+        self.lines = list()
+
+    def __call__(self, name, *args, **kwargs):
+        known_modules = len(sys.modules)
+        self.stack.append([name, time.time(), 0.0])
+        try:
+            return self.original_import(name, *args, **kwargs)
+        finally:
+            name, started_at, nested = self.stack.pop()
+            elapsed = time.time() - started_at
+            if self.stack:
+                self.stack[-1][2] += elapsed
+            if len(sys.modules) > known_modules:
+                # Not loaded before, report it.
+                self.lines.append((len(self.stack), name, elapsed - nested,
+                                   elapsed))
+
+    def report(self, output):
+        output.write('import time: self [us] | cumulative | imported '
+                     'package\n')
+        for depth, name, self_time, cumulative in self.lines:
+            output.write('import time: %9d | %10d | %s%s\n' % (
+                self_time * 1e6, cumulative * 1e6, '  ' * depth, name))
+
+
+def measure(statement):
+    sys.path.insert(0, SRC_PATH)
+    timer = ImportTimer()
+    __builtin__.__import__ = timer
+    started_at = time.time()
+    try:
+        exec statement in dict(__name__='__measured__')
+    finally:
+        __builtin__.__import__ = timer.original_import
+    elapsed = time.time() - started_at
+    timer.report(sys.stderr)
+    sys.stderr.write('%s: %.1f ms, %d modules loaded\n' % (
+        statement, elapsed * 1e3, len(sys.modules)))
+    return elapsed
+
+
+def main(args):
+    budget = None
+    if args[:1] == ['--budget']:
+        budget = float(args[1])
+        args = args[2:]
+    statement = args[0] if args else CLI_STATEMENT
+    # Fresh interpreter, nothing is imported yet.
+    process = subprocess.Popen([sys.executable, __file__, '--measure',
+                                statement], stdout=subprocess.PIPE)
+    elapsed = float(process.communicate()[0])
+    if process.returncode:
+        return process.returncode
+    if budget is not None and elapsed * 1e3 > budget:
+        sys.stderr.write('Over the budget of %.1f ms\n' % budget)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--measure']:
+        print measure(sys.argv[2])
+    else:
+        sys.exit(main(sys.argv[1:]))
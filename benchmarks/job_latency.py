@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+'''
+End-to-end latency of sub-second jobs run by the local scheduler, e.g.
+
+    python benchmarks/job_latency.py 50
+
+Latency is the time from submission until the job is found done, jobs are
+completed by events of the runner as soon as their processes exit.
+'''
+import os
+import sys
+import time
+import shutil
+import tempfile
+from ConfigParser import ConfigParser
+
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_PATH)
+
+
+def create_scheduler(state_path, executor):
+    from plato.schedule import Scheduler
+    config = ConfigParser()
+    config.add_section('scheduler')
+    config.set('scheduler', 'isinteractive', '1')
+    config.set('scheduler', 'reports_path',
+               os.path.join(state_path, 'reports'))
+    config.set('scheduler', 'attachments_path',
+               os.path.join(state_path, 'attachments'))
+    config.add_section('local')
+    config.set('local', 'pidfiles_path', os.path.join(state_path, 'pidfiles'))
+    config.set('local', 'executor', executor)
+    for folder in ('reports', 'attachments', 'pidfiles'):
+        os.mkdir(os.path.join(state_path, folder))
+    return Scheduler.create('LOCAL', state_path, config)
+
+
+def measure(executor, count):
+    state_path = tempfile.mkdtemp()
+    try:
+        scheduler = create_scheduler(state_path, executor)
+        started_at = time.time()
+        scheduler.submit_many(['true'] * count)
+        scheduler.submit_jobs()
+        latencies = list()
+        while len(latencies) < count:
+            scheduler.runner.wait_events(1)
+            done_at = time.time()
+            scheduler.complete_finished_jobs()
+            for job in scheduler.monitor.load_jobs(['done', 'failed']):
+                latencies.append(done_at - job.info['submitted_at'])
+                scheduler.monitor.detach_job(job)
+        elapsed = time.time() - started_at
+        return elapsed, sorted(latencies)
+    finally:
+        shutil.rmtree(state_path)
+
+
+def main(count):
+    print '%-10s %8s %12s %12s %12s' % ('executor', 'jobs', 'total (s)',
+                                        'median (ms)', 'max (ms)')
+    for executor in ('fork', 'pool'):
+        elapsed, latencies = measure(executor, count)
+        print '%-10s %8d %12.2f %12.1f %12.1f' % (
+            executor, count, elapsed, latencies[len(latencies) // 2] * 1000,
+            latencies[-1] * 1000)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
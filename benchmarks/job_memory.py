@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+'''
+Memory benchmark of job representations held in a listing, e.g.
+
+    python benchmarks/job_memory.py 100000 1000000
+
+Each representation is measured in a fresh interpreter by the growth of the
+resident set size while holding N jobs restored from typical job records:
+
+    legacy   - dict-backed Job and JobResult as in plato 0.1.4
+    slotted  - Job and JobResult of plato.schedule, same records
+    stored   - Job of plato.schedule restored from current records, info is
+               kept as JSON text and the result is left in the blob store
+
+legacy and slotted hold the same payload, a decoded info and a 20 lines
+result, so they differ by the representation only.
+'''
+import os
+import sys
+import json
+import subprocess
+
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_PATH)
+
+
+class LegacyJobResult(object):
+    '''Dict-backed JobResult as in plato 0.1.4'''
+
+    def __init__(self, has_failed, output='', error='', details={}):
+        self.has_failed = has_failed
+        self.output = output
+        self.error = error
+        self.details = details
+
+
+class LegacyJob(object):
+    '''Dict-backed Job as in plato 0.1.4'''
+
+    def __init__(self, id, batch_name, status='submit', is_attached=True,
+                 info={}, result=None, file_attachments={}):
+        self.id = id
+        self.status = status
+        self.is_attached = is_attached
+        self.batch_name = batch_name
+        self.info = info
+        self.result = result
+        self.file_attachments = file_attachments
+
+
+def make_info(num):
+    return {
+        'command': 'process_sample --input /data/sample_%d.csv' % num,
+        'queue': 'default',
+        'submitted_at': 1380000000.0 + num,
+        'pending_since': 1380000010.0 + num,
+        'local_id': str(10000 + num),
+        'local_queue': 'default',
+        'local_pidfile_path': '/home/user/.plato/pidfiles/localjob_%d.pid' % num,
+    }
+
+
+def make_record(num, representation):
+    description = {
+        'id': num,
+        'status': 'done',
+        'batch_name': 'process_sample',
+        'file_attachments': {},
+    }
+    if representation != 'stored':
+        description['info'] = make_info(num)
+        description['result'] = json.dumps({
+            'has_failed': False, 'output': ['line %d' % line
+                                            for line in range(20)],
+            'error': '', 'details': {'header': ['Submitting job']}})
+    else:
+        description['info_json'] = json.dumps(make_info(num), sort_keys=True)
+        description['result_ref'] = 'LOCAL_%d.result' % num
+    return json.dumps(description)
+
+
+def get_rss_kb():
+    for line in open('/proc/self/status'):
+        if line.startswith('VmRSS:'):
+            return int(line.split()[1])
+
+
+def load_legacy(record):
+    description = json.loads(record)
+    result = json.loads(description['result'])
+    result = LegacyJobResult(result['has_failed'], result['output'],
+                             result['error'], result['details'])
+    return LegacyJob(description['id'], description['batch_name'],
+                     description['status'], info=description['info'],
+                     result=result,
+                     file_attachments=description['file_attachments'])
+
+
+def measure(representation, count):
+    from plato.schedule import Monitor
+    monitor = Monitor('/nonexistent', 'LOCAL')
+    if representation == 'legacy':
+        load = load_legacy
+    else:
+        load = lambda record: monitor.restore_job(json.loads(record))
+    # Records are generated lazily, so only the held jobs are measured.
+    rss_before = get_rss_kb()
+    jobs = [load(make_record(num, representation)) for num in xrange(count)]
+    rss_after = get_rss_kb()
+    assert len(jobs) == count
+    return rss_after - rss_before
+
+
+def main(counts):
+    print '%-10s %10s %12s %14s' % ('jobs', 'layout', 'RSS (MB)',
+                                    'bytes per job')
+    for count in counts:
+        for representation in ('legacy', 'slotted', 'stored'):
+            output = subprocess.check_output([
+                sys.executable, __file__, '--measure', representation,
+                str(count)])
+            rss_kb = int(output.strip())
+            print '%-10d %10s %12.1f %14d' % (
+                count, representation, rss_kb / 1024.0,
+                rss_kb * 1024 / count)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--measure':
+        print measure(sys.argv[2], int(sys.argv[3]))
+    else:
+        main([int(count) for count in sys.argv[1:]] or [100000, 1000000])
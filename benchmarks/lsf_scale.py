@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+'''
+LsfScheduler against the fake LSF (plato.schedule.fakelsf), e.g.
+
+    python benchmarks/lsf_scale.py 1000 8
+
+submits the jobs as one job array or as single jobs, runs scheduler steps
+until all are complete and reports time spent in submission and in steps.
+Every single job costs a bsub process, as it does on a real cluster. Single
+jobs are also run with the given number of step threads.
+'''
+import os
+import sys
+import time
+import shutil
+import tempfile
+from ConfigParser import ConfigParser
+
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_PATH)
+
+
+def create_scheduler(state_path, threads):
+    from plato.schedule import Scheduler
+    from plato.schedule.fakelsf import setup
+    bin_path = os.path.join(state_path, 'fakelsf')
+    home = setup(bin_path, os.path.join(state_path, 'fakelsf_home'))
+    with open(os.path.join(home, 'fakelsf.conf'), 'w') as conf:
+        conf.write('[DEFAULT]\nrun_time = 0\n')
+    config = ConfigParser()
+    config.add_section('scheduler')
+    config.set('scheduler', 'isinteractive', '1')
+    config.set('scheduler', 'poll_max_interval', '1')
+    config.set('scheduler', 'step_threads', str(threads))
+    config.set('scheduler', 'reports_path', os.path.join(state_path,
+                                                         'reports'))
+    config.set('scheduler', 'attachments_path',
+               os.path.join(state_path, 'attachments'))
+    config.add_section('lsf')
+    config.set('lsf', 'bin_path', bin_path)
+    for folder in ('reports', 'attachments'):
+        os.mkdir(os.path.join(state_path, folder))
+    return Scheduler.create('LSF', state_path, config)
+
+
+def measure(count, as_array, threads):
+    state_path = tempfile.mkdtemp()
+    try:
+        scheduler = create_scheduler(state_path, threads)
+        if as_array:
+            scheduler.submit_array('echo {index}', 1, count)
+            expected = 1
+        else:
+            scheduler.submit_many(['echo %d' % num for num in range(count)])
+            expected = count
+        started_at = time.time()
+        scheduler.submit_jobs()
+        submitted_at = time.time()
+        steps = 0
+        while len(scheduler.monitor.load_jobs(['done', 'failed'])) \
+                < expected:
+            scheduler.submit_jobs()
+            scheduler.process_jobs()
+            steps += 1
+        scheduler.step_pool.close()
+        return submitted_at - started_at, time.time() - submitted_at, steps
+    finally:
+        shutil.rmtree(state_path)
+
+
+def main(count, threads):
+    print '%-8s %8s %8s %14s %14s %8s' % ('mode', 'jobs', 'threads',
+                                          'submit (s)', 'complete (s)',
+                                          'steps')
+    for as_array, num_threads in ((True, 1), (False, 1), (False, threads)):
+        submit_time, complete_time, steps = measure(count, as_array,
+                                                    num_threads)
+        print '%-8s %8d %8d %14.2f %14.2f %8d' % (
+            'array' if as_array else 'single', count, num_threads,
+            submit_time, complete_time, steps)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 8)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+'''
+Peak memory of the local job wrapper running a job with high-volume output,
+e.g.
+
+    python benchmarks/output_memory.py 64 256 1024
+
+for jobs writing 64, 256 and 1024 MB. Each wrapper runs in a fresh
+interpreter, `buffered` holds whole output in memory as plato 0.1.4 did,
+`streaming` captures it into files next to the report.
+'''
+import os
+import sys
+import shutil
+import resource
+import tempfile
+import subprocess
+from subprocess import PIPE, Popen
+
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_PATH)
+
+
+def measure(wrapper, megabytes):
+    from plato.schedule.workers import run_job
+    command = 'head -c %d /dev/zero' % (megabytes * 1024 * 1024)
+    folder = tempfile.mkdtemp()
+    try:
+        report_filename = os.path.join(folder, 'plato_job_report.1')
+        if wrapper == 'buffered':
+            process_output, process_error = Popen(
+                command.split(' '), stdout=PIPE, stderr=PIPE).communicate()
+            with open(report_filename, 'w') as report:
+                report.write(process_output)
+                report.write(process_error)
+        else:
+            run_job(command, report_filename)
+    finally:
+        shutil.rmtree(folder)
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main(sizes):
+    print '%-12s %12s %14s' % ('output (MB)', 'wrapper', 'peak RSS (MB)')
+    for megabytes in sizes:
+        for wrapper in ('buffered', 'streaming'):
+            output = subprocess.check_output([
+                sys.executable, __file__, '--measure', wrapper,
+                str(megabytes)])
+            print '%-12d %12s %14.1f' % (megabytes, wrapper,
+                                         int(output.strip()) / 1024.0)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--measure':
+        print measure(sys.argv[2], int(sys.argv[3]))
+    else:
+        main([int(size) for size in sys.argv[1:]] or [64, 256, 1024])
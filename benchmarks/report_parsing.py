@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+'''
+Time and peak memory of parsing a report with large output, e.g.
+
+    python benchmarks/report_parsing.py 200
+
+writes a report with 200 MB of output and parses it in a fresh process, once
+by reading the whole file into lines (as the runners did before) and once
+by the streaming ReportParser.
+'''
+import os
+import sys
+import time
+import resource
+import tempfile
+import subprocess
+
+
+SRC_PATH = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'src')
+sys.path.insert(0, SRC_PATH)
+
+HEAD = '''Your job looked like:
+cat huge.txt
+Successfully completed.
+Resource usage summary:
+    exit_code   : 0
+The output (if any) follows:
+'''
+
+
+def write_report(path, megabytes):
+    line = 'x' * 99 + '\n'
+    with open(path, 'w') as report:
+        report.write(HEAD)
+        chunk = line * (1024 * 1024 // len(line))
+        for index in xrange(megabytes):
+            report.write(chunk)
+
+
+def parse(method, path):
+    from plato.schedule import JobResult
+    from plato.schedule.reports import ReportParser, NUM_SECTION_LINES
+    from plato.schedule.usage import parse_local_usage
+    started_at = time.time()
+    if method == 'split':
+        with open(path) as report:
+            lines = report.read().split('\n')
+        output = lines[lines.index('The output (if any) follows:') + 1:]
+        output = output[:NUM_SECTION_LINES]
+    else:
+        result = JobResult(has_failed=True)
+        ReportParser(parse_local_usage, tail_lines=10).parse(path, result)
+    elapsed = time.time() - started_at
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print '%-10s %12.3f %12d' % (method, elapsed, max_rss // 1024)
+
+
+def main(megabytes):
+    path = tempfile.mktemp()
+    try:
+        write_report(path, megabytes)
+        print '%-10s %12s %12s' % ('method', 'time (s)', 'max rss (MB)')
+        for method in ('split', 'stream'):
+            subprocess.check_call([sys.executable, __file__, '--parse',
+                                   method, path])
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--parse']:
+        parse(sys.argv[2], sys.argv[3])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -1,8 +1,8 @@
 import ConfigParser
-from plato.schedule import Scheduler
+from plato.rpc import RpcServer, RpcClient, SocketPathTooLong
 import os
-import time
 import logging
+from time import time
 
 
 logger = logging.getLogger('plato.application')
@@ -30,8 +30,17 @@ class PlatoApp(object):
         self.config = ConfigParser.ConfigParser(
             defaults=self.get_config_vars(schedulername=schedulername))
         self.init_config()        
-        self.scheduler = Scheduler.create(
-            self.schedulername, self.state_path, self.config)
+        self.__scheduler = None
+
+    @property
+    def scheduler(self):
+        '''Created on first use, a client of the daemon needs none.'''
+        if self.__scheduler is None:
+            # Scheduler modules are imported only by those who need them.
+            from plato.schedule import Scheduler
+            self.__scheduler = Scheduler.create(
+                self.schedulername, self.state_path, self.config)
+        return self.__scheduler
     
     @property
     def schedulername(self):
@@ -61,7 +70,13 @@ class PlatoApp(object):
         self.config.set('daemon', 'pidfile_path', 
                         '%(statepath)s' + self.name + '.pid')
         self.config.set('daemon', 'pidfile_timeout', '5')
-        self.config.set('daemon', 'sleepping_pause', '10')
+        # Unix socket the daemon serves requests of the command line on
+        self.config.set('daemon', 'socket_path', '%(statepath)s/plato.sock')
+        # Longest sleep between steps, submissions, local jobs finishing
+        # and jobs due for a poll wake the daemon earlier
+        self.config.set('daemon', 'sleepping_pause', '60')
+        # Shortest sleep before polling jobs again
+        self.config.set('daemon', 'min_pause', '1')
         # Init/set scheduler options.
         self.config.add_section('scheduler')
         self.config.set('scheduler', 'isinteractive', 
@@ -70,10 +85,45 @@ class PlatoApp(object):
                         '%(statepath)s/attachments')        
         self.config.set('scheduler', 'reports_path', 
                         '%(statepath)s/reports')
+        # Persistence backend of the monitor: files, sqlite or journal
+        self.config.set('scheduler', 'monitor', 'files')
+        self.config.set('scheduler', 'journal_compact_records', '10000')
+        # Adaptive polling of pending/running jobs (seconds, fraction of age)
+        self.config.set('scheduler', 'poll_min_interval', '0')
+        self.config.set('scheduler', 'poll_max_interval', '300')
+        self.config.set('scheduler', 'poll_backoff', '0.1')
+        # Number of job ids reserved per disk access
+        self.config.set('scheduler', 'id_block_size', '1')
+        # Hash-sharded job files, 0 levels keep the flat layout
+        self.config.set('scheduler', 'shard_levels', '0')
+        self.config.set('scheduler', 'shard_width', '2')
+        # Last lines of job output read from the end of long reports, in
+        # addition to the first lines kept
+        self.config.set('scheduler', 'report_tail_lines', '0')
+        # Threads executing and checking jobs at once, for runners which
+        # allow it (LSF), 1 does one job after another
+        self.config.set('scheduler', 'step_threads', '1')
         # local
         self.config.add_section('local')
         self.config.set('local', 'pidfiles_path', 
                         '%(statepath)s/pidfiles')
+        # Run jobs by forking a daemon per job (fork) or by a pool of
+        # long-lived workers (pool) of pool_size, 0 is number of cores
+        self.config.set('local', 'executor', 'fork')
+        self.config.set('local', 'pool_size', '0')
+        # Bytes of job output and error kept (head and tail) in a report,
+        # 0 keeps all of it
+        self.config.set('local', 'output_cap', '0')
+        # Capacity shared by jobs, by their 'cores' and 'memory' (MB) info,
+        # 0 is number of cores and physical memory of the machine
+        self.config.set('local', 'cores', '0')
+        self.config.set('local', 'memory', '0')
+        # lsf
+        self.config.add_section('lsf')
+        # Folder of bsub, bjobs and bkill, empty looks them up on PATH
+        self.config.set('lsf', 'bin_path', '')
+        # Seconds a job list is shared by plato processes, 0 disables it
+        self.config.set('lsf', 'query_cache_ttl', '5')
     
     def load_config_file(self, config_name, config_dir):
         '''
@@ -138,15 +188,51 @@ class PlatoApp(object):
         '''Part of DaemonRunner protocol'''
         return self.config.get('daemon', 'pidfile_timeout')
 
+    @property
+    def socket_path(self):
+        return os.path.expanduser(self.config.get('daemon', 'socket_path'))
+
+    def get_client(self):
+        return RpcClient(self.socket_path)
+
     def step(self):
+        # Finished jobs first, to free their slots for submitted ones.
+        self.scheduler.complete_finished_jobs()
         self.scheduler.submit_jobs()
         self.scheduler.process_jobs()
         self.scheduler.runner.forget_job_list()
 
+    def get_pause(self, now):
+        '''Seconds until the next job is due for a poll, within bounds'''
+        pause = self.config.getfloat('daemon', 'sleepping_pause')
+        due_at = self.scheduler.polling.next_due_at()
+        if due_at is not None:
+            min_pause = self.config.getfloat('daemon', 'min_pause')
+            pause = max(min_pause, min(pause, due_at - now))
+        return pause
+
     def run(self):
-        while True:
-            self.step()
-            # Sleep x seconds.
-            sleepping_pause = self.config.getint('daemon', 'sleepping_pause')
-            logger.info('Sleeping for %d (sec)..' % sleepping_pause)
-            time.sleep(sleepping_pause)
+        from plato import commands
+        doorbell = self.scheduler.doorbell
+        doorbell.open()
+        server = RpcServer(self.socket_path,
+                           commands.get_methods(self.scheduler))
+        readers = [doorbell, server]
+        try:
+            server.open()
+        except SocketPathTooLong as error:
+            # The command line works by itself then, as without a daemon.
+            logger.error('Not serving requests: %s', error)
+            readers.remove(server)
+        try:
+            while True:
+                self.step()
+                pause = self.get_pause(time())
+                logger.info('Sleeping for %.1f (sec) or until a job is '
+                            'submitted or finishes..' % pause)
+                self.scheduler.runner.wait_events(pause, readers)
+                if server in readers:
+                    server.serve_ready()
+                doorbell.drain()
+        finally:
+            server.close()
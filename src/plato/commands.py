@@ -0,0 +1,84 @@
+'''
+Work behind the subcommands of bin/plato, done on a scheduler either by
+the daemon on request of the command line (see plato.rpc) or by the
+command line itself if no daemon is running. Arguments and return values
+are JSON serializable.
+'''
+from plato.schedule import status_set
+from plato.schedule.cancel import JobSelector
+from plato.schedule.arrays import parse_range
+from plato.schedule.depends import parse_parents
+
+
+def submit(scheduler, commands, batch_name=None, queue='default',
+           resources=None, array=None, after_ok=None, after_any=None):
+    '''
+    Submit a job per command, or a job array of the single command over
+    the index range like array="1-100". Dependencies are given as on the
+    command line, e.g. after_ok="12,prepare". Returns {"count": jobs
+    submitted}, with "id" and number of "tasks" of the job array.
+    '''
+    resources = dict(resources or ())
+    if after_ok:
+        resources['after_ok'] = parse_parents(after_ok)
+    if after_any:
+        resources['after_any'] = parse_parents(after_any)
+    if array is not None:
+        first, last = parse_range(array)
+        job = scheduler.submit_array(commands[0], first, last,
+                                     batch_name=batch_name, queue=queue,
+                                     resources=resources)
+        return {'count': 1, 'id': job.id, 'tasks': last - first + 1}
+    count = scheduler.submit_many(commands, batch_name=batch_name,
+                                  queue=queue, resources=resources)
+    return {'count': count}
+
+
+def list_jobs(scheduler):
+    '''Jobs of plato as listed by the runner (e.g. LSF)'''
+    return scheduler.runner.list_jobs('*')
+
+
+def status(scheduler, ids=None):
+    '''
+    Number of jobs by status, and status of every job in the id range (like
+    "10-20") if one is given, as {"counts": {...}, "jobs": [[id, status,
+    batch name], ...]}
+    '''
+    jobs = scheduler.monitor.load_jobs()
+    counts = dict((job_status, 0) for job_status in status_set)
+    for job in jobs:
+        counts[job.status] = counts.get(job.status, 0) + 1
+    selected = list()
+    if ids:
+        first_id, last_id = parse_range(ids)
+        selected = sorted([job.id, job.status, job.batch_name]
+                          for job in jobs
+                          if first_id <= job.id <= last_id)
+    return {'counts': counts, 'jobs': selected}
+
+
+def cancel(scheduler, ids=None, batch_name=None, statuses=None):
+    '''Cancel jobs selected like JobSelector.parse(), returns their ids.'''
+    selector = JobSelector.parse(ids, batch_name, statuses)
+    return sorted(job.id for job in scheduler.cancel_jobs(selector))
+
+
+def bind(function, scheduler):
+    def method(**params):
+        return function(scheduler, **params)
+    return method
+
+
+def get_methods(scheduler):
+    '''Commands bound to the scheduler, by their names'''
+    return dict((name, bind(function, scheduler))
+                for name, function in METHODS.iteritems())
+
+
+METHODS = {
+    'submit': submit,
+    'list': list_jobs,
+    'status': status,
+    'cancel': cancel,
+}
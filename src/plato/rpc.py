@@ -0,0 +1,186 @@
+'''
+Requests of the command line to a running daemon, over a Unix domain
+socket in the state path. A request and its response are single JSON
+lines:
+
+    {"method": "submit", "params": {"commands": ["echo 1"]}}
+    {"result": {"count": 1}}     or     {"error": "..."}
+
+The daemon serves requests between its steps (see PlatoApp.run()), so its
+in-memory state (e.g. tracked dependencies) sees every change made by the
+command line. Without a daemon the client raises DaemonNotRunning and the
+command line does the same work by itself, see plato.commands.
+'''
+import os
+import json
+import errno
+import socket
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+NEW_LINE = '\n'
+# Seconds the daemon waits for a client to send its request
+CLIENT_TIMEOUT = 5.0
+BACKLOG = 128
+# Longest path of a Unix socket, sun_path less its terminating zero (Linux)
+MAX_PATH_LENGTH = 107
+
+
+class RpcError(Exception):
+    '''Request has failed in the daemon'''
+
+
+class DaemonNotRunning(RpcError):
+    '''Nobody listens on the socket'''
+
+
+class SocketPathTooLong(DaemonNotRunning):
+    '''Nobody can listen on the socket'''
+
+
+def check_path(path):
+    '''Raise SocketPathTooLong if no socket can be bound to the path.'''
+    if len(path) > MAX_PATH_LENGTH:
+        raise SocketPathTooLong(
+            'Socket path %s is longer than %d characters allowed for Unix '
+            'sockets, set a shorter `socket_path` in the [daemon] section '
+            'of the config.' % (path, MAX_PATH_LENGTH))
+
+
+class RpcServer(object):
+
+    def __init__(self, path, methods, timeout=CLIENT_TIMEOUT):
+        self.path = path
+        # Method name -> function taking params as keyword arguments
+        self.methods = methods
+        self.timeout = timeout
+        self.socket = None
+
+    def open(self):
+        if self.socket is not None:
+            return
+        check_path(self.path)
+        if os.path.exists(self.path):
+            try:
+                RpcClient(self.path).connect().close()
+            except DaemonNotRunning:
+                # Left by a daemon which did not exit cleanly.
+                os.remove(self.path)
+            else:
+                raise RpcError('Another daemon listens on %s' % self.path)
+        server_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server_socket.bind(self.path)
+        os.chmod(self.path, 0600)
+        server_socket.listen(BACKLOG)
+        server_socket.setblocking(0)
+        self.socket = server_socket
+        logger.info('Serving requests on %s', self.path)
+
+    def fileno(self):
+        return self.socket.fileno()
+
+    def serve_ready(self):
+        '''Serve all clients waiting to be accepted, returns their number.'''
+        count = 0
+        while True:
+            try:
+                connection, address = self.socket.accept()
+            except socket.error as error:
+                if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            try:
+                connection.settimeout(self.timeout)
+                self.serve(connection)
+            except (socket.error, socket.timeout) as error:
+                logger.warn('Failed to serve a request: %s', error)
+            finally:
+                connection.close()
+            count += 1
+        return count
+
+    def serve(self, connection):
+        stream = connection.makefile('rb')
+        try:
+            line = stream.readline()
+        finally:
+            stream.close()
+        if not line:
+            return
+        response = self.handle(line)
+        connection.sendall(json.dumps(response) + NEW_LINE)
+
+    def handle(self, line):
+        try:
+            request = json.loads(line)
+            method = self.methods[request['method']]
+        except (ValueError, KeyError, TypeError):
+            return {'error': 'Invalid request: %s' % line.strip()[:100]}
+        params = dict((str(name), value) for name, value
+                      in request.get('params', {}).iteritems())
+        try:
+            return {'result': method(**params)}
+        except ValueError as error:
+            # Invalid arguments given by the user, e.g. a malformed range
+            logger.warn('Request %s has failed: %s', request['method'], error)
+            return {'error': '%s: %s' % (error.__class__.__name__, error)}
+        except Exception as error:
+            logger.exception('Request %s has failed', request['method'])
+            return {'error': '%s: %s' % (error.__class__.__name__, error)}
+
+    def close(self):
+        if self.socket is None:
+            return
+        self.socket.close()
+        self.socket = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class RpcClient(object):
+
+    def __init__(self, path, timeout=None):
+        self.path = path
+        self.timeout = timeout
+
+    def connect(self):
+        try:
+            check_path(self.path)
+        except SocketPathTooLong as error:
+            # Daemon could not listen either, work without it.
+            logger.warn(error)
+            raise
+        client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        client_socket.settimeout(self.timeout)
+        try:
+            client_socket.connect(self.path)
+        except socket.error as error:
+            client_socket.close()
+            if error.errno in (errno.ENOENT, errno.ECONNREFUSED):
+                raise DaemonNotRunning('No daemon listens on %s' % self.path)
+            raise
+        return client_socket
+
+    def call(self, method, **params):
+        client_socket = self.connect()
+        try:
+            client_socket.sendall(json.dumps(
+                {'method': method, 'params': params}) + NEW_LINE)
+            stream = client_socket.makefile('rb')
+            try:
+                line = stream.readline()
+            finally:
+                stream.close()
+        finally:
+            client_socket.close()
+        if not line:
+            raise RpcError('Daemon has closed the connection')
+        response = json.loads(line)
+        if 'error' in response:
+            raise RpcError(response['error'])
+        return response['result']
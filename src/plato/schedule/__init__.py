@@ -1,11 +1,23 @@
 import os
-from plato.shell.findutils import find_files, Match
+import re
+import fnmatch
+import copy
 import json
 import logging
-from time import time
-import json
+from time import time, sleep
+from select import select
 from ConfigParser import ConfigParser
 from importlib import import_module
+from plato.schedule.allocator import IdAllocator
+from plato.schedule.index import FolderIndex
+from plato.schedule.blobs import BlobStore
+from plato.schedule.polling import PollingSchedule
+from plato.schedule.sharding import ShardLayout
+from plato.schedule import arrays
+from plato.schedule.depends import DependencyTracker, has_dependencies
+from plato.schedule.cancel import KILLABLE, iter_chunks
+from plato.schedule.doorbell import Doorbell
+from plato.schedule.pipeline import StepPool
 
 
 logger = logging.getLogger(__name__)
@@ -25,14 +37,51 @@ status_set = [
     'run',
     'failed',
     'done', # success
+    'cancelled',
 ]
 
+# Pluggable persistence backends for Monitor, selected by the `monitor` option
+# of the [scheduler] config section. Default 'files' backend is provided by
+# the scheme module itself, e.g. LocalMonitor.
+monitor_backends = {
+    'sqlite': 'plato.schedule.sqlitedb.SqliteMonitor',
+    'journal': 'plato.schedule.journal.JournalMonitor',
+}
+
+# Number of jobs written at once by Scheduler.submit_many()
+SUBMIT_CHUNK_SIZE = 1000
+
+
+# Interned status and batch name strings shared by all jobs. The table is
+# cleared once it holds that many strings, so that a long-running daemon
+# does not keep every batch name it has ever seen.
+interned_strings = dict()
+MAX_INTERNED_STRINGS = 10000
+
+
+def intern_string(value):
+    '''Like intern(), but works for unicode strings decoded from JSON too.'''
+    if value is None:
+        return value
+    interned = interned_strings.get(value)
+    if interned is None:
+        if len(interned_strings) >= MAX_INTERNED_STRINGS:
+            # Jobs keep their strings, later ones just do not share them.
+            interned_strings.clear()
+        interned = interned_strings[value] = value
+    return interned
+
+
 class JobResult(object):
 
-    def __init__(self, has_failed, output='', error='', details={}):
+    __slots__ = ('has_failed', 'output', 'error', 'details')
+
+    def __init__(self, has_failed, output='', error='', details=None):
         self.has_failed = has_failed
         self.output = output
         self.error = error
+        if details is None:
+            details = dict()
         self.details = details
 
     @classmethod
@@ -49,23 +98,93 @@ class JobResult(object):
         )
 
     def as_json(self):
-        return json.dumps(self.__dict__)
+        return json.dumps(dict(
+            has_failed=self.has_failed,
+            output=self.output,
+            error=self.error,
+            details=self.details,
+        ))
 
 
 class Job(object):
+    '''
+    Compact job representation: slots instead of per-instance dict, interned
+    status and batch name, info kept as JSON text until first accessed and
+    result loaded from the monitor's blob store on first access.
+    '''
+
+    __slots__ = ('id', '__status', '__batch_name', 'is_attached', '__info',
+                 '__info_json', '__result', 'result_ref', 'result_loader',
+                 'file_attachments')
     
     def __init__(self, id, batch_name, status='submit', is_attached=True, 
-                 info={}, result=None, file_attachments={}):
+                 info=None, result=None, file_attachments=None,
+                 result_ref=None, result_loader=None, info_json=None):
         self.id = id
         self.status = status
         # Is attached to the monitor?
         self.is_attached = is_attached
         self.batch_name = batch_name
         # Scheduler specific info
-        self.info = info
+        self.__info = info
+        self.__info_json = info_json
+        if info is None and info_json is None:
+            self.__info = dict()
         # If we already know the result
         self.result = result
+        # Reference to the stored result, loaded on first access.
+        self.result_ref = result_ref
+        self.result_loader = result_loader
+        if file_attachments is None:
+            file_attachments = dict()
         self.file_attachments = file_attachments 
+
+    @property
+    def status(self):
+        return self.__status
+
+    @status.setter
+    def status(self, status):
+        self.__status = intern_string(status)
+
+    @property
+    def batch_name(self):
+        return self.__batch_name
+
+    @batch_name.setter
+    def batch_name(self, batch_name):
+        self.__batch_name = intern_string(batch_name)
+
+    @property
+    def info(self):
+        if self.__info is None:
+            self.__info = json.loads(self.__info_json)
+            self.__info_json = None
+        return self.__info
+
+    @info.setter
+    def info(self, info):
+        self.__info = info
+        self.__info_json = None
+
+    def get_info_json(self):
+        '''Serialized info, without decoding it if it was never accessed.'''
+        if self.__info is None:
+            return self.__info_json
+        return json.dumps(self.__info, sort_keys=True)
+
+    @property
+    def result(self):
+        if self.__result is None and self.result_ref is not None \
+                and self.result_loader is not None:
+            self.__result = self.result_loader(self.result_ref)
+        return self.__result
+
+    @result.setter
+    def result(self, result):
+        self.__result = result
+        # A new result has to be stored again.
+        self.result_ref = None
     
     def __repr__(self):
         return '[%d] <%s> batch: %s |%s|' % (
@@ -81,21 +200,39 @@ class Job(object):
 
 class Monitor(object):
 
-    def __init__(self, state_path, job_prefix, is_interactive=False):
+    def __init__(self, state_path, job_prefix, is_interactive=False,
+                 id_block_size=1):
         self.scheduler = None  # Set it after initialization
         self.state_path = state_path
         self.job_prefix = job_prefix
         self.is_interactive = is_interactive
+        # How many ids to reserve at once. Ids of a partially used block are
+        # lost when the process exits.
+        self.id_block_size = id_block_size
+        self.__id_block = iter([])
+        self.__id_allocator = None
+        # Resident index of parsed job files by status folder.
+        self.index = FolderIndex()
+        # Job results are kept out of line, see describe_job().
+        self.results = BlobStore(os.path.join(state_path, 'results'))
+        # Flat or hash-sharded status folders.
+        self.layout = ShardLayout()
+        self.job_file_pattern = re.compile(
+            fnmatch.translate(self.get_job_file()))
  
     @property
     def logger(self):
         return self.scheduler.logger
 
-    def init_db(self):
-        '''Init persistence database'''
+    def get_db_folders(self):
+        '''Folders under state path which must exist for the monitor'''
         folders = ['pidfiles', 'attachments', 'reports']
         folders.extend(status_set)
-        for folder in folders:
+        return folders
+
+    def init_db(self):
+        '''Init persistence database'''
+        for folder in self.get_db_folders():
             db_pathname = os.path.join(self.state_path, folder)
             if not os.path.exists(db_pathname):
                 if not self.is_interactive:
@@ -103,60 +240,127 @@ class Monitor(object):
                 logger.info('Creating missing db folder: %s' % db_pathname)
                 os.makedirs(db_pathname)
 
+    @property
+    def id_allocator(self):
+        if self.__id_allocator is None:
+            self.__id_allocator = IdAllocator(
+                os.path.join(self.state_path, 'last_id'))
+        return self.__id_allocator
+
+    def reserve_ids(self, count):
+        '''Reserve a block of `count` consecutive job ids.'''
+        first_id = self.id_allocator.reserve(count)
+        return xrange(first_id, first_id + count)
+
+    def next_id(self):
+        '''Hand out next id from memory, touch disk once per block.'''
+        try:
+            return next(self.__id_block)
+        except StopIteration:
+            self.__id_block = iter(self.reserve_ids(self.id_block_size))
+            return next(self.__id_block)
+
     def new_job(self, batch_name):
-        # Get last issued job id.
-        last_id = 0
-        last_id_filepath = os.path.join(self.state_path, 'last_id')
-        if os.path.exists(last_id_filepath):
-            last_id = int(file(last_id_filepath).read().strip())
-        # Increment id, save it.
-        new_id = last_id + 1
-        last_id_file = file(last_id_filepath, 'w+')
-        last_id_file.write(str(new_id))
-        last_id_file.close()
         # Create and return job template.
-        return Job(new_id, batch_name, is_attached=False)
+        return Job(self.next_id(), batch_name, is_attached=False)
 
     def get_job_file(self, id='*'):
         return '%s_%s.st' % (self.job_prefix, id)
+
+    def get_job_path(self, job):
+        '''Path of the job file, possibly left by another shard layout.'''
+        status_folder = os.path.join(self.state_path, job.status)
+        return self.layout.find_path(status_folder, job.id,
+                                     self.get_job_file(job.id))
+
+    def describe_job(self, job):
+        '''Pack job into a JSON serializable description'''
+        description = {
+            'id': job.id,
+            'status': job.status,
+            'batch_name': job.batch_name,
+            'info_json': job.get_info_json(),
+            'file_attachments':job.file_attachments, 
+        }
+        if job.result_ref is None and job.result is not None:
+            job.result_ref = self.store_result(job)
+        if job.result_ref is not None:
+            description['result_ref'] = job.result_ref
+        return description
+
+    def restore_job(self, description):
+        '''Inverse of describe_job()'''
+        result = description.get('result', None)        
+        if result is not None:
+            # Result embedded by older plato versions.
+            result = JobResult.from_json(result)                                 
+        # Info is decoded lazily, older records keep it as a dict.
+        job = Job(description['id'], description['batch_name'],
+                  description['status'], info=description.get('info'),
+                  info_json=description.get('info_json'), result=result,
+                  file_attachments=description['file_attachments'])
+        if 'result_ref' in description:
+            job.result_ref = description['result_ref']
+            job.result_loader = self.load_result
+        return job
+
+    def store_result(self, job):
+        '''Save result into compressed blob, return reference to it.'''
+        key = '%s_%s.result' % (self.job_prefix, job.id)
+        return self.results.put(key, job.result.as_json())
+
+    def load_result(self, result_ref):
+        try:
+            return JobResult.from_json(self.results.get(result_ref))
+        except (IOError, OSError) as error:
+            logger.error('Failed to load job result %s: %s', result_ref, error)
     
+    def read_description(self, job_file):
+        return json.load(open(job_file))
+
     def load_job(self, job_file):
-        description = json.load(open(job_file))
+        description = self.read_description(job_file)
         logger.debug(
             'Loading job with persistence monitor: %s', description)
-        result = description.get('result', None)        
-        if result is not None:
-            result = JobResult.from_json(result)                                 
-        return Job(description['id'], description['batch_name'],
-                   description['status'], info=description['info'],
-                   result=result, file_attachments=description['file_attachments']) 
+        return self.restore_job(description)
+
+    def copy_job(self, description):
+        '''Job of a cached description, which the caller may change freely'''
+        description = dict(description, file_attachments=dict(
+            description['file_attachments']))
+        if description.get('info') is not None:
+            # Decoded info of older records
+            description['info'] = copy.deepcopy(description['info'])
+        return self.restore_job(description)
 
     def save_job(self, job_filename, job, info=None):
         logger.debug(
             'Saving job with persistence monitor into: %s', job_filename)
-        description = {
-            'id': job.id,
-            'status': job.status,
-            'batch_name': job.batch_name,
-            'info': job.info,
-            'file_attachments':job.file_attachments, 
-        }
-        if job.result is not None:
-            description['result'] = job.result.as_json()
-        json.dump(description, open(job_filename, 'w+'))
+        # Write then rename, so readers never parse a half written file.
+        folder, name = os.path.split(job_filename)
+        temp_filename = os.path.join(folder, '.%s.%d' % (name, os.getpid()))
+        with open(temp_filename, 'w+') as job_file:
+            json.dump(self.describe_job(job), job_file)
+        os.rename(temp_filename, job_filename)
     
     def load_jobs(self, status_mask=status_set, ):
+        '''
+        Jobs are served from the resident index, only status folders changed
+        since the previous call are rescanned and only new files are parsed.
+        The index keeps descriptions, every call returns new Job objects, so
+        that changes not saved by the caller never leak into later calls.
+        '''
         jobs = list()
+        job_ids = set()
         for status in status_mask:
             status_folder = os.path.join(self.state_path, status)
-            job_file_mask = self.get_job_file()            
-            job_files = find_files(
-                status_folder, Match(filetype='f', name=job_file_mask))
-            for job_file in job_files:
-                job = self.load_job(job_file)
-                if not job:
-                    continue
-                jobs.append(job)
+            for description in self.layout.scan(self.index, status_folder,
+                                                self.job_file_pattern,
+                                                self.read_description):
+                # A job file being re-sharded may be seen twice.
+                if description['id'] not in job_ids:
+                    job_ids.add(description['id'])
+                    jobs.append(self.copy_job(description))
         return jobs
     
     def detach_job(self, job):
@@ -164,27 +368,64 @@ class Monitor(object):
         if not job.is_attached:
             # Job is already detached from the monitor.
             return
-        job_file = os.path.join(self.state_path, job.status, 
-                                self.get_job_file(job.id))
-        os.remove(job_file)
+        try:
+            os.remove(self.get_job_path(job))
+        except OSError:
+            # Moved by re-sharding meanwhile.
+            os.remove(self.get_job_path(job))
         job.is_attached = False
 
     def attach_job(self, job):
         if job.is_attached:
             logger.warn('Job is already attached to the monitor.')
             return
-        job_file = os.path.join(self.state_path, job.status, 
-                                self.get_job_file(job.id))
+        job_file = self.layout.make_path(
+            os.path.join(self.state_path, job.status), job.id,
+            self.get_job_file(job.id))
         job.is_attached = True
         return self.save_job(job_file, job)
 
+    def attach_jobs(self, jobs):
+        '''
+        Attach many jobs at once. Override this if persistence backend can
+        write them in a single transaction.
+        '''
+        for job in jobs:
+            self.attach_job(job)
+
+    def change_status(self, job, status):
+        '''
+        Move attached job into another status. Override this if persistence
+        backend can do it in a single transaction.
+        '''
+        self.detach_job(job)
+        job.status = status
+        self.attach_job(job)
+
+    def change_statuses(self, jobs, status):
+        '''
+        Move many attached jobs into the same status. Override this if
+        persistence backend can do it in a single transaction.
+        '''
+        for job in jobs:
+            self.change_status(job, status)
+
 
 class JobRunner(object):
+
+    # True if the runner holds back jobs until their dependencies are met,
+    # see plato.schedule.depends
+    passes_dependencies = False
+    # True if jobs can be executed and checked by concurrent threads, see
+    # plato.schedule.pipeline
+    is_thread_safe = False
     
     def __init__(self, report_path=None, attachment_path=None):
         self.report_path = report_path
         self.attachment_path = attachment_path
         self.__all_jobs = None
+        # Flat or hash-sharded report, attachment and pid files.
+        self.layout = ShardLayout()
 
     def init_db(self):
         config = self.scheduler.config 
@@ -207,9 +448,88 @@ class JobRunner(object):
     def forget_job_list(self):
         self.__all_jobs = None
 
+    def get_list_mask(self, jobs):
+        '''
+        Mask of list_jobs() restricted to the given jobs. Override this if
+        the runner can look up some jobs cheaper than all of them.
+        '''
+        return '*'
+
+    def update_tasks(self, job):
+        '''
+        Override this to update statuses of tasks in job.info['array'], and
+        to start more of them if the runner expands arrays lazily. Returns
+        True if any task has changed its status.
+        '''
+        return False
+
+    def get_task_result(self, job, index):
+        result = JobResult(has_failed=True)
+        report_filepath = self.get_task_report_filepath(job, index)
+        if os.path.exists(report_filepath):
+            self.parse_report(report_filepath, result)
+        return result
+
+    def get_array_result(self, job):
+        '''Aggregate result of a complete job array'''
+        tasks = dict()
+        for index, status in sorted(arrays.get_tasks(job).iteritems()):
+            task_result = self.get_task_result(job, index)
+            tasks[str(index)] = {
+                'has_failed': status == 'failed' or task_result.has_failed,
+                'usage': task_result.details.get('usage', dict()),
+            }
+        has_failed = any(task['has_failed'] for task in tasks.itervalues())
+        usage = arrays.merge_usage(task['usage'] for task in tasks.itervalues())
+        return JobResult(has_failed, details={'tasks': tasks, 'usage': usage})
+
+    def admit_jobs(self, jobs):
+        '''
+        Submitted jobs to accept now. Override this to keep jobs submitted
+        until there is capacity to run them.
+        '''
+        return jobs
+
+    def prepare_jobs(self, jobs):
+        '''
+        Look up what jobs which are about to be executed need from the
+        monitor in one pass. Override this if execute() needs more than
+        the job itself, it may not touch the monitor when thread-safe.
+        '''
+
+    def prefetch_jobs(self, jobs):
+        '''Look up jobs which are about to be updated in one pass.'''
+        if jobs:
+            self.__all_jobs = self.list_jobs(self.get_list_mask(jobs))
+
+    @property
+    def report_tail_lines(self):
+        '''Last lines of long output parsed from reports, see reports.py'''
+        config = self.scheduler.config
+        if config.has_option('scheduler', 'report_tail_lines'):
+            return config.getint('scheduler', 'report_tail_lines')
+        return 0
+
     def get_report_filepath(self, job):
         '''Return path to the report file of the job'''
-        return os.path.join(self.report_path, job.get_report_filename())
+        return self.layout.find_path(self.report_path, job.id,
+                                     job.get_report_filename())
+
+    def make_report_filepath(self, job):
+        '''Path for a new report file, its shard folder is created.'''
+        return self.layout.make_path(self.report_path, job.id,
+                                     job.get_report_filename())
+
+    def get_task_report_filepath(self, job, index):
+        '''Report of a task of job array, next to the report of the job'''
+        return self.layout.find_path(
+            self.report_path, job.id,
+            arrays.get_task_report_filename(job, index))
+
+    def make_task_report_filepath(self, job, index):
+        return self.layout.make_path(
+            self.report_path, job.id,
+            arrays.get_task_report_filename(job, index))
 
     def report_file_exists(self, job):
         '''True if report file exists for the job'''
@@ -221,6 +541,37 @@ class JobRunner(object):
         '''
         pass
 
+    def get_poll_hint(self, job):
+        '''
+        Optionally return seconds after which job should be checked again,
+        None lets the scheduler back off based on job age.
+        '''
+        return None
+
+    def wait_events(self, timeout, readers=()):
+        '''
+        Sleep for timeout seconds, or until any of the readers (e.g. the
+        doorbell) becomes readable. Override this to return as soon as any
+        job has finished, see pop_finished_jobs().
+        '''
+        if readers:
+            select(readers, [], [], timeout)
+        else:
+            sleep(timeout)
+
+    def pop_finished_jobs(self):
+        '''
+        Override this to return ids of jobs known to have finished since the
+        previous call, e.g. by events from the processes running them.
+        '''
+        return set()
+
+    def kill_jobs(self, jobs):
+        '''
+        Override this to kill pending and running jobs of the runner, given
+        in chunks so that many can be killed at once.
+        '''
+
     def save_attachments(self, job):
         '''
         If job has any attachments in it, now is the moment to create them
@@ -230,15 +581,16 @@ class JobRunner(object):
             return
         file_pathnames = dict()
         for file_name in job.file_attachments:
-            file_path = os.path.join(self.attachment_path, file_name) 
-            file_path += '.%s' % job.id
+            file_path = self.layout.make_path(
+                self.attachment_path, job.id, '%s.%s' % (file_name, job.id))
             data = job.file_attachments[file_name]
             attachment_file = open(file_path, 'w+')
             attachment_file.write(data)
             attachment_file.close()
             file_pathnames[file_name] = file_path
         # Substitute all filename entries in the command with real pathnames.        
-        job.info['command'] = job.info['command'].format(**file_pathnames)
+        job.info['command'] = job.info['command'].format(
+            index=arrays.INDEX_FIELD, **file_pathnames)
 
     def execute(self, job):
         '''
@@ -259,7 +611,13 @@ class Scheduler(object):
         self.runner.scheduler = self
         self.monitor = monitor
         self.monitor.scheduler = self
+        self.polling = PollingSchedule.from_config(self.config)
+        self.step_pool = StepPool.from_config(self.config)
+        self.dependencies = DependencyTracker()
         self.init_db()
+        # Rung on submission, to wake the daemon.
+        self.doorbell = Doorbell(os.path.join(self.monitor.state_path,
+                                              'doorbell'))
     
     def init_db(self):
         '''Override to implement custom db initialization'''
@@ -273,6 +631,14 @@ class Scheduler(object):
         after config files are loaded. 
         '''
         
+    @classmethod
+    def get_monitor_class(cls, backend):
+        '''Lookup alternative persistence monitor by its backend name'''
+        if not backend in monitor_backends:
+            raise PlatoException('Unknown monitor backend: %s' % backend)
+        module_name, class_name = monitor_backends[backend].rsplit('.', 1)
+        return getattr(import_module(module_name), class_name)
+
     @classmethod
     def create(cls, scheme_name, state_path, config, is_interactive=None, logger=None):
         '''Create scheduler by its scheme name'''
@@ -283,10 +649,18 @@ class Scheduler(object):
         RunnerCls = getattr(scheme, prefix + 'Runner')
         MonitorCls = getattr(scheme, prefix + 'Monitor')
         SchedulerCls = getattr(scheme, prefix + 'Scheduler')
+        backend = 'files'
+        if config.has_option('scheduler', 'monitor'):
+            backend = config.get('scheduler', 'monitor').lower()
+        if backend != 'files':
+            MonitorCls = cls.get_monitor_class(backend)
         runner = RunnerCls()
         if is_interactive is None:
             is_interactive = config.getboolean('scheduler', 'isinteractive') 
         monitor = MonitorCls(state_path, scheme_name, is_interactive)
+        if config.has_option('scheduler', 'id_block_size'):
+            monitor.id_block_size = config.getint('scheduler', 'id_block_size')
+        monitor.layout = runner.layout = ShardLayout.from_config(config)
         return SchedulerCls(runner, monitor, config=config)
     
     def submit_job(self, job, resubmit=False):
@@ -297,60 +671,203 @@ class Scheduler(object):
         job.status = 'submit'         
         job.info['submitted_at'] = time()
         self.monitor.attach_job(job)
+        self.doorbell.ring()
         return success
+
+    def submit_array(self, command, first, last, batch_name=None,
+                     queue='default', resources=None):
+        '''
+        Submit a job array, a single job running the command for each index
+        from first to last, with {index} in the command replaced by it.
+        '''
+        if not batch_name:
+            batch_name = os.path.basename(command.split()[0])
+        job = self.monitor.new_job(batch_name)
+        job.info = {
+            'command': command,
+            'queue': queue,
+            'array': arrays.make_array_info(first, last),
+        }
+        if resources:
+            job.info.update(resources)
+        self.submit_job(job)
+        return job
+
+    def submit_many(self, commands, batch_name=None, queue='default',
+                    chunk_size=SUBMIT_CHUNK_SIZE, resources=None):
+        '''
+        Submit a job per shell command from (possibly lazy) iterable of
+        commands. Ids are reserved and submit records are written once per
+        chunk. Optional resources (e.g. cores, memory, dependencies) go into
+        info of every job. Returns number of submitted jobs.
+        '''
+        count = 0
+        chunk = list()
+        for command in commands:
+            command = command.strip()
+            if not command:
+                continue
+            chunk.append(command)
+            if len(chunk) >= chunk_size:
+                count += self.submit_chunk(chunk, batch_name, queue,
+                                           resources)
+                chunk = list()
+        if chunk:
+            count += self.submit_chunk(chunk, batch_name, queue, resources)
+        return count
+
+    def submit_chunk(self, commands, batch_name, queue, resources=None):
+        jobs = list()
+        submitted_at = time()
+        for job_id, command in zip(self.monitor.reserve_ids(len(commands)),
+                                   commands):
+            job_batch_name = batch_name
+            if not job_batch_name:
+                job_batch_name = os.path.basename(command.split()[0])
+            job = Job(job_id, job_batch_name, is_attached=False, info={
+                'command': command,
+                'queue': queue,
+                'submitted_at': submitted_at,
+            })
+            if resources:
+                job.info.update(resources)
+            jobs.append(job)
+        self.monitor.attach_jobs(jobs)
+        self.doorbell.ring()
+        logger.debug('Submitted chunk of (%d) jobs', len(jobs))
+        return len(jobs)
         
+    def map_jobs(self, function, jobs):
+        '''
+        Pairs of (job, function(job)), called by the step threads if the
+        runner is thread-safe. Function may call the runner only.
+        '''
+        if not self.runner.is_thread_safe:
+            return ((job, function(job)) for job in jobs)
+        return self.step_pool.map_jobs(function, jobs)
+
     def accept_job(self, job):
         if job.status != 'submit':
             logger.error('Will only accept jobs that were previously submitted.')
             return
         # This call can potentially block, but it should not.
-        result= self.runner.execute(job)
+        self.accept_result(job, self.runner.execute(job))
+
+    def accept_result(self, job, result):
+        '''Record the job as executed by the runner, or failed to.'''
         if result.has_failed:
             self.complete_job(job, result)
             return
         # Job was executed and is now pending
-        self.monitor.detach_job(job)
         job.info.update(result.details)
-        job.status = 'pending'
         job.info['pending_since'] = time()
-        self.monitor.attach_job(job)
+        self.monitor.change_status(job, 'pending')
+        self.dependencies.accept_job(job)
 
     def update_job(self, job):
         if not job.status in ('pending', 'run'):
             logger.error('Will only update jobs that are already pending.')
             return
+        self.apply_update(job, self.check_job(job))
+
+    def check_job(self, job):
+        '''
+        Runner side of update_job(), returns (new status, result) with
+        status 'complete' for finished jobs, or None if nothing changed.
+        '''
+        if arrays.is_array(job):
+            return self.check_array(job)
         if not self.runner.is_running(job):
             logger.info('Job is still pending: %s' % job)            
         # Update status if necessary.
         if job.status == 'pending':
             logger.info('Job is now running: %s ' % job)
-            self.monitor.detach_job(job)
-            job.status = 'run'
-            self.monitor.attach_job(job)
-            return
+            return 'run', None
         if self.runner.is_done(job) and self.runner.report_file_exists(job):
             logger.info('Job is (already) done: %s ' % job)
             # Job finished.
             # TODO: check that file is not written into anymore
             result = self.runner.get_result(job)
             if not result:
-                self.error('Failed to obtain a result for: %s' % job)
-            self.complete_job(job, result)
+                logger.error('Failed to obtain a result for: %s' % job)
+            return 'complete', result
         logger.info('Job is still running: %s ' % job)
-            
-        
-    
+
+    def check_array(self, job):
+        '''Track tasks of job array, complete it once all have finished.'''
+        has_changed = self.runner.update_tasks(job)
+        if arrays.is_complete(job):
+            logger.info('Job array is complete: %s ' % job)
+            return 'complete', self.runner.get_array_result(job)
+        status = arrays.get_array_status(job)
+        if has_changed or status != job.status:
+            logger.info('Job array tasks: %s' % arrays.count_tasks(job))
+            return status, None
+
+    def apply_update(self, job, update):
+        '''Monitor side of update_job(), see check_job()'''
+        if update is None:
+            return
+        status, result = update
+        if status == 'complete':
+            self.complete_job(job, result)
+        else:
+            self.monitor.change_status(job, status)
+
+    def update_array(self, job):
+        self.apply_update(job, self.check_array(job))
+
     def complete_job(self, job, result):
         if not job.status in ('submit', 'pending', 'run'):
             logger.error('We can only complete jobs that were submitted, pending or running.')
             return
-        self.monitor.detach_job(job)
         job.result = result
+        if result and result.details.get('usage'):
+            # Kept with the job, queryable without loading the result.
+            job.info['usage'] = result.details['usage']
         if not result or result.has_failed:
-            job.status = 'failed'
+            self.monitor.change_status(job, 'failed')
         else:
-            job.status = 'done'
-        self.monitor.attach_job(job)
+            self.monitor.change_status(job, 'done')
+        self.dependencies.finish_job(job)
+
+    def cancel_jobs(self, selector):
+        '''
+        Kill jobs matched by the selector (see plato.schedule.cancel) and
+        move them into the `cancelled` status. Returns cancelled jobs.
+        '''
+        jobs = [job for job in self.monitor.load_jobs(selector.statuses)
+                if selector.matches(job)]
+        if not jobs:
+            return jobs
+        killed_jobs = [job for job in jobs if job.status in KILLABLE]
+        for chunk in iter_chunks(killed_jobs):
+            self.runner.kill_jobs(chunk)
+        for job in jobs:
+            job.info['cancelled_at'] = time()
+        self.monitor.change_statuses(jobs, 'cancelled')
+        logger.info('Cancelled (%d) jobs, (%d) of them killed', len(jobs),
+                    len(killed_jobs))
+        for job in jobs:
+            self.dependencies.finish_job(job)
+        return jobs
+
+    def release_jobs(self, jobs):
+        '''
+        Submitted jobs whose dependencies are met, or can be left to the
+        runner. Jobs with dependencies that can not be met are failed.
+        '''
+        if not self.dependencies.is_loaded:
+            if not any(has_dependencies(job) for job in jobs):
+                return jobs
+            # Once, dependencies are tracked incrementally from now on.
+            self.dependencies.load(self.monitor.load_jobs())
+        ready_jobs, broken_jobs = self.dependencies.release(
+            jobs, pass_down=self.runner.passes_dependencies)
+        for job, reason in broken_jobs:
+            logger.warn('Job can not run: %s, %s' % (job, reason))
+            self.complete_job(job, JobResult(has_failed=True, error=reason))
+        return ready_jobs
    
     def submit_jobs(self):
         '''
@@ -358,11 +875,33 @@ class Scheduler(object):
         Use actual low-level scheduler to submit them.
         '''
         submitted_jobs = self.monitor.load_jobs(['submit'])        
-        logger.info('Processing submitted jobs.. found (%d) jobs',
-                         len(submitted_jobs))
-        for job in submitted_jobs:
-            # TODO: check what we can before submitting the job into the runner
-            self.accept_job(job)
+        released_jobs = self.release_jobs(submitted_jobs)
+        admitted_jobs = self.runner.admit_jobs(released_jobs)
+        logger.info('Processing submitted jobs.. found (%d) jobs, (%d) '
+                    'released, (%d) admitted', len(submitted_jobs),
+                    len(released_jobs), len(admitted_jobs))
+        self.runner.prepare_jobs(admitted_jobs)
+        # TODO: check what we can before submitting the job into the runner
+        for job, result in self.map_jobs(self.runner.execute, admitted_jobs):
+            self.accept_result(job, result)
+
+    def complete_finished_jobs(self):
+        '''
+        Complete jobs which the runner has seen finishing right away, not
+        waiting for their next poll.
+        '''
+        finished_job_ids = self.runner.pop_finished_jobs()
+        if not finished_job_ids:
+            return
+        for job in self.monitor.load_jobs(['pending', 'run']):
+            if job.id not in finished_job_ids:
+                continue
+            logger.info('Job has finished: %s ' % job)
+            if arrays.is_array(job):
+                self.update_array(job)
+            else:
+                self.complete_job(job, self.runner.get_result(job))
+            self.polling.reschedule(job, True, time())
 
     def process_jobs(self):
         '''
@@ -371,8 +910,15 @@ class Scheduler(object):
         failed.
         '''
         pending_jobs = self.monitor.load_jobs(['pending', 'run'])
-        logger.info('Processing pending and running jobs.. found (%d) jobs',
-                         len(pending_jobs))
-        for job in pending_jobs:
-            self.update_job(job)
+        now = time()
+        due_jobs = self.polling.select_due(pending_jobs, now)
+        logger.info('Processing pending and running jobs.. found (%d) jobs, '
+                    '(%d) due for a check', len(pending_jobs), len(due_jobs))
+        self.runner.prefetch_jobs(due_jobs)
+        for job, update in self.map_jobs(self.check_job, due_jobs):
+            # Status is changed only by the monitor side of the update.
+            status = job.status
+            self.apply_update(job, update)
+            self.polling.reschedule(job, job.status != status, time(),
+                                    hint=self.runner.get_poll_hint(job))
 
@@ -0,0 +1,53 @@
+'''
+Race-free allocation of job ids shared by concurrent plato processes.
+'''
+import os
+import fcntl
+from contextlib import contextmanager
+
+
+class IdAllocator(object):
+    '''
+    Counter of issued ids kept in a plain text file (compatible with the
+    legacy `last_id` file). Updates are serialized by flock on a sibling lock
+    file and the new value is written atomically via rename, so a reader never
+    sees a truncated counter.
+    '''
+
+    def __init__(self, counter_path):
+        self.counter_path = counter_path
+        self.lock_path = counter_path + '.lock'
+
+    @contextmanager
+    def locked(self):
+        lock_file = open(self.lock_path, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            lock_file.close()
+
+    def read_counter(self):
+        if not os.path.exists(self.counter_path):
+            return 0
+        content = open(self.counter_path).read().strip()
+        if not content:
+            return 0
+        return int(content)
+
+    def write_counter(self, value):
+        temp_path = '%s.%d' % (self.counter_path, os.getpid())
+        with open(temp_path, 'w') as counter_file:
+            counter_file.write(str(value))
+            counter_file.flush()
+            os.fsync(counter_file.fileno())
+        os.rename(temp_path, self.counter_path)
+
+    def reserve(self, count=1):
+        '''Reserve a block of `count` ids. Returns the first id of the block.'''
+        assert count > 0
+        with self.locked():
+            last_id = self.read_counter()
+            self.write_counter(last_id + count)
+        return last_id + 1
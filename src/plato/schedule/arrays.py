@@ -0,0 +1,111 @@
+'''
+Job arrays: one job record with a command template and an index range,
+e.g. `process --sample {index}` for indices 1..N. Status of every task is
+tracked in `job.info['array']`:
+
+    {"first": 1, "last": N, "tasks": {"1": "done", "2": "run", ...}}
+
+with the usual status names. The array job itself is pending until some
+task runs and is completed once all tasks have finished, as failed if any
+task has failed. Runners submit arrays at once (e.g. a single `bsub -J
+name[1-N]`) or expand them lazily, see JobRunner.update_tasks().
+'''
+INDEX_FIELD = '{index}'
+FINISHED = ('done', 'failed')
+ACTIVE = ('pending', 'run')
+
+
+def make_array_info(first, last):
+    return {
+        'first': first,
+        'last': last,
+        'tasks': dict((str(index), 'submit')
+                      for index in xrange(first, last + 1)),
+    }
+
+
+def parse_range(text):
+    '''Index range like "1-100" or "7" into (first, last)'''
+    first, sep, last = text.partition('-')
+    first = int(first)
+    last = int(last) if sep else first
+    if first < 0 or last < first:
+        raise ValueError('Invalid index range: %s' % text)
+    return first, last
+
+
+def is_array(job):
+    return 'array' in job.info
+
+
+def expand_command(template, index):
+    return template.replace(INDEX_FIELD, str(index))
+
+
+def get_tasks(job):
+    '''Task statuses by index (an int)'''
+    return dict((int(index), status) for index, status
+                in job.info['array']['tasks'].iteritems())
+
+
+def get_indices(job, statuses):
+    '''Sorted indices of tasks in given statuses'''
+    return sorted(int(index) for index, status
+                  in job.info['array']['tasks'].iteritems()
+                  if status in statuses)
+
+
+def set_task_status(job, index, status):
+    '''Returns True if status of the task has changed.'''
+    tasks = job.info['array']['tasks']
+    if tasks.get(str(index)) == status:
+        return False
+    tasks[str(index)] = status
+    return True
+
+
+def count_tasks(job):
+    '''Number of tasks by status'''
+    counts = dict()
+    for status in job.info['array']['tasks'].itervalues():
+        counts[status] = counts.get(status, 0) + 1
+    return counts
+
+
+def count_active(job):
+    counts = count_tasks(job)
+    return sum(counts.get(status, 0) for status in ACTIVE)
+
+
+def is_complete(job):
+    return all(status in FINISHED
+               for status in job.info['array']['tasks'].itervalues())
+
+
+def get_array_status(job):
+    '''Status of the whole array while it is not complete'''
+    counts = count_tasks(job)
+    if counts.get('run') or any(counts.get(status) for status in FINISHED):
+        return 'run'
+    return 'pending'
+
+
+def get_task_report_filename(job, index):
+    return '%s.%s' % (job.get_report_filename(), index)
+
+
+def merge_usage(usages):
+    '''Usage of the whole array from usage of its tasks'''
+    merged = dict()
+    for usage in usages:
+        for field in ('cpu_time', 'user_time', 'sys_time', 'read_bytes',
+                      'write_bytes'):
+            if usage.get(field) is not None:
+                merged[field] = merged.get(field, 0) + usage[field]
+        for field in ('wall_time', 'max_rss'):
+            if usage.get(field) is not None:
+                merged[field] = max(merged.get(field, 0), usage[field])
+        if usage.get('exit_code') is not None \
+                and not merged.get('exit_code'):
+            merged['exit_code'] = usage['exit_code']
+    return merged
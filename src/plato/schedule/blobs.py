@@ -0,0 +1,48 @@
+'''
+Out-of-line storage of large job payloads (e.g. results with up to thousands
+of output lines), so that job records stay small and cheap to parse.
+'''
+import os
+import zlib
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+COMPRESSION_LEVEL = 6
+
+
+class BlobStore(object):
+    '''Folder of zlib compressed blobs addressed by key (a file name).'''
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_blob_path(self, key):
+        return os.path.join(self.path, key)
+
+    def put(self, key, data):
+        if not os.path.exists(self.path):
+            logger.info('Creating missing blob folder: %s' % self.path)
+            try:
+                os.makedirs(self.path)
+            except OSError:
+                # Created by a concurrent process.
+                if not os.path.isdir(self.path):
+                    raise
+        blob_path = self.get_blob_path(key)
+        temp_path = os.path.join(self.path, '.%s.%d' % (key, os.getpid()))
+        with open(temp_path, 'wb') as blob:
+            blob.write(zlib.compress(data, COMPRESSION_LEVEL))
+        os.rename(temp_path, blob_path)
+        return key
+
+    def get(self, key):
+        with open(self.get_blob_path(key), 'rb') as blob:
+            return zlib.decompress(blob.read())
+
+    def remove(self, key):
+        blob_path = self.get_blob_path(key)
+        if os.path.exists(blob_path):
+            os.remove(blob_path)
@@ -0,0 +1,62 @@
+'''
+Selecting jobs to cancel, by id range, batch name and status, e.g.
+
+    JobSelector(first_id=10, last_id=20, batch_name='preprocess')
+
+matches jobs 10..20 of the batch in any status that can be cancelled.
+Cancelled jobs are killed by the runner in chunks and moved into the
+`cancelled` status at once, see Scheduler.cancel_jobs().
+'''
+from plato.schedule.arrays import parse_range
+
+
+# Statuses of jobs that can be cancelled, killing those left to the runner
+CANCELLABLE = ('submit', 'pending', 'run')
+KILLABLE = ('pending', 'run')
+# Jobs passed to a single JobRunner.kill_jobs() call
+CANCEL_CHUNK_SIZE = 500
+
+
+class JobSelector(object):
+
+    def __init__(self, first_id=None, last_id=None, batch_name=None,
+                 statuses=None):
+        self.first_id = first_id
+        self.last_id = last_id
+        self.batch_name = batch_name
+        if statuses is None:
+            statuses = CANCELLABLE
+        self.statuses = [status for status in statuses
+                         if status in CANCELLABLE]
+
+    @classmethod
+    def parse(cls, ids=None, batch_name=None, statuses=None):
+        '''
+        Selector from command line values like ids "10-20" and statuses
+        "pending,run". Raises ValueError on invalid values.
+        '''
+        first_id = last_id = None
+        if ids:
+            first_id, last_id = parse_range(ids)
+        if statuses:
+            statuses = [status.strip() for status in statuses.split(',')
+                        if status.strip()]
+            for status in statuses:
+                if status not in CANCELLABLE:
+                    raise ValueError('Can not cancel jobs in status: %s' %
+                                     status)
+        return cls(first_id, last_id, batch_name, statuses)
+
+    def matches(self, job):
+        if self.first_id is not None and job.id < self.first_id:
+            return False
+        if self.last_id is not None and job.id > self.last_id:
+            return False
+        if self.batch_name is not None and job.batch_name != self.batch_name:
+            return False
+        return job.status in self.statuses
+
+
+def iter_chunks(items, chunk_size=CANCEL_CHUNK_SIZE):
+    for start in xrange(0, len(items), chunk_size):
+        yield items[start:start + chunk_size]
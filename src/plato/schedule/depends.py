@@ -0,0 +1,199 @@
+'''
+Job dependencies. A job declares its parents in `job.info`, as ids of jobs
+or batch names:
+
+    {'after_ok': [12, 'preprocess'], 'after_any': [13]}
+
+It stays submitted until every `after_ok` parent is done and every
+`after_any` parent has finished either way, a batch name standing for all
+jobs of that batch. A job whose `after_ok` parent failed or was cancelled,
+or which refers to an unknown job or batch, is failed without running.
+
+The tracker keeps the number of unmet parents of every waiting job and the
+waiting children of every parent, so finishing a job releases its children
+without rescanning the graph. Runners that can enforce dependencies by
+themselves (LSF `bsub -w`) get children as soon as their parents have been
+accepted, with the parents left to wait for in `job.info['wait_for']`.
+'''
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+DEPENDENCY_KINDS = ('after_ok', 'after_any')
+FINISHED = ('done', 'failed', 'cancelled')
+
+
+def has_dependencies(job):
+    return any(job.info.get(kind) for kind in DEPENDENCY_KINDS)
+
+
+def parse_parents(text):
+    '''Comma separated job ids and batch names, e.g. "12,13,preprocess"'''
+    parents = list()
+    for parent in text.split(','):
+        parent = parent.strip()
+        if not parent:
+            continue
+        parents.append(int(parent) if parent.isdigit() else parent)
+    return parents
+
+
+def get_parent_key(parent):
+    '''Job id, or ('batch', name) for a batch name'''
+    if isinstance(parent, basestring):
+        return ('batch', parent)
+    return int(parent)
+
+
+class DependencyTracker(object):
+
+    def __init__(self):
+        self.is_loaded = False
+        # Job id -> status, of all jobs seen
+        self.statuses = dict()
+        # Batch name -> [number of unfinished jobs, number of failed jobs]
+        self.batches = dict()
+        # Waiting job id -> number of unmet parents
+        self.unmet = dict()
+        # Waiting job id -> [(parent key, kind)]
+        self.parents = dict()
+        # Parent key -> set of (waiting job id, kind)
+        self.children = dict()
+        # Job id -> reason why its dependencies can not be met
+        self.broken = dict()
+
+    def load(self, jobs):
+        '''Start with all jobs known to the monitor.'''
+        jobs = list(jobs)
+        for job in jobs:
+            self.count_job(job)
+        for job in jobs:
+            if job.status == 'submit' and has_dependencies(job):
+                self.add_dependencies(job)
+        self.is_loaded = True
+        logger.debug('Tracking dependencies of (%d) jobs', len(self.unmet))
+
+    def count_job(self, job):
+        self.statuses[job.id] = job.status
+        counts = self.batches.setdefault(job.batch_name, [0, 0])
+        if job.status not in FINISHED:
+            counts[0] += 1
+        elif job.status != 'done':
+            counts[1] += 1
+
+    def get_state(self, key):
+        '''
+        'unfinished', 'done' or 'failed' for a job or a whole batch, None if
+        there is no such. Cancelled jobs count as failed.
+        '''
+        if isinstance(key, tuple):
+            counts = self.batches.get(key[1])
+            if counts is None:
+                return
+            if counts[0]:
+                return 'unfinished'
+            return 'failed' if counts[1] else 'done'
+        status = self.statuses.get(key)
+        if status is None or status == 'done':
+            return status
+        return 'failed' if status in FINISHED else 'unfinished'
+
+    def add_jobs(self, jobs):
+        '''
+        Track submitted jobs not seen before. All of them are counted before
+        resolving any dependencies, so parents submitted along with their
+        children are known whatever order the jobs come in.
+        '''
+        new_jobs = [job for job in jobs if job.id not in self.statuses]
+        for job in new_jobs:
+            self.count_job(job)
+        for job in new_jobs:
+            if has_dependencies(job):
+                self.add_dependencies(job)
+
+    def add_dependencies(self, job):
+        self.unmet[job.id] = 0
+        self.parents[job.id] = list()
+        for kind in DEPENDENCY_KINDS:
+            for parent in job.info.get(kind, ()):
+                key = get_parent_key(parent)
+                state = self.get_state(key)
+                if state is None:
+                    self.broken[job.id] = 'Unknown dependency: %s' % parent
+                elif key == ('batch', job.batch_name) or key == job.id:
+                    self.broken[job.id] = 'Depends on itself: %s' % parent
+                elif state == 'unfinished':
+                    self.unmet[job.id] += 1
+                    self.parents[job.id].append((key, kind))
+                    self.children.setdefault(key, set()).add((job.id, kind))
+                elif state == 'failed' and kind == 'after_ok':
+                    self.broken[job.id] = 'Dependency has failed: %s' % parent
+
+    def accept_job(self, job):
+        '''Job has been handed over to the runner.'''
+        if job.id in self.statuses:
+            self.statuses[job.id] = job.status
+        self.forget_dependencies(job.id)
+
+    def finish_job(self, job):
+        '''Resolve dependencies on the job and on its batch.'''
+        if not self.is_loaded or job.status not in FINISHED:
+            return
+        previous_status = self.statuses.get(job.id)
+        if previous_status in FINISHED:
+            return
+        self.forget_dependencies(job.id)
+        self.statuses[job.id] = job.status
+        counts = self.batches.setdefault(job.batch_name, [0, 0])
+        if previous_status is not None:
+            counts[0] -= 1
+        if job.status != 'done':
+            counts[1] += 1
+        self.resolve(job.id, self.get_state(job.id))
+        if counts[0] == 0:
+            batch_key = ('batch', job.batch_name)
+            self.resolve(batch_key, self.get_state(batch_key))
+
+    def resolve(self, key, state):
+        for job_id, kind in self.children.pop(key, ()):
+            if job_id not in self.unmet:
+                continue
+            if kind == 'after_ok' and state == 'failed':
+                self.broken[job_id] = 'Dependency has failed: %s' % (
+                    key[1] if isinstance(key, tuple) else key)
+            self.unmet[job_id] -= 1
+            self.parents[job_id].remove((key, kind))
+
+    def forget_dependencies(self, job_id):
+        self.unmet.pop(job_id, None)
+        self.parents.pop(job_id, None)
+
+    def is_passable(self, job_id):
+        '''True if all unmet parents are jobs accepted by the runner'''
+        return all(not isinstance(key, tuple) and
+                   self.statuses.get(key) != 'submit'
+                   for key, kind in self.parents.get(job_id, ()))
+
+    def release(self, jobs, pass_down=False):
+        '''
+        Split submitted jobs into those ready to run and those which never
+        will, as (ready jobs, [(broken job, reason)]). Others keep waiting.
+        With pass_down, jobs waiting for accepted jobs only are ready too,
+        with the parents noted in job.info['wait_for'].
+        '''
+        ready_jobs = list()
+        broken_jobs = list()
+        self.add_jobs(jobs)
+        for job in jobs:
+            if job.id in self.broken:
+                self.forget_dependencies(job.id)
+                broken_jobs.append((job, self.broken.pop(job.id)))
+            elif not self.unmet.get(job.id):
+                ready_jobs.append(job)
+            elif pass_down and self.is_passable(job.id):
+                job.info['wait_for'] = [[kind, key] for key, kind
+                                        in self.parents[job.id]]
+                ready_jobs.append(job)
+        return ready_jobs, broken_jobs
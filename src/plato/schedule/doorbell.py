@@ -0,0 +1,82 @@
+'''
+Named pipe in the state path that wakes the daemon as soon as jobs are
+submitted, instead of leaving them until its next step. Any process that
+submits rings it by writing a byte, the daemon waits on the read end
+along with the runner's own events (see JobRunner.wait_events()).
+
+Ringing is a no-op while no daemon listens, so it costs submitters a
+single failed open() at most. Works the same for all monitor backends.
+'''
+import os
+import stat
+import errno
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class Doorbell(object):
+
+    def __init__(self, path):
+        self.path = path
+        self.reader = None
+        # Held open by the daemon itself, so the reader never sees EOF
+        # after a submitter has closed its end.
+        self.writer = None
+
+    def open(self):
+        '''Listen for rings, creating the pipe if needed.'''
+        if self.reader is not None:
+            return
+        if not os.path.exists(self.path):
+            os.mkfifo(self.path, 0600)
+        elif not stat.S_ISFIFO(os.stat(self.path).st_mode):
+            raise OSError(errno.EEXIST, 'Not a named pipe', self.path)
+        self.reader = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        self.writer = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+
+    def fileno(self):
+        return self.reader
+
+    def drain(self):
+        '''Consume rings, returns True if there were any.'''
+        has_rung = False
+        while True:
+            try:
+                data = os.read(self.reader, 4096)
+            except OSError as error:
+                if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if not data:
+                break
+            has_rung = True
+        return has_rung
+
+    def ring(self):
+        '''Wake the daemon, if there is one listening.'''
+        try:
+            writer = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+        except OSError as error:
+            # ENOENT or ENXIO, nobody has listened or listens now.
+            if error.errno not in (errno.ENOENT, errno.ENXIO):
+                logger.debug('Failed to ring %s: %s', self.path, error)
+            return False
+        try:
+            if not stat.S_ISFIFO(os.fstat(writer).st_mode):
+                return False
+            os.write(writer, '\0')
+        except OSError as error:
+            # EAGAIN, pipe is full of rings not drained yet.
+            if error.errno != errno.EAGAIN:
+                logger.debug('Failed to ring %s: %s', self.path, error)
+        finally:
+            os.close(writer)
+        return True
+
+    def close(self):
+        for fd in (self.reader, self.writer):
+            if fd is not None:
+                os.close(fd)
+        self.reader = self.writer = None
@@ -0,0 +1,561 @@
+'''
+Stand-in for Platform LSF to test and benchmark LsfRunner without a cluster.
+It provides `bsub`, `bjobs` and `bkill` commands backed by a SQLite state
+file, jobs are not run but simulated:
+
+    queue wait -> run time -> DONE, or EXIT by failure rate
+
+and a report in LSF format is written to the `-o` path of each finished
+job. Set it up with
+
+    python -m plato.schedule.fakelsf setup <bin dir> [<state dir>]
+
+which writes the commands into <bin dir>, then point plato to them by
+`bin_path = <bin dir>` in the [lsf] config section. The simulation is
+configured in `fakelsf.conf` of the state dir (FAKELSF_HOME, by default
+~/.fakelsf), see DEFAULTS.
+
+Supported are the options plato uses: job arrays (`-J name[1-N]`, %J and
+%I in the report path), dependencies (`-w "done(id) && ended(id)"`, `-ti`),
+`bjobs -a -noheader -o "<fields> delimiter='|'" -J <name pattern> [ids]`
+and `bkill <ids>`, `bkill 0`. Other bsub options are accepted and ignored.
+'''
+import os
+import re
+import sys
+import time
+import random
+import fnmatch
+import sqlite3
+import getpass
+from ConfigParser import SafeConfigParser
+
+
+HOME_ENV = 'FAKELSF_HOME'
+DEFAULT_HOME = '~/.fakelsf'
+CONF_NAME = 'fakelsf.conf'
+DB_NAME = 'fakelsf.db'
+DEFAULTS = {
+    # Mean seconds in the queue and running, varied by +/- jitter (fraction)
+    'queue_wait': '0',
+    'run_time': '1',
+    'jitter': '0',
+    # Fraction of jobs which exit with code 1
+    'failure_rate': '0',
+    'seed': '0',
+    'max_memory': '3',
+    'queue': 'normal',
+    'hostname': 'fakehost',
+}
+COMMANDS = ('bsub', 'bjobs', 'bkill')
+# Exit code of a killed job
+KILLED_EXIT_CODE = 130
+TIME_FMT = '%b %d %H:%M'
+LOCK_TIMEOUT = 60
+# Rows fetched or ids passed to sqlite at once
+CHUNK_SIZE = 500
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER NOT NULL,
+    array_index INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    user TEXT NOT NULL,
+    queue TEXT NOT NULL,
+    command TEXT NOT NULL,
+    report TEXT,
+    condition TEXT,
+    orphan_kill INTEGER NOT NULL,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    exit_code INTEGER,
+    is_reported INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (id, array_index)
+);
+CREATE INDEX IF NOT EXISTS jobs_waiting_idx ON jobs (started_at, finished_at);
+CREATE INDEX IF NOT EXISTS jobs_reported_idx ON jobs (is_reported);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+# bsub options taking a value, others are flags
+BSUB_VALUE_OPTIONS = ('-J', '-o', '-e', '-q', '-w', '-n', '-M', '-R', '-W',
+                      '-P', '-G', '-u', '-cwd', '-m', '-g', '-sp')
+LIST_COLUMNS = (
+    ('jobid', 'JOBID', 10),
+    ('user', 'USER', 8),
+    ('stat', 'STAT', 6),
+    ('queue', 'QUEUE', 11),
+    ('from_host', 'FROM_HOST', 12),
+    ('exec_host', 'EXEC_HOST', 12),
+    ('job_name', 'JOB_NAME', 11),
+    ('submit_time', 'SUBMIT_TIME', 12),
+)
+
+array_name_expr = re.compile(r'^(.*)\[(\d+)-(\d+)\]$')
+job_spec_expr = re.compile(r'^(\d+)(?:\[(\d+)\])?$')
+condition_expr = re.compile(r'(done|ended|exit)\((\d+)\)')
+
+WRAPPER = '''#!%(python)s
+import sys
+sys.path.insert(0, %(src_path)r)
+from plato.schedule.fakelsf import main
+sys.exit(main(%(command)r, sys.argv[1:], home=%(home)r))
+'''
+
+
+class FakeLsf(object):
+
+    def __init__(self, home=None, now=None):
+        if home is None:
+            home = os.environ.get(HOME_ENV, DEFAULT_HOME)
+        self.home = os.path.abspath(os.path.expanduser(home))
+        if not os.path.exists(self.home):
+            os.makedirs(self.home)
+        self.config = SafeConfigParser(DEFAULTS)
+        self.config.read(os.path.join(self.home, CONF_NAME))
+        self.now = now if now is not None else time.time()
+        self.connection = sqlite3.connect(
+            os.path.join(self.home, DB_NAME), timeout=LOCK_TIMEOUT,
+            isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        # Under the write lock, commands started at once on a new state
+        # file would otherwise fail with "database schema has changed".
+        cursor = self.begin()
+        try:
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    cursor.execute(statement)
+        finally:
+            cursor.execute('COMMIT')
+        self.out = sys.stdout
+        self.err = sys.stderr
+
+    def get(self, name):
+        return self.config.get('DEFAULT', name)
+
+    def getfloat(self, name):
+        return float(self.get(name))
+
+    def begin(self):
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        return cursor
+
+    def next_id(self, cursor):
+        cursor.execute("SELECT value FROM counters WHERE name = 'last_id'")
+        row = cursor.fetchone()
+        job_id = (row[0] if row else 0) + 1
+        cursor.execute('INSERT OR REPLACE INTO counters (name, value) '
+                       "VALUES ('last_id', ?)", (job_id,))
+        return job_id
+
+    def get_random(self, job_id, index):
+        seed = int(self.get('seed'))
+        return random.Random(seed * 1000003 + job_id * 1009 + index)
+
+    def vary(self, rng, value):
+        jitter = self.getfloat('jitter')
+        return max(0.0, value * (1 + rng.uniform(-jitter, jitter)))
+
+    def schedule(self, job_id, index, ready_at):
+        '''(started at, finished at, exit code) of a job ready to run'''
+        rng = self.get_random(job_id, index)
+        started_at = ready_at + self.vary(rng, self.getfloat('queue_wait'))
+        finished_at = started_at + self.vary(rng, self.getfloat('run_time'))
+        exit_code = int(rng.random() < self.getfloat('failure_rate'))
+        return started_at, finished_at, exit_code
+
+    def get_status(self, job):
+        if job['finished_at'] is not None and job['finished_at'] <= self.now:
+            return 'DONE' if job['exit_code'] == 0 else 'EXIT'
+        if job['started_at'] is not None and job['started_at'] <= self.now:
+            return 'RUN'
+        return 'PEND'
+
+    # Simulation
+
+    def advance(self):
+        '''Start jobs with met dependencies and report finished jobs.'''
+        cursor = self.begin()
+        try:
+            self.resolve_conditions(cursor)
+            self.write_reports(cursor)
+        finally:
+            cursor.execute('COMMIT')
+
+    def resolve_conditions(self, cursor):
+        # In order of ids, so parents are resolved before their children.
+        waiting_jobs = cursor.execute(
+            'SELECT * FROM jobs WHERE started_at IS NULL AND '
+            'finished_at IS NULL ORDER BY id, array_index').fetchall()
+        for job in waiting_jobs:
+            is_met, ready_at = self.evaluate(cursor, job['condition'])
+            if is_met is None:
+                continue
+            if is_met:
+                cursor.execute(
+                    'UPDATE jobs SET started_at = ?, finished_at = ?, '
+                    'exit_code = ? WHERE id = ? AND array_index = ?',
+                    self.schedule(job['id'], job['array_index'], ready_at)
+                    + (job['id'], job['array_index']))
+            elif job['orphan_kill']:
+                cursor.execute(
+                    'UPDATE jobs SET finished_at = ?, exit_code = ? '
+                    'WHERE id = ? AND array_index = ?',
+                    (self.now, KILLED_EXIT_CODE, job['id'],
+                     job['array_index']))
+
+    def evaluate(self, cursor, condition):
+        '''
+        Conjunction of done(id), ended(id) and exit(id) as (True, time the
+        job is ready at), (False, None) if it can never be met, or (None,
+        None) if not yet.
+        '''
+        ready_at = None
+        is_pending = False
+        for name, parent_id in condition_expr.findall(condition or ''):
+            parents = cursor.execute(
+                'SELECT * FROM jobs WHERE id = ?', (int(parent_id),)
+            ).fetchall()
+            if not parents:
+                return False, None
+            statuses = set(self.get_status(parent) for parent in parents)
+            if statuses - set(['DONE', 'EXIT']):
+                is_pending = True
+                continue
+            if name == 'done' and 'EXIT' in statuses or \
+                    name == 'exit' and statuses != set(['EXIT']):
+                return False, None
+            ready_at = max([ready_at] + [parent['finished_at']
+                                         for parent in parents])
+        if is_pending:
+            return None, None
+        return True, self.now if ready_at is None else ready_at
+
+    def write_reports(self, cursor):
+        finished_jobs = cursor.execute(
+            'SELECT * FROM jobs WHERE is_reported = 0 AND finished_at <= ?',
+            (self.now,)).fetchall()
+        for job in finished_jobs:
+            if job['report']:
+                self.write_report(job)
+            cursor.execute('UPDATE jobs SET is_reported = 1 WHERE id = ? AND '
+                           'array_index = ?', (job['id'], job['array_index']))
+
+    def write_report(self, job):
+        path = job['report'].replace('%J', str(job['id'])).replace(
+            '%I', str(job['array_index']))
+        name = self.get_name(job)
+        status = self.get_status(job)
+        run_time = 0.0
+        if job['started_at'] is not None:
+            run_time = job['finished_at'] - job['started_at']
+        lines = [
+            'Sender: LSF System <lsfadmin@%s>' % self.get('hostname'),
+            'Subject: Job %s: <%s> %s' % (self.get_job_id(job), name,
+                                          'Done' if status == 'DONE'
+                                          else 'Exited'),
+            '',
+            'Job <%s> was submitted from host <%s> by user <%s> in cluster '
+            '<fakelsf>.' % (name, self.get('hostname'), job['user']),
+            'Job was executed on host(s) <%s>, in queue <%s>.' % (
+                self.get('hostname'), job['queue']),
+            '',
+            'Your job looked like:',
+            '',
+            '-' * 60,
+            '# LSBATCH: User input',
+            job['command'],
+            '-' * 60,
+            '',
+        ]
+        if job['exit_code'] == 0:
+            lines.append('Successfully completed.')
+        else:
+            if job['exit_code'] == KILLED_EXIT_CODE:
+                lines.append('TERM_OWNER: job killed by owner.')
+            lines.append('Exited with exit code %d.' % job['exit_code'])
+        lines.extend([
+            '',
+            'Resource usage summary:',
+            '',
+            '    CPU time :                                   %.2f sec.' %
+            (run_time * 0.9),
+            '    Max Memory :                                 %s MB' %
+            self.get('max_memory'),
+            '    Run time :                                   %d sec.' %
+            round(run_time),
+            '',
+            'The output (if any) follows:',
+            '',
+            'Simulated by fakelsf.',
+            '',
+        ])
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            return
+        with open(path, 'w') as report:
+            report.write('\n'.join(lines))
+
+    # Commands
+
+    def get_job_id(self, job):
+        if job['array_index']:
+            return '%d[%d]' % (job['id'], job['array_index'])
+        return str(job['id'])
+
+    def get_name(self, job):
+        if job['array_index']:
+            return '%s[%d]' % (job['name'], job['array_index'])
+        return job['name']
+
+    def bsub(self, args, stdin=None):
+        options = dict()
+        command = list()
+        args = list(args)
+        while args:
+            arg = args.pop(0)
+            if command or not arg.startswith('-'):
+                command.append(arg)
+            elif arg in BSUB_VALUE_OPTIONS:
+                if not args:
+                    self.err.write('%s: option requires a value\n' % arg)
+                    return 255
+                options[arg] = args.pop(0)
+            else:
+                options[arg] = True
+        command = ' '.join(command)
+        if not command and stdin is not None:
+            command = stdin.read().strip()
+        if not command:
+            self.err.write('Job not submitted: no command\n')
+            return 255
+        name = options.get('-J', command.split()[0])
+        indices = [0]
+        match = array_name_expr.match(name)
+        if match:
+            name = match.group(1)
+            indices = range(int(match.group(2)), int(match.group(3)) + 1)
+        queue = options.get('-q', self.get('queue'))
+        condition = options.get('-w')
+        cursor = self.begin()
+        try:
+            job_id = self.next_id(cursor)
+            for index in indices:
+                started_at = finished_at = exit_code = None
+                if not condition:
+                    started_at, finished_at, exit_code = self.schedule(
+                        job_id, index, self.now)
+                cursor.execute(
+                    'INSERT INTO jobs (id, array_index, name, user, queue, '
+                    'command, report, condition, orphan_kill, submitted_at, '
+                    'started_at, finished_at, exit_code) VALUES '
+                    '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (job_id, index, name, getpass.getuser(), queue, command,
+                     options.get('-o'), condition, int('-ti' in options),
+                     self.now, started_at, finished_at, exit_code))
+        finally:
+            cursor.execute('COMMIT')
+        self.out.write('Job <%d> is submitted to queue <%s>.\n' % (job_id,
+                                                                  queue))
+        return 0
+
+    def parse_format(self, text):
+        '''Fields and delimiter of bjobs -o'''
+        fields = list()
+        delimiter = ' '
+        for token in text.split():
+            if token.startswith('delimiter='):
+                delimiter = token.split('=', 1)[1].strip('\'"')
+            else:
+                fields.append(token.split(':')[0].lower())
+        return fields, delimiter
+
+    def get_field(self, job, field):
+        status = self.get_status(job)
+        if field == 'jobid':
+            return str(job['id'])
+        if field == 'jobindex':
+            return str(job['array_index'])
+        if field == 'user':
+            return job['user']
+        if field == 'stat':
+            return status
+        if field == 'queue':
+            return job['queue']
+        if field == 'from_host':
+            return self.get('hostname')
+        if field == 'exec_host':
+            return '-' if status == 'PEND' else self.get('hostname')
+        if field == 'job_name':
+            return self.get_name(job)
+        if field == 'submit_time':
+            return time.strftime(TIME_FMT, time.localtime(job['submitted_at']))
+        return '-'
+
+    def select_jobs(self, specs):
+        '''Jobs by specs like "12" or "12[3]", and specs not found'''
+        jobs = list()
+        missing = list()
+        for start in xrange(0, len(specs), CHUNK_SIZE):
+            chunk = specs[start:start + CHUNK_SIZE]
+            ids = set()
+            for spec in chunk:
+                match = job_spec_expr.match(spec)
+                if match:
+                    ids.add(int(match.group(1)))
+            found = dict()
+            if ids:
+                rows = self.connection.execute(
+                    'SELECT * FROM jobs WHERE id IN (%s) ORDER BY id, '
+                    'array_index' % ', '.join('?' * len(ids)), tuple(ids))
+                for job in rows:
+                    found.setdefault(job['id'], list()).append(job)
+            for spec in chunk:
+                match = job_spec_expr.match(spec)
+                selected = list()
+                if match:
+                    selected = found.get(int(match.group(1)), list())
+                    if match.group(2) is not None:
+                        selected = [job for job in selected if
+                                    job['array_index'] == int(match.group(2))]
+                if selected:
+                    jobs.extend(selected)
+                else:
+                    missing.append(spec)
+        return jobs, missing
+
+    def bjobs(self, args):
+        options = dict()
+        specs = list()
+        args = list(args)
+        while args:
+            arg = args.pop(0)
+            if arg in ('-o', '-J', '-u', '-q', '-m'):
+                options[arg] = args.pop(0) if args else ''
+            elif arg.startswith('-'):
+                options[arg] = True
+            else:
+                specs.append(arg)
+        self.advance()
+        if specs:
+            jobs, missing = self.select_jobs(specs)
+        else:
+            jobs = self.connection.execute(
+                'SELECT * FROM jobs ORDER BY id, array_index').fetchall()
+            missing = list()
+            if '-a' not in options:
+                jobs = [job for job in jobs
+                        if self.get_status(job) in ('PEND', 'RUN')]
+        if '-J' in options:
+            jobs = [job for job in jobs if fnmatch.fnmatchcase(
+                self.get_name(job), options['-J'])
+                or fnmatch.fnmatchcase(job['name'], options['-J'])]
+        for spec in missing:
+            self.err.write('Job <%s> is not found\n' % spec)
+        if not jobs:
+            if not missing:
+                self.err.write('No %sjob found\n' % (
+                    '' if '-a' in options else 'unfinished '))
+            return 255
+        if '-o' in options:
+            fields, delimiter = self.parse_format(options['-o'])
+            if '-noheader' not in options:
+                self.out.write(delimiter.join(field.upper()
+                                              for field in fields) + '\n')
+            for job in jobs:
+                self.out.write(delimiter.join(
+                    self.get_field(job, field) for field in fields) + '\n')
+        else:
+            if '-noheader' not in options:
+                self.out.write(' '.join(title.ljust(width) for field, title,
+                                        width in LIST_COLUMNS).rstrip() + '\n')
+            for job in jobs:
+                self.out.write(' '.join(
+                    self.get_field(job, field).ljust(width) for field, title,
+                    width in LIST_COLUMNS).rstrip() + '\n')
+        return 255 if missing else 0
+
+    def bkill(self, args):
+        specs = [arg for arg in args if not arg.startswith('-')]
+        if not specs:
+            self.err.write('Job ID argument is required\n')
+            return 255
+        self.advance()
+        if '0' in specs:
+            jobs = self.connection.execute(
+                'SELECT * FROM jobs WHERE user = ?',
+                (getpass.getuser(),)).fetchall()
+            missing = list()
+        else:
+            jobs, missing = self.select_jobs(specs)
+        for spec in missing:
+            self.err.write('Job <%s>: No matching job found\n' % spec)
+        cursor = self.begin()
+        try:
+            for job in jobs:
+                if self.get_status(job) in ('DONE', 'EXIT'):
+                    if '0' not in specs:
+                        self.err.write('Job <%s>: Job has already finished\n'
+                                       % self.get_job_id(job))
+                    continue
+                cursor.execute(
+                    'UPDATE jobs SET finished_at = ?, exit_code = ? '
+                    'WHERE id = ? AND array_index = ?',
+                    (self.now, KILLED_EXIT_CODE, job['id'],
+                     job['array_index']))
+                self.out.write('Job <%s> is being terminated\n' %
+                               self.get_job_id(job))
+        finally:
+            cursor.execute('COMMIT')
+        # Reports of killed jobs are written at once.
+        self.advance()
+        return 255 if missing else 0
+
+
+def setup(bin_path, home=None):
+    '''Write bsub, bjobs and bkill commands into bin_path.'''
+    if home is None:
+        home = os.environ.get(HOME_ENV, DEFAULT_HOME)
+    home = os.path.abspath(os.path.expanduser(home))
+    src_path = os.path.dirname(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))))
+    for path in (bin_path, home):
+        if not os.path.exists(path):
+            os.makedirs(path)
+    for command in COMMANDS:
+        path = os.path.join(bin_path, command)
+        with open(path, 'w') as wrapper:
+            wrapper.write(WRAPPER % dict(python=sys.executable,
+                                         src_path=src_path,
+                                         command=command, home=home))
+        os.chmod(path, 0755)
+    return home
+
+
+def main(command, args, home=None):
+    home = os.environ.get(HOME_ENV, home)
+    if command == 'setup':
+        if not args:
+            sys.stderr.write('Usage: setup <bin dir> [<state dir>]\n')
+            return 2
+        home = setup(args[0], args[1] if len(args) > 1 else home)
+        sys.stdout.write('Fake LSF commands in %s use state in %s\n' % (
+            args[0], home))
+        return 0
+    fake_lsf = FakeLsf(home)
+    if command == 'bsub':
+        return fake_lsf.bsub(args, sys.stdin)
+    if command == 'bjobs':
+        return fake_lsf.bjobs(args)
+    if command == 'bkill':
+        return fake_lsf.bkill(args)
+    sys.stderr.write('Unknown command: %s\n' % command)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1] if len(sys.argv) > 1 else '', sys.argv[2:]))
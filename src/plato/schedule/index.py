@@ -0,0 +1,123 @@
+'''
+Resident index of parsed job files, so that repeated loading of jobs only pays
+for folders (and files) which have changed since the previous scan.
+'''
+import os
+import stat
+import logging
+from time import time
+
+
+logger = logging.getLogger(__name__)
+
+
+# A folder modified that recently is always rescanned, since further changes
+# within the timestamp granularity of the file system would go unnoticed.
+RACY_SECS = 2.0
+
+
+class FolderIndex(object):
+
+    def __init__(self, racy_secs=RACY_SECS):
+        self.racy_secs = racy_secs
+        # folder -> (folder signature, {name: (file signature, item)},
+        #            names of subfolders)
+        self.folders = dict()
+
+    def forget(self, folder=None):
+        if folder is None:
+            self.folders.clear()
+        else:
+            self.folders.pop(folder, None)
+
+    def scan(self, folder, name_pattern, load, is_valid=None,
+             folder_pattern=None):
+        '''
+        Return items loaded from files of the folder matching compiled
+        `name_pattern`. `load(pathname)` is called only for new or modified
+        files, or if cached item is not `is_valid(item)` anymore. Names of
+        subfolders matching `folder_pattern` are kept for get_subfolders().
+        '''
+        try:
+            folder_stat = os.stat(folder)
+        except OSError:
+            self.forget(folder)
+            return list()
+        signature = (folder_stat.st_ino, folder_stat.st_mtime)
+        is_racy = time() - folder_stat.st_mtime < self.racy_secs
+        cached = self.folders.get(folder)
+        if cached is not None and not is_racy and cached[0] == signature:
+            entries = cached[1]
+            if is_valid is None or all(is_valid(item) for file_signature, item
+                                       in entries.itervalues()):
+                return [item for file_signature, item in entries.itervalues()]
+        previous_entries = dict()
+        if cached is not None:
+            previous_entries = cached[1]
+        entries, subfolders = self.rescan(folder, name_pattern, load,
+                                          is_valid, previous_entries,
+                                          folder_pattern)
+        self.folders[folder] = (signature, entries, subfolders)
+        return [item for file_signature, item in entries.itervalues()]
+
+    def get_subfolders(self, folder):
+        '''Names of subfolders found by the last scan() of the folder'''
+        cached = self.folders.get(folder)
+        if cached is None:
+            return list()
+        return cached[2]
+
+    def walk(self, folder, name_pattern, load, folder_pattern, max_depth,
+             is_valid=None):
+        '''
+        Like scan(), of the folder and its subfolders matching
+        `folder_pattern` down to `max_depth` levels. Unchanged folders cost
+        a single stat, only changed ones are listed again.
+        '''
+        items = list()
+        folders = [(folder, 0)]
+        while folders:
+            folder, depth = folders.pop()
+            pattern = folder_pattern if depth < max_depth else None
+            items.extend(self.scan(folder, name_pattern, load, is_valid,
+                                   pattern))
+            if pattern is not None:
+                folders.extend((os.path.join(folder, name), depth + 1)
+                               for name in self.get_subfolders(folder))
+        return items
+
+    def rescan(self, folder, name_pattern, load, is_valid, previous_entries,
+               folder_pattern=None):
+        entries = dict()
+        subfolders = list()
+        for name in os.listdir(folder):
+            if name_pattern.match(name) is None:
+                if folder_pattern is not None \
+                        and folder_pattern.match(name) is not None \
+                        and os.path.isdir(os.path.join(folder, name)):
+                    subfolders.append(name)
+                continue
+            pathname = os.path.join(folder, name)
+            try:
+                file_stat = os.stat(pathname)
+            except OSError:
+                # Removed meanwhile.
+                continue
+            if not stat.S_ISREG(file_stat.st_mode):
+                continue
+            file_signature = (file_stat.st_ino, file_stat.st_mtime,
+                              file_stat.st_size)
+            previous = previous_entries.get(name)
+            if previous is not None and previous[0] == file_signature \
+                    and (is_valid is None or is_valid(previous[1])):
+                entries[name] = previous
+                continue
+            try:
+                item = load(pathname)
+            except (IOError, OSError, ValueError) as error:
+                logger.warn('Failed to load %s: %s', pathname, error)
+                continue
+            if item is None:
+                continue
+            entries[name] = (file_signature, item)
+        return entries, subfolders
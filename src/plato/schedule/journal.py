@@ -0,0 +1,280 @@
+'''
+Journaling persistence monitor. Instead of removing and rewriting a JSON file
+per state change, every transition is appended as a compact record to a log.
+State is rebuilt from the last snapshot plus the tail of the log and the log
+is periodically compacted into a new snapshot in a background thread.
+
+Files kept in the state path (for job prefix e.g. LOCAL):
+
+    LOCAL_journal.snapshot  - {"base": <generation>, "jobs": [...]}
+    LOCAL_journal.<N>.log   - records of generation N, one JSON per line
+    LOCAL_journal.lock      - flock guarding appends and compaction
+
+Readers (e.g. `plato list`) take a shared lock and apply only complete lines,
+so they always see a state as of some transition boundary.
+
+Select it by setting `monitor = journal` in the [scheduler] config section.
+'''
+import os
+import re
+import json
+import fcntl
+import logging
+import threading
+from contextlib import contextmanager
+
+from plato.schedule import Monitor, status_set
+
+
+logger = logging.getLogger(__name__)
+
+
+NEW_LINE = '\n'
+# Compact log into a snapshot after that many records.
+COMPACT_RECORDS = 10000
+# Snapshots start with their base, so it is read without loading the jobs.
+snapshot_base_expr = re.compile(r'^\{"base": (\d+),')
+
+
+class JournalMonitor(Monitor):
+
+    def __init__(self, state_path, job_prefix, is_interactive=False):
+        super(JournalMonitor, self).__init__(state_path, job_prefix,
+                                             is_interactive)
+        self.compact_records = COMPACT_RECORDS
+        journal_name = '%s_journal' % job_prefix
+        self.snapshot_path = os.path.join(state_path, journal_name + '.snapshot')
+        self.lock_path = os.path.join(state_path, journal_name + '.lock')
+        self.log_path_template = os.path.join(state_path,
+                                              journal_name + '.%d.log')
+        # Job descriptions by id, as of (generation, offset) of the log.
+        self.jobs = None
+        self.generation = 0
+        self.offset = 0
+        self.records_since_snapshot = 0
+        self.__compactor = None
+
+    def get_db_folders(self):
+        # No status folders, those are kept in the journal.
+        return ['pidfiles', 'attachments', 'reports']
+
+    def init_db(self):
+        super(JournalMonitor, self).init_db()
+        config = self.scheduler.config
+        if config.has_option('scheduler', 'journal_compact_records'):
+            self.compact_records = config.getint('scheduler',
+                                                 'journal_compact_records')
+        self.refresh()
+
+    def get_log_path(self, generation):
+        return self.log_path_template % generation
+
+    @contextmanager
+    def locked(self, operation):
+        lock_file = open(self.lock_path, 'a+')
+        try:
+            fcntl.flock(lock_file.fileno(), operation)
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            lock_file.close()
+
+    def load_snapshot(self):
+        self.jobs = dict()
+        self.generation = 0
+        self.offset = 0
+        self.records_since_snapshot = 0
+        if not os.path.exists(self.snapshot_path):
+            return
+        snapshot = json.load(open(self.snapshot_path))
+        self.generation = snapshot['base']
+        for description in snapshot['jobs']:
+            self.jobs[description['id']] = description
+
+    def apply(self, record):
+        op = record['op']
+        if op == 'put':
+            description = record['job']
+            self.jobs[description['id']] = description
+        elif op == 'set':
+            # Never mutate stored description in place, snapshot writer may
+            # still be serializing it.
+            description = dict(self.jobs[record['id']])
+            description.update(record['fields'])
+            self.jobs[record['id']] = description
+        elif op == 'del':
+            self.jobs.pop(record['id'], None)
+        else:
+            logger.warn('Unknown journal record: %s', record)
+        self.records_since_snapshot += 1
+
+    def replay_log(self):
+        '''Apply complete records of current log generation past offset.'''
+        log_path = self.get_log_path(self.generation)
+        if not os.path.exists(log_path):
+            return False
+        with open(log_path, 'rb') as log:
+            log.seek(self.offset)
+            for line in log:
+                if not line.endswith(NEW_LINE):
+                    # Incomplete record of an interrupted append.
+                    break
+                self.apply(json.loads(line))
+                self.offset += len(line)
+        return True
+
+    def catch_up(self):
+        '''Must be called with (at least shared) lock held.'''
+        if self.jobs is None or \
+                not os.path.exists(self.get_log_path(self.generation)):
+            # First load or our log has been compacted away meanwhile.
+            self.load_snapshot()
+        self.replay_log()
+        # Follow newer generations started by compaction.
+        while os.path.exists(self.get_log_path(self.generation + 1)):
+            self.generation += 1
+            self.offset = 0
+            self.records_since_snapshot = 0
+            self.replay_log()
+
+    def refresh(self):
+        with self.locked(fcntl.LOCK_SH):
+            self.catch_up()
+
+    def write_records(self, records):
+        '''Must be called with exclusive lock held and state caught up.'''
+        lines = [json.dumps(record) + NEW_LINE for record in records]
+        data = ''.join(lines)
+        with open(self.get_log_path(self.generation), 'ab') as log:
+            if log.tell() > self.offset:
+                # Drop garbage left by an interrupted append.
+                log.truncate(self.offset)
+            log.write(data)
+            log.flush()
+            os.fsync(log.fileno())
+        # Apply decoded copies, so later mutation of jobs does not leak in.
+        for line in lines:
+            self.apply(json.loads(line))
+        self.offset += len(data)
+        if self.records_since_snapshot >= self.compact_records:
+            self.start_compaction()
+
+    def append(self, records):
+        with self.locked(fcntl.LOCK_EX):
+            self.catch_up()
+            self.write_records(records)
+
+    def start_compaction(self):
+        '''
+        Must be called with exclusive lock held. Starts a new log generation
+        at once and serializes the snapshot in a background thread.
+        '''
+        if self.__compactor is not None and self.__compactor.is_alive():
+            return
+        jobs = self.jobs.values()
+        self.generation += 1
+        self.offset = 0
+        self.records_since_snapshot = 0
+        open(self.get_log_path(self.generation), 'ab').close()
+        # Not a daemon thread, so that a short-lived process (e.g. `plato
+        # submit`) finishes the snapshot before it exits.
+        self.__compactor = threading.Thread(
+            target=self.write_snapshot, args=(jobs, self.generation))
+        self.__compactor.start()
+
+    def read_snapshot_base(self):
+        '''Base of the current snapshot, -1 if there is none.'''
+        if not os.path.exists(self.snapshot_path):
+            return -1
+        with open(self.snapshot_path, 'rb') as snapshot:
+            match = snapshot_base_expr.match(snapshot.read(64))
+        if match is not None:
+            return int(match.group(1))
+        return json.load(open(self.snapshot_path))['base']
+
+    def write_snapshot(self, jobs, base):
+        logger.info('Compacting journal into snapshot of (%d) jobs', len(jobs))
+        temp_path = '%s.%d.%d' % (self.snapshot_path, os.getpid(), base)
+        with open(temp_path, 'wb') as snapshot:
+            snapshot.write('{"base": %d, "jobs": ' % base)
+            json.dump(jobs, snapshot)
+            snapshot.write('}')
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        with self.locked(fcntl.LOCK_EX):
+            if self.read_snapshot_base() >= base:
+                # A newer compaction (e.g. by another process) has finished
+                # first and removed logs this snapshot would need.
+                logger.info('Dropping stale snapshot of generation (%d)', base)
+                os.remove(temp_path)
+                return
+            os.rename(temp_path, self.snapshot_path)
+            # Logs before the base are now covered by the snapshot.
+            generation = base - 1
+            while os.path.exists(self.get_log_path(generation)):
+                os.remove(self.get_log_path(generation))
+                generation -= 1
+
+    def wait_for_compaction(self):
+        if self.__compactor is not None:
+            self.__compactor.join()
+
+    def copy_job(self, description):
+        # Jobs are mutated by the scheduler, hand out private copies.
+        return self.restore_job(json.loads(json.dumps(description)))
+
+    def load_jobs(self, status_mask=status_set):
+        self.refresh()
+        return [self.copy_job(self.jobs[job_id])
+                for job_id in sorted(self.jobs)
+                if self.jobs[job_id]['status'] in status_mask]
+
+    def make_set_record(self, job):
+        '''Record only top-level fields that differ from the journal.'''
+        description = self.describe_job(job)
+        old_description = self.jobs.get(job.id)
+        if old_description is None:
+            return {'op': 'put', 'job': description}
+        fields = dict((key, value) for key, value in description.iteritems()
+                      if old_description.get(key) != value)
+        return {'op': 'set', 'id': job.id, 'fields': fields}
+
+    def detach_job(self, job):
+        '''Make job invisible for the monitor'''
+        if not job.is_attached:
+            # Job is already detached from the monitor.
+            return
+        self.append([{'op': 'del', 'id': job.id}])
+        job.is_attached = False
+
+    def attach_job(self, job):
+        if job.is_attached:
+            logger.warn('Job is already attached to the monitor.')
+            return
+        self.append([{'op': 'put', 'job': self.describe_job(job)}])
+        job.is_attached = True
+
+    def attach_jobs(self, jobs):
+        jobs = [job for job in jobs if not job.is_attached]
+        self.append([{'op': 'put', 'job': self.describe_job(job)}
+                     for job in jobs])
+        for job in jobs:
+            job.is_attached = True
+
+    def change_status(self, job, status):
+        '''Append a single transition record'''
+        job.status = status
+        with self.locked(fcntl.LOCK_EX):
+            self.catch_up()
+            self.write_records([self.make_set_record(job)])
+        job.is_attached = True
+
+    def change_statuses(self, jobs, status):
+        '''Append transition records of many jobs at once'''
+        for job in jobs:
+            job.status = status
+        with self.locked(fcntl.LOCK_EX):
+            self.catch_up()
+            self.write_records([self.make_set_record(job) for job in jobs])
+        for job in jobs:
+            job.is_attached = True
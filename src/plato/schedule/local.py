@@ -2,20 +2,21 @@
 Implementation of "local" scheduler that can run on a local linux machine in 
 multiprocessing mode. 
 '''
-import re
 import os
 import sys
 import time
+import signal
 import logging
-from StringIO import StringIO
-from datetime import datetime
-from daemon.daemon import DaemonContext
 import errno
-from lockfile import LockTimeout
-from daemon.pidlockfile import TimeoutPIDLockFile
-from subprocess import PIPE, Popen
+from select import select
 
 from plato.schedule import (Monitor, Scheduler, JobRunner, JobResult)
+from plato.schedule.sharding import make_folder
+from plato.schedule.workers import WorkerPool, run_job, make_event
+from plato.schedule.usage import parse_local_usage
+from plato.schedule.reports import ReportParser
+from plato.schedule.slots import ResourceLedger, get_task_request
+from plato.schedule import arrays
 
 
 logger = logging.getLogger(__name__)
@@ -26,19 +27,11 @@ class ExecProcessError(Exception):
 
 
 NEW_LINE = '\n'
-NUM_SECTION_LINES = 1000
 HZ = os.sysconf(os.sysconf_names['SC_CLK_TCK'])
-SPAWN_TRIES = 3
+# Seconds to wait for a forked job to report its start.
+SPAWN_TIMEOUT = 3
 
 
-def strfdelta(tdelta, fmt):
-    d = {"days": tdelta.days}
-    d["hours"], rem = divmod(tdelta.seconds, 3600)
-    d["minutes"], d["seconds"] = divmod(rem, 60)
-    return fmt.format(**d)
-
-LOCAL_TIME_FMT = '{days} days {hours}:{minutes}:{seconds}'
-
 class ProcessUtil(object):
     
     __boot_time = None
@@ -60,6 +53,25 @@ class ProcessUtil(object):
         age_timestamp = cls.get_boot_time() + age_from_boot_timestamp
         return age_timestamp
 
+    @classmethod
+    def read_process_stat(cls, pid):
+        '''
+        State and start time of the process, the only fields needed to tell
+        if a job runs. None if there is no such process.
+        '''
+        try:
+            with open('/proc/%d/stat' % int(pid)) as stat_file:
+                process_stat = stat_file.read()
+        except (IOError, ValueError):
+            return
+        # Command name in parentheses may contain spaces.
+        fields = process_stat[process_stat.rindex(')') + 2:].split()
+        return dict(
+            id=str(pid),
+            state=fields[0],
+            running_since=cls.get_boot_time() + int(fields[19]) / HZ,
+        )
+
     @classmethod
     def list_processes(cls):
         '''See also man 5 proc'''
@@ -84,7 +96,23 @@ class ProcessUtil(object):
                 logger.debug('Can not read process (%d). Skipping..', pid)
 
     @classmethod
-    def exec_process(cls, shell_command, report_filename, pidfile_path):
+    def send_status(cls, status_fd, line):
+        try:
+            os.write(status_fd, line + NEW_LINE)
+        except OSError:
+            # Nobody is listening anymore, e.g. `plato run` has exited.
+            pass
+
+    @classmethod
+    def exec_process(cls, shell_command, report_filename, pidfile_path,
+                     output_cap=0):
+        '''
+        Spawn a daemonized process running the command. Returns StatusPipe
+        the process reports its start and completion to.
+        '''
+        # Needed by the fork executor only, imported once it is used.
+        from daemon.daemon import DaemonContext
+        from lockfile import LockTimeout
         
         def fork_parent(shell_command, report_filename, pidfile, error_message):
             """ Fork a child process.
@@ -93,68 +121,40 @@ class ProcessUtil(object):
                 with ``error_message``.
                 """
             try:
+                status_reader, status_writer = os.pipe()
                 pid = os.fork()
                 if pid > 0:
-                    logger.debug('Waiting for pidfile which means process '
-                                 'was spawned.')
+                    os.close(status_writer)
+                    logger.debug('Waiting for the process to report its '
+                                 'start.')
                     os.waitpid(pid, 0)  
-                    if os.path.exists(pidfile.path):
-                        logger.debug('Giving it another try while waiting '
-                                     'for pidfile..')
-                        return pid     
-                    # Give it even more chances.. Waiting for th pidfile.               
-                    for try_num in xrange(SPAWN_TRIES):
-                        print '.'                                                
-                        if os.path.exists(pidfile.path):
-                            return pid
-                        time.sleep(1)
-                    raise ExecProcessError('Failed to spawn process '
-                                           'after (%d) retries..' % SPAWN_TRIES)
+                    status_pipe = StatusPipe(status_reader)
+                    if not status_pipe.wait_started(SPAWN_TIMEOUT):
+                        status_pipe.close()
+                        raise ExecProcessError('Failed to spawn process '
+                                               'within (%d) sec..' %
+                                               SPAWN_TIMEOUT)
+                    return status_pipe
                 else:
-                    with DaemonContext(
-                        pidfile=pidfile,
-                        stdout=sys.stdout,
-                        stderr=sys.stderr,
-                        detach_process=True) as process:                        
-                        process_error = ''
-                        # Write report file.            
-                        report = open(report_filename, 'a+')
-                        started_at = datetime.now()
-                        success = True
-                        try:
-                            cmd_args = shell_command.split(' ')
-                            proc = Popen(cmd_args, stdout=PIPE, stderr=PIPE)
-                            process_output, process_error = proc.communicate()
-                            # TODO: check return code?
-                        except Exception as exception:
-                            stderr = StringIO()
-                            process_error = repr(exception)                            
-                            exc_type, exc_value, exc_traceback = sys.exc_info()
-                            #traceback.print_exception(exc_type, exc_value, exc_traceback,
-                            #      limit=3, file=stderr)
-                            process_error += '\n' + stderr.getvalue().strip()
-                            print process_error
-                            success = False
-                        time.sleep(5)
-                        elapsed = datetime.now() - started_at                                            
-                        # TODO: gather /proc stats for current process            
-                        report.write('Elapsed time: %s \n' % \
-                                     strfdelta(elapsed, LOCAL_TIME_FMT))                        
-                        report.write('Your job looked like:\n')
-                        report.write(shell_command + '\n')
-                        if success:
-                            report.write('Successfully completed.\n')
-                        else:
-                            report.write('Job failed with an error: %s.\n' % process_error)
-                        report.write('The output (if any) follows:\n')
-                        report.write('Process output was:\n')
-                        report.write(process_output)                        
-                        report.write('Process stderror was:\n')
-                        report.write(process_error)
-                        report.close()
-                    # Exit child after work is done.
-                    #os._exit(0)
-                    exit(0)
+                    try:
+                        os.close(status_reader)
+                        with DaemonContext(
+                            pidfile=pidfile,
+                            stdout=sys.stdout,
+                            stderr=sys.stderr,
+                            files_preserve=[status_writer],
+                            detach_process=True) as process:                        
+                            started_at = time.time()
+                            cls.send_status(status_writer, 'run %d %r' % (
+                                os.getpid(), started_at))
+                            exit_code = run_job(shell_command,
+                                                report_filename, output_cap)
+                            cls.send_status(status_writer, 'done %s %r %r' % (
+                                exit_code, started_at, time.time()))
+                    finally:
+                        # Exit child after work is done, never return into
+                        # the code of the forking process.
+                        os._exit(0)
             except OSError, exc:
                 exc_errno = exc.errno
                 exc_strerror = exc.strerror
@@ -167,16 +167,17 @@ class ProcessUtil(object):
                 raise ExecProcessError('Error! A pidfile already exists: ' +
                                        pidfile_path)
             pidfile = cls.get_pidfile(pidfile_path)                    
-            pid = fork_parent(shell_command, report_filename, pidfile,                          
-                              error_message="Failed to fork")
+            status_pipe = fork_parent(shell_command, report_filename, pidfile,
+                                      error_message="Failed to fork")
             # TODO: think of using os.setsid()?
-            return pid
+            return status_pipe
         except LockTimeout:
             raise ExecProcessError('Process pidfile is locked: ' + pidfile_path)        
 
     @classmethod
     def get_pidfile(cls, pidfile_path):
         '''Note that pidfile_path must be absolute'''        
+        from daemon.pidlockfile import TimeoutPIDLockFile
         return TimeoutPIDLockFile(
                 pidfile_path, 
                 acquire_timeout=5,
@@ -194,6 +195,32 @@ class ProcessUtil(object):
         else:
             return True
 
+    @classmethod
+    def kill_group(cls, pid, signum=signal.SIGTERM):
+        '''
+        Signal process group of a daemonized job, i.e. the job process and
+        the command it runs. Returns False if there is no such process.
+        '''
+        try:
+            group_id = os.getpgid(pid)
+            if group_id == os.getpgrp():
+                # Not detached from us, spare our own group.
+                os.kill(pid, signum)
+            else:
+                os.killpg(group_id, signum)
+        except OSError as error:
+            logger.debug('Failed to kill process (%d): %s', pid, error)
+            return False
+        return True
+
+    @classmethod
+    def read_pid(cls, pidfile_path):
+        '''Pid from the pidfile, None if there is none'''
+        try:
+            return int(open(pidfile_path).read().strip())
+        except (IOError, ValueError):
+            return
+
     @classmethod
     def process_runs(cls, pidfile_path):
         logger.debug('Process runs? ' + pidfile_path)      
@@ -208,13 +235,127 @@ class ProcessUtil(object):
         return False
 
 
+class StatusPipe(object):
+    '''
+    Read end of the pipe a forked job writes its start and completion to,
+    as lines "run <pid> <started at>" and
+    "done <exit code> <started at> <finished at>".
+    '''
+
+    def __init__(self, fd):
+        self.fd = fd
+        self.buffer = ''
+        self.pid = None
+        self.started_at = None
+        self.event = None
+        self.is_closed = False
+
+    def fileno(self):
+        return self.fd
+
+    def read(self):
+        '''Parse whatever is available without blocking.'''
+        while not self.is_closed and select([self.fd], [], [], 0)[0]:
+            data = os.read(self.fd, 4096)
+            if not data:
+                self.close()
+                break
+            self.buffer += data
+        while NEW_LINE in self.buffer:
+            line, self.buffer = self.buffer.split(NEW_LINE, 1)
+            fields = line.split()
+            if fields[0] == 'run':
+                self.pid = int(fields[1])
+                self.started_at = float(fields[2])
+            elif fields[0] == 'done':
+                exit_code = None
+                if fields[1] != 'None':
+                    exit_code = int(fields[1])
+                self.event = make_event(exit_code, float(fields[2]),
+                                        float(fields[3]))
+
+    def wait_started(self, timeout):
+        deadline = time.time() + timeout
+        self.read()
+        while self.pid is None and not self.is_closed:
+            remaining = deadline - time.time()
+            if remaining <= 0 or not select([self.fd], [], [], remaining)[0]:
+                break
+            self.read()
+        return self.pid is not None
+
+    @property
+    def is_finished(self):
+        return self.event is not None or self.is_closed
+
+    def close(self):
+        if not self.is_closed:
+            os.close(self.fd)
+            self.is_closed = True
+
+
 class LocalRunner(JobRunner):
     
     def __init__(self, report_path=None):
         super(LocalRunner, self).__init__(report_path)
         self.__pidfiles_path = None
+        self.__pool = None
+        self.__ledger = None
+        # Status pipes of forked jobs by job id, or by (job id, index) for
+        # tasks of job arrays
+        self.status_pipes = dict()
+        # Completion events by the same keys, until taken by get_result()
+        # or update_tasks()
+        self.events = dict()
+        self.finished_job_ids = set()
+        # Keys of killed jobs and tasks, their completion is ignored
+        self.killed_keys = set()
+
+    @property
+    def pool(self):
+        '''Pool of worker processes if `executor = pool`, otherwise None'''
+        if self.__pool is None:
+            config = self.scheduler.config
+            if not config.has_option('local', 'executor') \
+                    or config.get('local', 'executor').lower() != 'pool':
+                return
+            pool_size = 0
+            if config.has_option('local', 'pool_size'):
+                pool_size = config.getint('local', 'pool_size')
+            self.__pool = WorkerPool(pool_size, self.output_cap)
+        return self.__pool
+
+    @property
+    def ledger(self):
+        '''Cores and memory of the machine held by local jobs'''
+        if self.__ledger is None:
+            self.__ledger = ResourceLedger.from_config(self.scheduler.config)
+            self.__ledger.reset(
+                self.scheduler.monitor.load_jobs(['pending', 'run']))
+        return self.__ledger
+
+    def admit_jobs(self, jobs):
+        '''Accept jobs only while there are cores and memory left.'''
+        if not jobs:
+            return jobs
+        holding_jobs = self.scheduler.monitor.load_jobs(['pending', 'run'])
+        return self.ledger.admit(jobs, holding_jobs)
+
+    @property
+    def output_cap(self):
+        '''Bytes of output and error kept in a report, 0 keeps all'''
+        config = self.scheduler.config
+        if config.has_option('local', 'output_cap'):
+            return config.getint('local', 'output_cap')
+        return 0
+
+    def get_pool_state(self, job):
+        '''State of the job run by the pool, None if pool does not know it.'''
+        if self.pool is None:
+            return
+        return self.pool.get_state(job.id)
     
-    def get_pidfile_path(self, id):
+    def get_pidfile_path(self, id, index=None):
         '''A path to a folder where to keep pids of running jobs'''
         if self.__pidfiles_path is None:
             self.__pidfiles_path = self.scheduler.config.get('local', 'pidfiles_path')
@@ -223,10 +364,16 @@ class LocalRunner(JobRunner):
             self.__pidfiles_path = os.path.abspath(self.__pidfiles_path)
             if not os.path.exists(self.__pidfiles_path):
                 raise Exception('Pid path does not exists: ' + self.__pidfiles_path)
-        return os.path.join(self.__pidfiles_path, 'localjob_%d.pid' % int(id))
+        if index is not None:
+            return self.layout.get_path(self.__pidfiles_path, int(id),
+                                        'localjob_%d.%d.pid' % (int(id), index))
+        return self.layout.get_path(self.__pidfiles_path, int(id),
+                                    'localjob_%d.pid' % int(id))
             
     def is_running(self, job):
         '''Checking pidfiles and existence of process via os signaling'''
+        if job.info.get('local_executor') == 'pool':
+            return self.get_pool_state(job) == 'run'
         local_id = job.info['local_id']
         pidfile_path = job.info['local_pidfile_path']
         if not ProcessUtil.process_runs(pidfile_path) \
@@ -238,8 +385,14 @@ class LocalRunner(JobRunner):
         return found_job_info['local_status'].lower() == 'run'
 
     def is_done(self, job):
-        pidfile_path = job.info['local_pidfile_path']
-        if ProcessUtil.process_runs(pidfile_path):
+        if job.info.get('local_executor') == 'pool':
+            state = self.get_pool_state(job)
+            if state in ('pending', 'run'):
+                return False
+            if state == 'done':
+                self.pool.forget(job.id)
+            # Otherwise lost by a previous daemon, look for the report.
+        elif ProcessUtil.process_runs(job.info['local_pidfile_path']):
             return False
         # We know that the process is not running anymore.
         # We read the pid from the pidfile and check its existence
@@ -255,21 +408,38 @@ class LocalRunner(JobRunner):
     def execute(self, job):
         super(LocalRunner, self).execute(job)
         result = JobResult(has_failed=True, details=job.info.copy())        
-        if job.info['queue'] == 'default':
-            report_filename = self.get_report_filepath(job)
+        if job.info['queue'] == 'default' and arrays.is_array(job):
+            # Tasks are expanded lazily, as capacity allows.
+            result.details['local_queue'] = job.info['queue']
+            result.details['local_executor'] = \
+                'fork' if self.pool is None else 'pool'
+            self.launch_tasks(job)
+            result.has_failed = False
+        elif job.info['queue'] == 'default':
+            report_filename = self.make_report_filepath(job)
             with open(report_filename, 'w+') as report:
                 report.write('Submitting job [%d] with report file: %s \n' % \
                              (job.id, report_filename))
             logger.debug('Submitting job [%d] with report file: %s' % \
                          (job.id, report_filename))
+            result.details['local_queue'] = job.info['queue']
+            if self.pool is not None:
+                self.pool.submit(job.id, job.info['command'], report_filename)
+                result.details['local_executor'] = 'pool'
+                result.has_failed = False
+                return result
             pidfile_path = self.get_pidfile_path(job.id)
+            make_folder(os.path.dirname(pidfile_path))
             result.details['local_pidfile_path'] = pidfile_path
-            result.details['local_queue'] = job.info['queue']
             try:                
-                result.details['local_id'] = ProcessUtil.exec_process(
+                status_pipe = ProcessUtil.exec_process(
                     job.info['command'],
                     report_filename,
-                    pidfile_path)                
+                    pidfile_path,
+                    self.output_cap)                
+                # Same as keys of list_jobs()
+                result.details['local_id'] = str(status_pipe.pid)
+                self.status_pipes[job.id] = status_pipe
                 result.has_failed = False
             except Exception as exception:
                 result.error = str(exception)                
@@ -279,31 +449,129 @@ class LocalRunner(JobRunner):
             logger.warn(result.error)
         return result
 
-    def parse_report(self, report_filename, result):
-        logger.info('Parsing report file: ' + report_filename)
-        with open(report_filename, 'r') as report:
-            report_text = report.read().split('\n')
-        section_name = 'header'
-        section = list()
-        for line in report_text:
-            if re.match(r'^Your job looked like:', line):
-                result.details[section_name] = section[:NUM_SECTION_LINES]
-                section = list()
-                section_name = 'input'
+    def launch_tasks(self, job):
+        '''
+        Start waiting tasks of job array while there are cores and memory
+        left, at least one if none runs. Returns True if any was started.
+        Tasks count against the ledger of this pass, so they do not take
+        what has been promised to jobs admitted along with the array.
+        '''
+        self.ledger.release(job.id)
+        cores, memory = get_task_request(job)
+        for index in xrange(arrays.count_active(job)):
+            self.ledger.acquire_request(job.id, cores, memory)
+        has_launched = False
+        for index in arrays.get_indices(job, ['submit']):
+            if not self.ledger.fits_request(cores, memory):
+                break
+            self.ledger.acquire_request(job.id, cores, memory)
+            self.launch_task(job, index)
+            has_launched = True
+        return has_launched
+
+    def launch_task(self, job, index):
+        command = arrays.expand_command(job.info['command'], index)
+        report_filename = self.make_task_report_filepath(job, index)
+        with open(report_filename, 'w+') as report:
+            report.write('Submitting task [%d] of job [%d] with report file: '
+                         '%s \n' % (index, job.id, report_filename))
+        key = (job.id, index)
+        try:
+            if self.pool is not None:
+                self.pool.submit(key, command, report_filename)
+            else:
+                pidfile_path = self.get_pidfile_path(job.id, index)
+                make_folder(os.path.dirname(pidfile_path))
+                self.status_pipes[key] = ProcessUtil.exec_process(
+                    command, report_filename, pidfile_path, self.output_cap)
+        except Exception as exception:
+            logger.warn('Failed to start task [%d] of job [%d]: %s', index,
+                        job.id, exception)
+            arrays.set_task_status(job, index, 'failed')
+            return
+        arrays.set_task_status(job, index, 'pending')
+
+    def get_task_state(self, job, index):
+        '''
+        'pending', 'run' or 'done' for a task started by this runner, for
+        others 'run' if its pidfile tells so, otherwise None.
+        '''
+        key = (job.id, index)
+        if key in self.events:
+            return 'done'
+        if self.__pool is not None and key in self.__pool.states:
+            return self.__pool.get_state(key)
+        if key in self.status_pipes:
+            return 'run'
+        if job.info.get('local_executor') == 'fork' and \
+                ProcessUtil.process_runs(self.get_pidfile_path(job.id, index)):
+            return 'run'
+
+    def update_tasks(self, job):
+        self.collect_events()
+        has_changed = False
+        for index in arrays.get_indices(job, arrays.ACTIVE):
+            state = self.get_task_state(job, index)
+            if state in arrays.ACTIVE:
+                has_changed |= arrays.set_task_status(job, index, state)
                 continue
-            if section_name == 'input':
-                if re.match(r'^Successfully completed.', line):
-                    result.has_failed = False
-                    continue                
-            elif section_name == 'resource_usage':
-                if re.match(r'^The output (if any) follows:', line):
-                    result.details[section_name] = section[:NUM_SECTION_LINES]
-                    section = list()
-                    section_name = 'output'  
+            # Finished, or lost by a previous daemon, look at the report.
+            key = (job.id, index)
+            self.events.pop(key, None)
+            if self.__pool is not None:
+                self.__pool.forget(key)
+            result = self.get_task_result(job, index)
+            has_changed |= arrays.set_task_status(
+                job, index, 'failed' if result.has_failed else 'done')
+        has_changed |= self.launch_tasks(job)
+        return has_changed
+
+    def get_job_keys(self, job):
+        '''Keys of the job, or of its started tasks for a job array'''
+        if arrays.is_array(job):
+            return [(job.id, index) for index
+                    in arrays.get_indices(job, arrays.ACTIVE)]
+        return [job.id]
+
+    def get_pid(self, job, key):
+        '''Pid of a forked job or task, None if unknown'''
+        if key in self.status_pipes:
+            return self.status_pipes[key].pid
+        if isinstance(key, tuple):
+            pidfile_path = self.get_pidfile_path(*key)
+        else:
+            pidfile_path = job.info.get('local_pidfile_path')
+        if pidfile_path and ProcessUtil.process_runs(pidfile_path):
+            return ProcessUtil.read_pid(pidfile_path)
+
+    def kill_jobs(self, jobs):
+        '''
+        Signal process groups of forked jobs and of tasks of job arrays,
+        those run by the pool are killed by their workers. Only the process
+        owning the pool (the daemon) can kill its jobs, elsewhere they are
+        left running with a warning.
+        '''
+        for job in jobs:
+            for key in self.get_job_keys(job):
+                self.killed_keys.add(key)
+                if job.info.get('local_executor') == 'pool':
+                    if self.__pool is not None \
+                            and self.__pool.get_state(key) is not None:
+                        self.__pool.kill(key)
+                    else:
+                        logger.warn('Job %s runs in the worker pool of '
+                                    'another process (the daemon), it is '
+                                    'not killed.', key)
                     continue
-            section.append(line)
-        if section_name == 'output':
-            result.output = section[:NUM_SECTION_LINES]
+                pid = self.get_pid(job, key)
+                if pid is not None:
+                    ProcessUtil.kill_group(pid)
+
+    def parse_report(self, report_filename, result):
+        logger.info('Parsing report file: ' + report_filename)
+        parser = ReportParser(parse_local_usage,
+                              tail_lines=self.report_tail_lines)
+        parser.parse(report_filename, result)
 
     def get_result(self, job):
         if job.status not in ('pending', 'run', 'done', 'failed') \
@@ -313,17 +581,89 @@ class LocalRunner(JobRunner):
         # Parse report
         result = JobResult(has_failed=True)
         self.parse_report(self.get_report_filepath(job), result)
+        event = self.events.pop(job.id, None)
+        if event is not None:
+            result.details.update(('local_' + key, value)
+                                  for key, value in event.iteritems())
+            # Result is taken, the pool needs not to know the job anymore.
+            if self.__pool is not None:
+                self.__pool.forget(job.id)
         return result
 
+    def collect_events(self):
+        '''Take completion events from the pool and the status pipes.'''
+        if self.__pool is not None:
+            self.add_events(self.__pool.pop_finished())
+        for job_id, status_pipe in self.status_pipes.items():
+            status_pipe.read()
+            if not status_pipe.is_finished:
+                continue
+            event = status_pipe.event
+            if event is None:
+                # Died without telling its exit code.
+                event = make_event(None, status_pipe.started_at, time.time())
+            status_pipe.close()
+            del self.status_pipes[job_id]
+            self.add_events({job_id: event})
+
+    def add_events(self, events):
+        for key, event in events.iteritems():
+            if key in self.killed_keys:
+                # Cancelled, nobody is going to take it.
+                self.killed_keys.discard(key)
+                if self.__pool is not None:
+                    self.__pool.forget(key)
+                continue
+            self.events[key] = event
+            self.finished_job_ids.add(key)
+
+    def wait_events(self, timeout, readers=()):
+        '''
+        Return as soon as any job finishes or any of the readers becomes
+        readable, at most after timeout.
+        '''
+        readers = list(readers) + self.status_pipes.values()
+        if self.__pool is not None:
+            readers.extend(self.__pool.get_readers())
+        if not readers:
+            return super(LocalRunner, self).wait_events(timeout)
+        select(readers, [], [], timeout)
+        self.collect_events()
+
+    def pop_finished_jobs(self):
+        self.collect_events()
+        # Tasks of job arrays are keyed by (job id, index).
+        finished_job_ids = set(key[0] if isinstance(key, tuple) else key
+                               for key in self.finished_job_ids)
+        self.finished_job_ids = set()
+        return finished_job_ids
+
+
+    def get_list_mask(self, jobs):
+        '''Pids of the jobs, those run by the pool have none.'''
+        return [job.info['local_id'] for job in jobs
+                if job.info.get('local_id')]
 
     def list_jobs(self, mask=['all']):
+        '''
+        List all processes like jobs, or only those with pids given by the
+        mask. The latter reads just /proc/<pid>/stat of each.
+        '''
         result = dict()
-        # TODO: consider using process session to speedup process search        
-        if '*' in mask or 'all' in mask:
-            processes = ProcessUtil.list_processes()
-        else:
-            # TODO: implement process specific mask
-            processes = ProcessUtil.list_processes()        
+        if not ('*' in mask or 'all' in mask):
+            for pid in mask:
+                process = ProcessUtil.read_process_stat(pid)
+                if process is None:
+                    continue
+                result[process['id']] = dict(
+                    local_id=process['id'],
+                    # Zombie or dead process has finished already.
+                    local_status='DONE' if process['state'] in 'ZXx'
+                    else 'RUN',
+                    local_submitted_time=process['running_since'],
+                )
+            return result
+        processes = ProcessUtil.list_processes()
         # Parse job info, pack it into dictionary        
         for process in processes:
             local_info = dict()
@@ -1,38 +1,104 @@
 '''
 Implementation of plato scheduler for Platform LSF 
 '''
+import os
 import re
 import logging
 from StringIO import StringIO
-from plato import getBasicLogger 
 
 from plato.schedule import (Monitor, Scheduler, JobRunner, JobResult,
     NoSchedulerFound)
+from plato.schedule.usage import parse_lsf_usage, parse_lsf_exit_code
+from plato.schedule.reports import ReportParser
+from plato.schedule import arrays
+from plato.schedule.querycache import QueryCache
 
 
-logger = getBasicLogger(__name__)
-
-
-try:
-    from sh import bjobs, bsub, bkill
-except ImportError:
-    exception = NoSchedulerFound('Failed to locate LSF commands like bjobs, '
-                           'bsub, bkill. Is LSF installed?')
-    logger.warn(exception)
+logger = logging.getLogger(__name__)
 
 
 NEW_LINE = '\n'
-NUM_SECTION_LINES = 1000
 
 
-#JOBID      USER    STAT  QUEUE      FROM_HOST   EXEC_HOST   JOB_NAME   SUBMIT_TIME
-#19460073   yyauhen DONE  pub.1h     brutus4     a3241       *t.xml";fi Apr 17 14:54
-job_expr = re.compile(r'(\d+)\s+(\w+)\s+(\w+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(.*)')
+# Jobs of plato are named plato_<id> (plato_<id>[<index>] for tasks of job
+# arrays) and listed by `bjobs -noheader -o` with fields as below, e.g.
+#19460073|yyauhen|DONE|pub.1h|brutus4|a3241|Apr 17 14:54|plato_12
+JOB_NAME_PREFIX = 'plato_'
+LIST_FIELDS = (
+    ('jobid', 'lsf_id'),
+    ('user', 'lsf_user'),
+    ('stat', 'lsf_status'),
+    ('queue', 'lsf_queue'),
+    ('from_host', 'lsf_from_host'),
+    ('exec_host', 'lsf_exec_host'),
+    ('submit_time', 'lsf_submitted_time'),
+    # Last, as it may contain the delimiter.
+    ('job_name', 'lsf_job_name'),
+)
+LIST_DELIMITER = '|'
+LIST_FORMAT = "%s delimiter='%s'" % (
+    ' '.join(field for field, key in LIST_FIELDS), LIST_DELIMITER)
+# Job ids passed to a single bjobs call
+QUERY_CHUNK_SIZE = 500
 submit_expr = re.compile(
     r'Job <(\d*)> is submitted to queue <([^>]*)>', re.MULTILINE)
+# Index of a task of job array, job name may be truncated like "*_12[34]"
+task_index_expr = re.compile(r'\[(\d+)\]$')
+# Status of a task of job array by LSF status
+task_statuses = {
+    'PEND': 'pending',
+    'PSUSP': 'pending',
+    'RUN': 'run',
+    'USUSP': 'run',
+    'SSUSP': 'run',
+    'DONE': 'done',
+    'EXIT': 'failed',
+}
+# bsub -w condition by kind of dependency
+dependency_conditions = {
+    'after_ok': 'done',
+    'after_any': 'ended',
+}
 
 
 class LsfRunner(JobRunner):
+
+    # Dependencies on accepted jobs are passed down as bsub -w conditions.
+    passes_dependencies = True
+    # Jobs are submitted and checked by separate bsub processes and reports.
+    is_thread_safe = True
+
+    def __init__(self, report_path=None, attachment_path=None):
+        super(LsfRunner, self).__init__(report_path, attachment_path)
+        self.__query_cache = None
+        self.__commands = dict()
+        # Job id -> LSF id of parents of jobs about to be executed
+        self.__parent_lsf_ids = None
+
+    def get_command(self, name):
+        '''
+        LSF command like bsub, looked up in `bin_path` of the [lsf] config
+        section if set (e.g. to use plato.schedule.fakelsf), else on PATH.
+        '''
+        if name not in self.__commands:
+            # Imported once LSF is called, not by every plato command.
+            try:
+                import sh
+            except ImportError:
+                raise NoSchedulerFound('Failed to import sh, needed to call '
+                                       'LSF commands like bjobs, bsub, bkill.')
+            config = self.scheduler.config
+            path = name
+            if config.has_option('lsf', 'bin_path') \
+                    and config.get('lsf', 'bin_path'):
+                path = os.path.join(os.path.expanduser(
+                    config.get('lsf', 'bin_path')), name)
+            try:
+                self.__commands[name] = sh.Command(path)
+            except sh.CommandNotFound:
+                raise NoSchedulerFound('Failed to locate LSF command %s. '
+                                       'Is LSF installed?' % path)
+        return self.__commands[name]
     
     def is_running(self, job):
         lsf_id = job.info['lsf_id']
@@ -54,18 +120,37 @@ class LsfRunner(JobRunner):
                 return True
             return False
         found_job_info = self.all_jobs[lsf_id]
-        return found_job_info['lsf_status'].lower() == 'done'
+        return found_job_info['lsf_status'].lower() in ('done', 'exit')
 
     def execute(self, job):
         super(LsfRunner, self).execute(job)
         result = JobResult(has_failed=True, details=job.info.copy())
         stderr = StringIO()
         if job.info['queue'] == 'default':
-            report = self.get_report_filepath(job)
-            result.output = bsub(
-                '-o', report,
-                _in=job.info['command'], 
-                _err=stderr,
+            command = job.info['command']
+            if arrays.is_array(job):
+                # Single submission of all tasks, %I is the task index.
+                array = job.info['array']
+                bsub_args = (
+                    '-J', '%s%d[%d-%d]' % (JOB_NAME_PREFIX, job.id,
+                                           array['first'], array['last']),
+                    '-o', self.make_task_report_filepath(job, '%I'),
+                )
+                command = command.replace(arrays.INDEX_FIELD,
+                                          '$LSB_JOBINDEX')
+            else:
+                bsub_args = (
+                    '-J', '%s%d' % (JOB_NAME_PREFIX, job.id),
+                    '-o', self.make_report_filepath(job),
+                )
+            condition = self.get_dependency_condition(job)
+            if condition:
+                # Terminate the job at once if the condition can not be met.
+                bsub_args += ('-w', condition, '-ti')
+            result.output = self.get_command('bsub')(
+                *bsub_args,
+                _in=command,
+                _err=stderr
             ).strip()
             result.error = stderr.getvalue().strip()
             logger.debug('bsub output: %s' % result.output)
@@ -75,41 +160,68 @@ class LsfRunner(JobRunner):
                 result.has_failed = False
                 result.details['lsf_id'] = match.group(1)
                 result.details['lsf_queue'] = match.group(2)
+                if arrays.is_array(job):
+                    for index in arrays.get_indices(job, ['submit']):
+                        arrays.set_task_status(job, index, 'pending')
         else:
             result.error = 'Job info has unknown queue.'
             logger.warn(result.error)
         return result
 
+    def prepare_jobs(self, jobs):
+        '''LSF ids of parents to wait for, looked up for all jobs at once'''
+        self.__parent_lsf_ids = self.get_parent_lsf_ids(jobs)
+
+    def get_parent_lsf_ids(self, jobs):
+        # Parents which have finished meanwhile have no LSF id to wait for.
+        lsf_ids = dict((parent_id, None) for job in jobs
+                       for kind, parent_id in job.info.get('wait_for', ()))
+        if lsf_ids:
+            for parent in self.scheduler.monitor.load_jobs(['pending', 'run']):
+                if parent.id in lsf_ids:
+                    lsf_ids[parent.id] = parent.info.get('lsf_id')
+        return lsf_ids
+
+    def get_dependency_condition(self, job):
+        '''bsub -w condition on parents which have not finished yet'''
+        wait_for = job.info.get('wait_for')
+        if not wait_for:
+            return
+        lsf_ids = self.__parent_lsf_ids or dict()
+        if any(parent_id not in lsf_ids for kind, parent_id in wait_for):
+            # Not prepared by the scheduler.
+            lsf_ids = self.get_parent_lsf_ids([job])
+        conditions = list()
+        for kind, parent_id in wait_for:
+            if lsf_ids.get(parent_id):
+                conditions.append('%s(%s)' % (dependency_conditions[kind],
+                                              lsf_ids[parent_id]))
+        return ' && '.join(conditions)
+
     def parse_report(self, report_filename, result):
         logger.info('Parsing report file: ' + report_filename)
-        with open(report_filename, 'r') as report:
-            report_text = report.read().split(NEW_LINE)
-        section_name = 'header'
-        section = list()
-        for line in report_text:
-            if re.match(r'^Your job looked like:', line):
-                result.details[section_name] = section[:NUM_SECTION_LINES]
-                section = list()
-                section_name = 'input'
+        parser = ReportParser(parse_lsf_usage, parse_lsf_exit_code,
+                              keep_usage=True,
+                              tail_lines=self.report_tail_lines)
+        parser.parse(report_filename, result)
+
+    def update_tasks(self, job):
+        '''Statuses of tasks of job array as told by bjobs or reports'''
+        has_changed = False
+        for index in arrays.get_indices(job, arrays.ACTIVE):
+            lsf_info = self.all_jobs.get('%s[%d]' % (job.info['lsf_id'],
+                                                     index))
+            if lsf_info is not None:
+                status = task_statuses.get(lsf_info['lsf_status'].upper(),
+                                           'pending')
+            elif os.path.exists(self.get_task_report_filepath(job, index)):
+                # Forgotten by bjobs already.
+                result = self.get_task_result(job, index)
+                status = 'failed' if result.has_failed else 'done'
+            else:
                 continue
-            if section_name == 'input':
-                if re.match(r'^Successfully completed.', line):
-                    result.has_failed = False
-                    continue
-                if re.match(r'^Resource usage summary:', line):
-                    result.input = section[:NUM_SECTION_LINES]
-                    section = list()
-                    section_name = 'resource_usage'  
-                    continue
-            elif section_name == 'resource_usage':
-                if re.match(r'^The output (if any) follows:', line):
-                    result.details[section_name] = section[:NUM_SECTION_LINES]
-                    section = list()
-                    section_name = 'output'  
-                    continue
-            section.append(line)
-        if section_name == 'output':
-            result.output = section[:NUM_SECTION_LINES]
+            has_changed |= arrays.set_task_status(job, index, status)
+        return has_changed
 
     def get_result(self, job):
         if job.status not in ('pending', 'run', 'done', 'failed') \
@@ -122,39 +234,95 @@ class LsfRunner(JobRunner):
         return result
 
 
-    def list_jobs(self, mask=['all']):
-        result = dict()
+    def kill_jobs(self, jobs):
+        '''A single bkill for all the jobs, job arrays with all their tasks'''
+        lsf_ids = self.get_list_mask(jobs)
+        if not lsf_ids:
+            return
         stderr = StringIO()
+        # Exit code is 255 if some of the jobs have finished meanwhile.
+        output = self.get_command('bkill')(*lsf_ids, _err=stderr,
+                                           _ok_code=[0, 255])
+        logger.debug('Killed (%d) LSF jobs: %s', len(lsf_ids),
+                     output.strip())
+        error_message = stderr.getvalue().strip()
+        if error_message:
+            logger.debug(error_message)
+
+    @property
+    def query_cache(self):
+        '''Job list shared with other plato processes for a few seconds'''
+        if self.__query_cache is None:
+            path = os.path.join(self.scheduler.monitor.state_path,
+                                'lsf_jobs.json')
+            self.__query_cache = QueryCache.from_config(
+                self.scheduler.config, 'lsf', path)
+        return self.__query_cache
+
+    def get_list_mask(self, jobs):
+        '''LSF ids of the jobs'''
+        return [job.info['lsf_id'] for job in jobs if job.info.get('lsf_id')]
+
+    def list_jobs(self, mask=['all']):
+        '''
+        List jobs of plato (named by JOB_NAME_PREFIX), or only those with
+        LSF ids given by the mask. Tasks of job arrays are keyed by
+        "<id>[<index>]".
+        '''
         if '*' in mask or 'all' in mask:
-            output = bjobs('-a', _err=stderr)
+            query = '*'
         else:
-            output = bjobs(_err=stderr)
-        error_message = stderr.getvalue().strip()
-        logger.debug(error_message)
-        if re.search(r'No (?:\w* )job found', error_message):
+            query = sorted(set(mask))
+            if not query:
+                return dict()
+        result = self.query_cache.get(query)
+        if result is not None:
             return result
-        # Parse job info, pack it into dictionary
-        job_lines = output.split('\n')[1:]  # skip column headers
-        for job_line in job_lines:
-            job_line = job_line.strip()
-            if not job_line:
-                continue
-            match = job_expr.search(job_line)
-            if not match:
-                logger.warn('Failed to parse job line: %s' % job_line)
-                continue
-            lsf_info = dict()
-            lsf_info['lsf_id'] = match.group(1)
-            lsf_info['lsf_user'] = match.group(2)
-            lsf_info['lsf_status'] = match.group(3)
-            lsf_info['lsf_queue'] = match.group(4)
-            lsf_info['lsf_from_host'] = match.group(5)
-            lsf_info['lsf_exec_host'] = match.group(6)
-            lsf_info['lsf_job_name'] = match.group(7)
-            lsf_info['lsf_submitted_time'] = match.group(8)
-            result[lsf_info['lsf_id']] = lsf_info
+        result = dict()
+        if query == '*':
+            self.query_jobs(['-J', JOB_NAME_PREFIX + '*'], result)
+        else:
+            for start in xrange(0, len(query), QUERY_CHUNK_SIZE):
+                self.query_jobs(query[start:start + QUERY_CHUNK_SIZE],
+                                result)
+        self.query_cache.put(query, result)
         return result
 
+    def query_jobs(self, args, result):
+        if not args:
+            return
+        stderr = StringIO()
+        # Exit code is 255 if some of the jobs are not found.
+        output = self.get_command('bjobs')('-a', '-noheader', '-o', LIST_FORMAT, *args,
+                       _err=stderr, _ok_code=[0, 255])
+        error_message = stderr.getvalue().strip()
+        if error_message:
+            logger.debug(error_message)
+        result.update(parse_job_list(output))
+
+
+def parse_job_list(output):
+    '''Jobs by id from `bjobs -noheader -o LIST_FORMAT` output'''
+    result = dict()
+    for job_line in output.split(NEW_LINE):
+        job_line = job_line.strip()
+        if not job_line:
+            continue
+        fields = job_line.split(LIST_DELIMITER, len(LIST_FIELDS) - 1)
+        if len(fields) != len(LIST_FIELDS) or not fields[0].isdigit():
+            logger.warn('Failed to parse job line: %s' % job_line)
+            continue
+        lsf_info = dict((key, value) for (field, key), value
+                        in zip(LIST_FIELDS, fields))
+        key = lsf_info['lsf_id']
+        # Tasks of job array share its id, key them as "id[index]".
+        index_match = task_index_expr.search(lsf_info['lsf_job_name'])
+        if index_match:
+            key = '%s[%s]' % (key, index_match.group(1))
+        result[key] = lsf_info
+    return result
+
+
 class LsfMonitor(Monitor):
     pass    
 
@@ -0,0 +1,77 @@
+'''
+Runner I/O of a scheduler step, like bsub calls and parsing of reports, done
+by a pool of threads. Only the runner is called concurrently, each job by a
+single thread, while the monitor is updated by the thread running the step,
+job after job in their order. So monitor backends need not be thread-safe
+(sqlite connections must not even be shared by threads).
+
+Set the number of threads by `step_threads` in the [scheduler] config
+section, 1 keeps the step sequential. Runners opt in by `is_thread_safe`.
+'''
+import sys
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+# Defaults, override in [scheduler] section of the config.
+STEP_THREADS = 1
+# Jobs handed to a thread at once
+STEP_CHUNK_SIZE = 8
+
+
+def capture(function):
+    '''Wrap function to return (value, None) or (None, exc_info).'''
+    def call(job):
+        try:
+            return function(job), None
+        except Exception:
+            return None, sys.exc_info()
+    return call
+
+
+class StepPool(object):
+
+    def __init__(self, size=STEP_THREADS, chunk_size=STEP_CHUNK_SIZE):
+        self.size = size
+        self.chunk_size = chunk_size
+        self.__pool = None
+
+    @classmethod
+    def from_config(cls, config):
+        size = STEP_THREADS
+        if config.has_option('scheduler', 'step_threads'):
+            size = config.getint('scheduler', 'step_threads')
+        return cls(size)
+
+    @property
+    def pool(self):
+        if self.__pool is None:
+            from multiprocessing.pool import ThreadPool
+            logger.info('Starting (%d) step threads', self.size)
+            self.__pool = ThreadPool(self.size)
+        return self.__pool
+
+    def map_jobs(self, function, jobs):
+        '''
+        Yield (job, function(job)) in the order of jobs. With more than one
+        thread calls run concurrently and an exception is raised once its
+        job is reached, as if the calls were made in turn.
+        '''
+        if self.size <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                yield job, function(job)
+            return
+        chunk_size = max(1, min(self.chunk_size, len(jobs) // self.size))
+        results = self.pool.map(capture(function), jobs, chunk_size)
+        for job, (value, error) in zip(jobs, results):
+            if error is not None:
+                raise error[0], error[1], error[2]
+            yield job, value
+
+    def close(self):
+        if self.__pool is not None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
@@ -0,0 +1,104 @@
+'''
+Adaptive polling of pending and running jobs. Each job has its next check
+time kept in a priority queue, young jobs and jobs which have just changed
+state are checked often, long running ones back off up to a maximal interval.
+'''
+import heapq
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+# Defaults, override in [scheduler] section of the config.
+POLL_MIN_INTERVAL = 0.0
+POLL_MAX_INTERVAL = 300.0
+# Fraction of job age to wait before the next check.
+POLL_BACKOFF = 0.1
+
+
+class PollingSchedule(object):
+
+    def __init__(self, min_interval=POLL_MIN_INTERVAL,
+                 max_interval=POLL_MAX_INTERVAL, backoff=POLL_BACKOFF):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        # Heap of (due time, job id), stale items are skipped lazily.
+        self.queue = list()
+        # Job id -> current due time.
+        self.due = dict()
+
+    @classmethod
+    def from_config(cls, config):
+        options = dict()
+        for name in ('min_interval', 'max_interval', 'backoff'):
+            if config.has_option('scheduler', 'poll_' + name):
+                options[name] = config.getfloat('scheduler', 'poll_' + name)
+        return cls(**options)
+
+    def push(self, job_id, due_at):
+        self.due[job_id] = due_at
+        heapq.heappush(self.queue, (due_at, job_id))
+
+    def select_due(self, jobs, now):
+        '''
+        Return jobs which are due for a check. Jobs seen for the first time
+        are due at once, jobs not passed anymore are forgotten.
+        '''
+        jobs_by_id = dict((job.id, job) for job in jobs)
+        for job_id in self.due.keys():
+            if job_id not in jobs_by_id:
+                del self.due[job_id]
+        for job_id in jobs_by_id:
+            if job_id not in self.due:
+                self.push(job_id, now)
+        due_jobs = list()
+        due_job_ids = set()
+        while self.queue and self.queue[0][0] <= now:
+            due_at, job_id = heapq.heappop(self.queue)
+            if self.due.get(job_id) != due_at or job_id in due_job_ids:
+                # Rescheduled, forgotten or duplicated meanwhile.
+                continue
+            due_job_ids.add(job_id)
+            due_jobs.append(jobs_by_id[job_id])
+        for job in due_jobs:
+            # Fallback in case the job is not rescheduled explicitly, pushed
+            # after popping so a zero interval does not make it due again.
+            self.push(job.id, now + self.min_interval)
+        if len(self.queue) > 2 * len(self.due) + 1000:
+            self.compact()
+        return due_jobs
+
+    def next_due_at(self):
+        '''Time the next job is due for a check, None if there is none.'''
+        while self.queue and \
+                self.due.get(self.queue[0][1]) != self.queue[0][0]:
+            heapq.heappop(self.queue)
+        if self.queue:
+            return self.queue[0][0]
+
+    def compact(self):
+        '''Drop stale heap items.'''
+        self.queue = [(due_at, job_id) for job_id, due_at
+                      in self.due.iteritems()]
+        heapq.heapify(self.queue)
+
+    def get_interval(self, job, has_changed, now, hint=None):
+        if hint is not None:
+            return max(self.min_interval, min(self.max_interval, hint))
+        if has_changed:
+            return self.min_interval
+        since = job.info.get('pending_since', job.info.get('submitted_at'))
+        age = max(0.0, now - since) if since is not None else 0.0
+        return max(self.min_interval, min(self.max_interval,
+                                          age * self.backoff))
+
+    def reschedule(self, job, has_changed, now, hint=None):
+        '''Plan next check of the job after it has been updated.'''
+        if job.status not in ('pending', 'run'):
+            self.due.pop(job.id, None)
+            return
+        interval = self.get_interval(job, has_changed, now, hint)
+        logger.debug('Next check of job [%s] in %.1f (sec)', job.id, interval)
+        self.push(job.id, now + interval)
@@ -0,0 +1,66 @@
+'''
+Snapshot of job states as listed by a runner, kept for a few seconds in a
+file shared by the daemon and command line invocations like `plato list`,
+so that they do not query the batch system again and again.
+
+The snapshot records the query it answers, either '*' for all jobs of
+plato or a list of job ids, and serves queries it covers until it expires.
+'''
+import os
+import json
+import logging
+from time import time
+
+
+logger = logging.getLogger(__name__)
+
+
+# Defaults, override in the section of the runner, e.g. [lsf].
+QUERY_CACHE_TTL = 5.0
+
+
+class QueryCache(object):
+
+    def __init__(self, path, ttl=QUERY_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+
+    @classmethod
+    def from_config(cls, config, section, path):
+        ttl = QUERY_CACHE_TTL
+        if config.has_option(section, 'query_cache_ttl'):
+            ttl = config.getfloat(section, 'query_cache_ttl')
+        return cls(path, ttl)
+
+    def covers(self, snapshot, query):
+        if snapshot['query'] == '*':
+            return True
+        return query != '*' and set(query) <= set(snapshot['query'])
+
+    def get(self, query):
+        '''Jobs listed by a fresh snapshot covering the query, or None'''
+        if not self.ttl:
+            return
+        try:
+            with open(self.path) as cache_file:
+                snapshot = json.load(cache_file)
+        except (IOError, ValueError):
+            return
+        age = time() - snapshot['taken_at']
+        if age < 0 or age > self.ttl or not self.covers(snapshot, query):
+            return
+        logger.debug('Using job list taken (%.1f) sec ago', age)
+        return snapshot['jobs']
+
+    def put(self, query, jobs):
+        if not self.ttl:
+            return
+        snapshot = dict(taken_at=time(), query=query, jobs=jobs)
+        # Readers never see a partially written snapshot.
+        temp_path = '%s.%d' % (self.path, os.getpid())
+        try:
+            with open(temp_path, 'w') as cache_file:
+                json.dump(snapshot, cache_file)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError) as error:
+            logger.warn('Failed to cache job list: %s', error)
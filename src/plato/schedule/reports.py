@@ -0,0 +1,151 @@
+'''
+Single-pass parser of job reports shared by the runners. Reports of LSF and
+of the local runner look alike:
+
+    <header>
+    Your job looked like:
+    <input, exit status>
+    Resource usage summary:
+    <usage>
+    The output (if any) follows:
+    <output>
+
+Only the first NUM_SECTION_LINES lines of each section are kept, so the
+report is read line by line with bounded line length and reading stops as
+soon as the output section is full. Optionally the last lines of the output
+are read from the end of the file instead of skipping them.
+'''
+import os
+import re
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+NUM_SECTION_LINES = 1000
+# Longer lines are truncated, the rest of the line is skipped.
+MAX_LINE_LENGTH = 64 * 1024
+# Bytes read at once when looking for the tail of the output.
+TAIL_CHUNK_SIZE = 64 * 1024
+SKIPPED_MARK = '... [output skipped] ...'
+
+input_expr = re.compile(r'^Your job looked like:')
+success_expr = re.compile(r'^Successfully completed\.')
+usage_expr = re.compile(r'^Resource usage summary:')
+output_expr = re.compile(r'^The output \(if any\) follows:')
+
+
+def read_lines(report, max_length=MAX_LINE_LENGTH):
+    '''Lines of the file without line ends, truncated to max_length.'''
+    while True:
+        line = report.readline(max_length)
+        if not line:
+            return
+        if not line.endswith('\n'):
+            # Skip the rest of a long line.
+            rest = line
+            while rest and not rest.endswith('\n'):
+                rest = report.readline(max_length)
+        yield line.rstrip('\n')
+
+
+def read_tail(report, start, count, max_length=MAX_LINE_LENGTH):
+    '''
+    Last count lines of the file after offset start, reading backwards in
+    chunks. Returns (lines, True if some lines before them were skipped).
+    '''
+    report.seek(0, os.SEEK_END)
+    position = end = report.tell()
+    data = ''
+    limit = (count + 1) * max_length
+    while position > start and data.count('\n') <= count \
+            and end - position < limit:
+        chunk_size = min(TAIL_CHUNK_SIZE, position - start)
+        position -= chunk_size
+        report.seek(position)
+        data = report.read(chunk_size) + data
+    lines = data.split('\n')
+    if not lines[-1]:
+        lines.pop()
+    is_skipped = position > start
+    if is_skipped:
+        # First line is likely a partial one.
+        lines = lines[1:]
+    if len(lines) > count:
+        lines = lines[-count:]
+        is_skipped = True
+    return [line[:max_length] for line in lines], is_skipped
+
+
+class ReportParser(object):
+    '''
+    Parse a report into a JobResult. Usage section is parsed by parse_usage
+    (lines -> dict), exit status lines of the input section optionally by
+    parse_exit_code (line -> exit code or None).
+    '''
+
+    def __init__(self, parse_usage, parse_exit_code=None, keep_usage=False,
+                 max_lines=NUM_SECTION_LINES, tail_lines=0):
+        self.parse_usage = parse_usage
+        self.parse_exit_code = parse_exit_code
+        # Keep lines of the usage section in details['resource_usage'].
+        self.keep_usage = keep_usage
+        self.max_lines = max_lines
+        self.tail_lines = tail_lines
+
+    def parse(self, report_filename, result):
+        with open(report_filename, 'r') as report:
+            self.parse_file(report, result)
+
+    def parse_file(self, report, result):
+        section_name = 'header'
+        section = list()
+        usage = dict()
+        lines = read_lines(report)
+        for line in lines:
+            if section_name == 'output':
+                section.append(line)
+                if len(section) >= self.max_lines:
+                    break
+                continue
+            if input_expr.match(line):
+                result.details[section_name] = section
+                section = list()
+                section_name = 'input'
+                continue
+            if section_name == 'input':
+                if self.parse_exit_code is not None:
+                    exit_code = self.parse_exit_code(line)
+                    if exit_code is not None:
+                        usage['exit_code'] = exit_code
+                if success_expr.match(line):
+                    result.has_failed = False
+                    continue
+                if usage_expr.match(line):
+                    result.details['input'] = section
+                    section = list()
+                    section_name = 'resource_usage'
+                    continue
+            elif section_name == 'resource_usage':
+                if output_expr.match(line):
+                    if self.keep_usage:
+                        result.details[section_name] = section
+                    usage.update(self.parse_usage(section))
+                    section = list()
+                    section_name = 'output'
+                    continue
+            if len(section) < self.max_lines:
+                section.append(line)
+        if section_name == 'output':
+            if len(section) >= self.max_lines and self.tail_lines:
+                section.extend(self.read_tail(report))
+            result.output = section
+        result.details['usage'] = usage
+
+    def read_tail(self, report):
+        '''Last lines of the output which has not been read yet'''
+        tail, is_skipped = read_tail(report, report.tell(), self.tail_lines)
+        if is_skipped:
+            return [SKIPPED_MARK] + tail
+        return tail
@@ -0,0 +1,172 @@
+'''
+Hash-sharded layout of per-job files (job state files, reports, attachments,
+pidfiles). With `shard_levels = 2` a file of job 12 goes into e.g.
+`<folder>/c2/0a/`, which keeps directories small enough for create, remove
+and listdir to stay fast on ext4 or NFS.
+
+Shard names of all levels are prefixes of the same hash, so a file can be
+found under any number of levels. This is what allows re-sharding a state
+directory while the daemon is running with either the old or the new layout.
+'''
+import os
+import re
+import hashlib
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+# Defaults, override in [scheduler] section of the config. Zero levels is the
+# flat layout of older plato versions.
+SHARD_LEVELS = 0
+SHARD_WIDTH = 2
+# Deepest layout looked up and traversed when scanning.
+MAX_SHARD_LEVELS = 3
+
+shard_name_expr = re.compile(r'^[0-9a-f]+$')
+# Job id in names like TEST_12.st, plato_job_report.12, data.csv.12 or
+# localjob_12.pid
+job_id_expr = re.compile(r'[._](\d+)(?:\.st|\.pid)?$')
+
+
+def make_folder(folder):
+    if not os.path.isdir(folder):
+        try:
+            os.makedirs(folder)
+        except OSError:
+            # Created by a concurrent process.
+            if not os.path.isdir(folder):
+                raise
+
+
+class ShardLayout(object):
+
+    def __init__(self, levels=SHARD_LEVELS, width=SHARD_WIDTH):
+        if not 0 <= levels <= MAX_SHARD_LEVELS:
+            raise ValueError('Number of shard levels must be within 0..%d' %
+                             MAX_SHARD_LEVELS)
+        self.levels = levels
+        self.width = width
+
+    @classmethod
+    def from_config(cls, config):
+        options = dict()
+        for name in ('levels', 'width'):
+            if config.has_option('scheduler', 'shard_' + name):
+                options[name] = config.getint('scheduler', 'shard_' + name)
+        return cls(**options)
+
+    def get_shards(self, id, levels=None):
+        if levels is None:
+            levels = self.levels
+        digest = hashlib.md5(str(id)).hexdigest()
+        return [digest[level * self.width:(level + 1) * self.width]
+                for level in xrange(levels)]
+
+    def get_folder(self, folder, id, levels=None):
+        return os.path.join(folder, *self.get_shards(id, levels))
+
+    def get_path(self, folder, id, name):
+        '''Where the file of the job is put by this layout.'''
+        return os.path.join(self.get_folder(folder, id), name)
+
+    def make_path(self, folder, id, name):
+        '''Like get_path(), creates the shard folder if missing.'''
+        make_folder(self.get_folder(folder, id))
+        return self.get_path(folder, id, name)
+
+    def find_path(self, folder, id, name):
+        '''
+        Path of an existing file of the job, possibly left in another layout.
+        Falls back to get_path() if file does not exist.
+        '''
+        path = self.get_path(folder, id, name)
+        if os.path.exists(path):
+            return path
+        for levels in xrange(MAX_SHARD_LEVELS + 1):
+            if levels == self.levels:
+                continue
+            other_path = os.path.join(self.get_folder(folder, id, levels),
+                                      name)
+            if os.path.exists(other_path):
+                return other_path
+        return path
+
+    def scan(self, index, folder, name_pattern, load):
+        '''
+        Items loaded from files of the folder and all its shard folders,
+        at any level, by FolderIndex.walk(). Unchanged shard folders are
+        not listed again.
+        '''
+        return index.walk(folder, name_pattern, load, shard_name_expr,
+                          MAX_SHARD_LEVELS)
+
+    def list_folders(self, folder, depth=0):
+        '''The folder and all its shard folders, at any level.'''
+        yield folder
+        if depth >= MAX_SHARD_LEVELS:
+            return
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return
+        for name in names:
+            if shard_name_expr.match(name) is None:
+                continue
+            path = os.path.join(folder, name)
+            if os.path.isdir(path):
+                for subfolder in self.list_folders(path, depth + 1):
+                    yield subfolder
+
+    def reshard(self, folder, name_pattern=None):
+        '''
+        Move files of the folder into places given by this layout. Each file
+        is moved by a single rename, so it is safe to run while the daemon
+        works with the folder. Returns number of moved files.
+        '''
+        count = 0
+        for subfolder in list(self.list_folders(folder)):
+            for name in os.listdir(subfolder):
+                match = job_id_expr.search(name)
+                if match is None or name.startswith('.'):
+                    continue
+                if name_pattern is not None \
+                        and name_pattern.match(name) is None:
+                    continue
+                path = os.path.join(subfolder, name)
+                new_path = self.get_path(folder, int(match.group(1)), name)
+                if path == new_path or not os.path.isfile(path):
+                    continue
+                make_folder(os.path.dirname(new_path))
+                try:
+                    os.rename(path, new_path)
+                except OSError as error:
+                    # E.g. job has changed status meanwhile.
+                    logger.debug('Skipping %s: %s', path, error)
+                    continue
+                count += 1
+        return count
+
+
+def reshard_state_path(state_path, layout, job_prefix, report_path=None):
+    '''
+    Re-shard job state files and reports of a state directory of the
+    file-based Monitor. Attachments and pidfiles are left in place, since
+    their paths are recorded in job commands and info, new ones follow the
+    layout anyway. Returns number of moved files.
+    '''
+    from plato.schedule import status_set
+    state_file_pattern = re.compile(r'^%s_\d+\.st$' % re.escape(job_prefix))
+    count = 0
+    for status in status_set:
+        status_folder = os.path.join(state_path, status)
+        if os.path.isdir(status_folder):
+            count += layout.reshard(status_folder, state_file_pattern)
+    if report_path is None:
+        report_path = os.path.join(state_path, 'reports')
+    if os.path.isdir(report_path):
+        count += layout.reshard(report_path)
+    logger.info('Moved (%d) files of %s into %d level shards', count,
+                state_path, layout.levels)
+    return count
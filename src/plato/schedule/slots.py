@@ -0,0 +1,128 @@
+'''
+Admission control of the local scheduler. Jobs declare the cores and memory
+(MB) they need in `job.info`, e.g. {'cores': 4, 'memory': 2048}, by default
+one core and no memory. A ledger of what pending and running jobs hold is
+rebuilt from the monitor on every pass, so it survives daemon restarts, and
+submitted jobs are accepted in order only while there is capacity left.
+Tasks of job arrays are started against the same ledger, so they never take
+what has been promised to jobs admitted along with them.
+'''
+import logging
+from plato.schedule import arrays
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_CORES = 1
+DEFAULT_MEMORY = 0
+
+
+def get_physical_memory():
+    '''Total memory of the machine in MB'''
+    with open('/proc/meminfo') as meminfo:
+        for line in meminfo:
+            if line.startswith('MemTotal:'):
+                return int(line.split()[1]) // 1024
+    return 0
+
+
+def get_task_request(job):
+    '''(cores, memory) declared by the job, or by each task of job array'''
+    return (int(job.info.get('cores', DEFAULT_CORES)),
+            int(job.info.get('memory', DEFAULT_MEMORY)))
+
+
+def get_request(job):
+    '''
+    (cores, memory) held by the job. Job array holds it for every active
+    task, but at least for one, which it is admitted with.
+    '''
+    cores, memory = get_task_request(job)
+    if arrays.is_array(job):
+        count = max(1, arrays.count_active(job))
+        return cores * count, memory * count
+    return cores, memory
+
+
+class ResourceLedger(object):
+
+    def __init__(self, cores=None, memory=None):
+        if not cores:
+            import multiprocessing
+            cores = multiprocessing.cpu_count()
+        if not memory:
+            memory = get_physical_memory()
+        self.cores = cores
+        self.memory = memory
+        self.used_cores = 0
+        self.used_memory = 0
+        # Job id -> (cores, memory) it holds
+        self.holdings = dict()
+
+    @classmethod
+    def from_config(cls, config):
+        options = dict()
+        for name in ('cores', 'memory'):
+            if config.has_option('local', name):
+                options[name] = config.getint('local', name)
+        return cls(**options)
+
+    @property
+    def is_empty(self):
+        return self.used_cores == 0 and self.used_memory == 0
+
+    def fits(self, job):
+        '''
+        True if there is capacity for the job. A job asking for more than
+        the machine has is let in only when nothing else runs.
+        '''
+        return self.fits_request(*get_request(job))
+
+    def fits_request(self, cores, memory):
+        if self.is_empty:
+            return True
+        return self.used_cores + cores <= self.cores \
+            and self.used_memory + memory <= self.memory
+
+    def acquire(self, job):
+        self.acquire_request(job.id, *get_request(job))
+
+    def acquire_request(self, job_id, cores, memory):
+        self.used_cores += cores
+        self.used_memory += memory
+        held_cores, held_memory = self.holdings.get(job_id, (0, 0))
+        self.holdings[job_id] = (held_cores + cores, held_memory + memory)
+
+    def release(self, job_id):
+        '''Give back all the job holds.'''
+        cores, memory = self.holdings.pop(job_id, (0, 0))
+        self.used_cores -= cores
+        self.used_memory -= memory
+
+    def reset(self, holding_jobs):
+        '''Start over with what the jobs hold in use.'''
+        self.used_cores = 0
+        self.used_memory = 0
+        self.holdings.clear()
+        for job in holding_jobs:
+            self.acquire(job)
+
+    def admit(self, jobs, holding_jobs):
+        '''
+        Return leading jobs (in submission order) there is capacity for,
+        given jobs holding resources already.
+        '''
+        self.reset(holding_jobs)
+        admitted = list()
+        for job in sorted(jobs, key=lambda job: job.id):
+            # First come, first served, so big jobs are not starved.
+            if not self.fits(job):
+                break
+            self.acquire(job)
+            admitted.append(job)
+        logger.debug('Admitted (%d) of (%d) jobs, (%d/%d) cores and '
+                     '(%d/%d) MB in use', len(admitted), len(jobs),
+                     self.used_cores, self.cores, self.used_memory,
+                     self.memory)
+        return admitted
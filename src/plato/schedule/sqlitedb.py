@@ -0,0 +1,186 @@
+'''
+SQLite backed persistence monitor. Keeps all jobs in a single database file
+inside the state path instead of per-status folders of JSON files, so
+loading jobs of some status is an indexed query rather than a directory walk.
+
+Select it by setting `monitor = sqlite` in the [scheduler] config section.
+'''
+import os
+import json
+import logging
+import sqlite3
+from contextlib import contextmanager
+
+from plato.schedule import Monitor, status_set
+
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    batch_name TEXT,
+    description TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status);
+CREATE INDEX IF NOT EXISTS jobs_batch_name_idx ON jobs (batch_name);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+'''
+# Seconds to wait for a lock held by a concurrent writer.
+LOCK_TIMEOUT = 60
+
+
+class SqliteMonitor(Monitor):
+
+    def __init__(self, state_path, job_prefix, is_interactive=False):
+        super(SqliteMonitor, self).__init__(state_path, job_prefix,
+                                            is_interactive)
+        self.db_path = os.path.join(state_path, '%s_jobs.db' % job_prefix)
+        self.__connection = None
+
+    @property
+    def connection(self):
+        if self.__connection is None:
+            # Autocommit mode, transactions are started explicitly.
+            self.__connection = sqlite3.connect(
+                self.db_path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        return self.__connection
+
+    @contextmanager
+    def transaction(self):
+        '''
+        Immediate transaction takes the write lock at once, so concurrent
+        writers (e.g. daemon and `plato submit`) are serialized.
+        '''
+        cursor = self.connection.cursor()
+        cursor.execute('BEGIN IMMEDIATE')
+        try:
+            yield cursor
+        except:
+            cursor.execute('ROLLBACK')
+            raise
+        cursor.execute('COMMIT')
+
+    def get_db_folders(self):
+        # No status folders, those are kept in the database.
+        return ['pidfiles', 'attachments', 'reports']
+
+    def init_db(self):
+        super(SqliteMonitor, self).init_db()
+        self.connection.executescript(SCHEMA)
+
+    def reserve_ids(self, count):
+        '''Reserve a block of ids with the counter kept in the database.'''
+        assert count > 0
+        with self.transaction() as cursor:
+            first_id = self.get_last_id(cursor) + 1
+            self.set_last_id(cursor, first_id + count - 1)
+        return xrange(first_id, first_id + count)
+
+    def get_last_id(self, cursor):
+        cursor.execute("SELECT value FROM counters WHERE name = 'last_id'")
+        row = cursor.fetchone()
+        if row is None:
+            return 0
+        return row[0]
+
+    def set_last_id(self, cursor, last_id):
+        cursor.execute('INSERT OR REPLACE INTO counters (name, value) '
+                       "VALUES ('last_id', ?)", (last_id,))
+
+    def load_jobs(self, status_mask=status_set):
+        if not status_mask:
+            return list()
+        query = 'SELECT description FROM jobs WHERE status IN (%s) ' \
+                'ORDER BY id' % ', '.join('?' * len(status_mask))
+        rows = self.connection.execute(query, tuple(status_mask))
+        return [self.restore_job(json.loads(description))
+                for (description,) in rows]
+
+    def write_job(self, cursor, job):
+        cursor.execute(
+            'INSERT OR REPLACE INTO jobs (id, status, batch_name, description) '
+            'VALUES (?, ?, ?, ?)',
+            (job.id, job.status, job.batch_name,
+             json.dumps(self.describe_job(job))))
+
+    def detach_job(self, job):
+        '''Make job invisible for the monitor'''
+        if not job.is_attached:
+            # Job is already detached from the monitor.
+            return
+        with self.transaction() as cursor:
+            cursor.execute('DELETE FROM jobs WHERE id = ?', (job.id,))
+        job.is_attached = False
+
+    def attach_job(self, job):
+        if job.is_attached:
+            logger.warn('Job is already attached to the monitor.')
+            return
+        with self.transaction() as cursor:
+            self.write_job(cursor, job)
+        job.is_attached = True
+
+    def attach_jobs(self, jobs):
+        '''Attach many jobs in a single transaction'''
+        with self.transaction() as cursor:
+            for job in jobs:
+                if job.is_attached:
+                    logger.warn('Job is already attached to the monitor.')
+                    continue
+                self.write_job(cursor, job)
+        for job in jobs:
+            job.is_attached = True
+
+    def change_status(self, job, status):
+        '''Rewrite the job row with a new status in a single transaction'''
+        job.status = status
+        with self.transaction() as cursor:
+            self.write_job(cursor, job)
+        job.is_attached = True
+
+    def change_statuses(self, jobs, status):
+        '''Rewrite rows of many jobs with a new status in one transaction'''
+        with self.transaction() as cursor:
+            for job in jobs:
+                job.status = status
+                self.write_job(cursor, job)
+        for job in jobs:
+            job.is_attached = True
+
+    def import_jobs(self, jobs, last_id=0):
+        '''
+        Import jobs (e.g. loaded by another monitor) in a single transaction.
+        Counter of issued ids is never decreased.
+        '''
+        count = 0
+        with self.transaction() as cursor:
+            for job in jobs:
+                self.write_job(cursor, job)
+                last_id = max(last_id, job.id)
+                count += 1
+            self.set_last_id(cursor, max(last_id, self.get_last_id(cursor)))
+        return count
+
+
+def migrate_state_path(source_path, monitor, job_prefix=None):
+    '''
+    Import jobs from a state directory of the file-based Monitor (status
+    folders with .st files plus `last_id`) into the SQLite monitor.
+    Returns number of imported jobs.
+    '''
+    if job_prefix is None:
+        job_prefix = monitor.job_prefix
+    source = Monitor(source_path, job_prefix)
+    last_id = source.id_allocator.read_counter()
+    status_mask = [status for status in status_set
+                   if os.path.exists(os.path.join(source_path, status))]
+    count = monitor.import_jobs(source.load_jobs(status_mask), last_id)
+    logger.info('Imported (%d) jobs from %s into %s', count, source_path,
+                monitor.db_path)
+    return count
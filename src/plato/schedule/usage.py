@@ -0,0 +1,137 @@
+'''
+Structured resource usage of completed jobs, kept as
+`JobResult.details['usage']` and copied into `job.info['usage']`, so it can
+be queried across jobs without loading results or re-parsing reports.
+
+All fields are optional numbers:
+
+    exit_code               - exit status, negative signal number if killed
+    wall_time               - seconds from start to exit
+    cpu_time                - user plus system seconds
+    user_time, sys_time     - seconds
+    max_rss                 - peak resident set size in bytes
+    read_bytes, write_bytes - block I/O in bytes
+'''
+import os
+import re
+
+
+USAGE_FIELDS = (
+    'exit_code',
+    'wall_time',
+    'cpu_time',
+    'user_time',
+    'sys_time',
+    'max_rss',
+    'read_bytes',
+    'write_bytes',
+)
+
+# Size of a block counted by getrusage()
+BLOCK_SIZE = 512
+MEMORY_UNITS = {
+    'KB': 1024,
+    'MB': 1024 ** 2,
+    'GB': 1024 ** 3,
+    'TB': 1024 ** 4,
+}
+
+local_usage_expr = re.compile(r'^\s*(\w+)\s*:\s*(-?[\d.]+)\s*$')
+lsf_usage_exprs = (
+    ('cpu_time', re.compile(r'^\s*CPU time\s*:\s*([\d.]+) sec')),
+    ('wall_time', re.compile(r'^\s*Run time\s*:\s*([\d.]+) sec')),
+    ('max_rss', re.compile(r'^\s*Max Memory\s*:\s*([\d.]+) ([KMGT]B)')),
+)
+lsf_exit_code_expr = re.compile(r'^Exited with exit code (\d+)')
+
+
+def get_exit_code(status):
+    '''Exit code from a wait() status, like Popen.returncode'''
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def from_rusage(status, rusage, wall_time):
+    '''Usage of a child process reaped by os.wait4()'''
+    return dict(
+        exit_code=get_exit_code(status),
+        wall_time=wall_time,
+        cpu_time=rusage.ru_utime + rusage.ru_stime,
+        user_time=rusage.ru_utime,
+        sys_time=rusage.ru_stime,
+        # Kilobytes on Linux
+        max_rss=rusage.ru_maxrss * 1024,
+        read_bytes=rusage.ru_inblock * BLOCK_SIZE,
+        write_bytes=rusage.ru_oublock * BLOCK_SIZE,
+    )
+
+
+def format_usage(usage):
+    '''Lines of "Resource usage summary" section of a local report'''
+    return ['    %-12s: %r' % (field, usage[field]) for field in USAGE_FIELDS
+            if usage.get(field) is not None]
+
+
+def to_number(text):
+    if '.' in text:
+        return float(text)
+    return int(text)
+
+
+def parse_local_usage(lines):
+    usage = dict()
+    for line in lines:
+        match = local_usage_expr.match(line)
+        if match and match.group(1) in USAGE_FIELDS:
+            usage[match.group(1)] = to_number(match.group(2))
+    return usage
+
+
+def parse_lsf_usage(lines):
+    '''Usage from "Resource usage summary" section of a LSF report'''
+    usage = dict()
+    for line in lines:
+        for field, expr in lsf_usage_exprs:
+            match = expr.match(line)
+            if match is None:
+                continue
+            value = float(match.group(1))
+            if field == 'max_rss':
+                value = int(value * MEMORY_UNITS[match.group(2)])
+            usage[field] = value
+    return usage
+
+
+def parse_lsf_exit_code(line):
+    '''Exit code from a line of the LSF report, None if it tells none'''
+    if line.startswith('Successfully completed.'):
+        return 0
+    match = lsf_exit_code_expr.match(line)
+    if match:
+        return int(match.group(1))
+
+
+def summarize(jobs):
+    '''
+    Aggregate usage of jobs by batch name, as {batch name: summary} where
+    summary has the number of jobs, total and maximal values of the fields.
+    '''
+    summaries = dict()
+    for job in jobs:
+        usage = job.info.get('usage')
+        if not usage:
+            continue
+        summary = summaries.setdefault(job.batch_name, {'jobs': 0})
+        summary['jobs'] += 1
+        for field in ('wall_time', 'cpu_time', 'max_rss', 'read_bytes',
+                      'write_bytes'):
+            if usage.get(field) is None:
+                continue
+            summary['total_' + field] = \
+                summary.get('total_' + field, 0) + usage[field]
+            summary['max_' + field] = max(summary.get('max_' + field, 0),
+                                          usage[field])
+        if usage.get('exit_code'):
+            summary['failed'] = summary.get('failed', 0) + 1
+    return summaries
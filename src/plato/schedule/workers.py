@@ -0,0 +1,359 @@
+'''
+Bounded pool of long-lived worker processes for the local scheduler. Workers
+pull jobs from a shared queue, run them and write the usual report file, and
+send start and completion notices back to the daemon over a pipe. Compared to
+forking a daemonized process with a pidfile per job, this costs milliseconds
+per job and caps the number of jobs running at once.
+
+Select it by setting `executor = pool` in the [local] config section, the
+`pool_size` option defaults to the number of cores.
+
+Pool lives in the daemon process, jobs still queued or running when it exits
+are lost and found failed by their incomplete reports.
+'''
+import os
+import time
+import signal
+import logging
+from collections import deque
+from datetime import datetime
+from select import select
+from subprocess import Popen, PIPE
+from plato.schedule.usage import from_rusage, format_usage
+
+
+logger = logging.getLogger(__name__)
+
+
+LOCAL_TIME_FMT = '{days} days {hours}:{minutes}:{seconds}'
+# Captured output and error of a running job, next to its report.
+OUTPUT_SUFFIX = '.stdout'
+ERROR_SUFFIX = '.stderr'
+# Bytes copied at once from captured output into the report.
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def strfdelta(tdelta, fmt):
+    d = {"days": tdelta.days}
+    d["hours"], rem = divmod(tdelta.seconds, 3600)
+    d["minutes"], d["seconds"] = divmod(rem, 60)
+    return fmt.format(**d)
+
+
+class CappedCapture(object):
+    '''
+    Captured stream of a running job. Above `cap` bytes only the head half
+    is written into the file as it comes and the tail half is kept in
+    memory, it is written after a skip marker by finish(). So the capture
+    file never grows beyond the cap and the marker. Zero cap writes all.
+    '''
+
+    def __init__(self, capture_file, cap=0):
+        self.file = capture_file
+        self.cap = cap
+        self.head_size = cap // 2
+        self.tail_size = cap - self.head_size
+        self.size = 0
+        # Chunks holding (at least) the last tail_size bytes
+        self.tail = deque()
+        self.tail_bytes = 0
+
+    def write(self, data):
+        head = data
+        if self.cap:
+            head = data[:max(0, self.head_size - self.size)]
+        self.size += len(data)
+        if head:
+            self.file.write(head)
+            self.file.flush()
+        if len(head) == len(data):
+            return
+        self.tail.append(data[len(head):])
+        self.tail_bytes += len(self.tail[-1])
+        while self.tail and \
+                self.tail_bytes - len(self.tail[0]) >= self.tail_size:
+            self.tail_bytes -= len(self.tail.popleft())
+
+    def finish(self):
+        if self.cap and self.size > self.cap:
+            self.file.write('\n... [%d bytes skipped] ...\n' % (
+                self.size - self.cap))
+        tail = ''.join(self.tail)
+        self.file.write(tail[max(0, len(tail) - self.tail_size):])
+        self.file.flush()
+        self.tail.clear()
+        self.tail_bytes = 0
+
+
+def pump_output(proc, captures):
+    '''Copy output and error of the process until it closes both.'''
+    streams = {proc.stdout.fileno(): captures[0],
+               proc.stderr.fileno(): captures[1]}
+    while streams:
+        for fd in select(list(streams), [], [])[0]:
+            data = os.read(fd, COPY_CHUNK_SIZE)
+            if data:
+                streams[fd].write(data)
+            else:
+                del streams[fd]
+    for capture in captures:
+        capture.finish()
+
+
+def run_command(shell_command, output_file, error_file, on_start=None,
+                output_cap=0):
+    '''
+    Run command with its output and error streamed into the files, return
+    (success, resource usage, error message). A command exiting with
+    non-zero code or killed by a signal has failed. With on_start, the command
+    runs in a process group of its own and on_start(pid) is called once it
+    has started, so that the group can be signalled. With output_cap, the
+    streams are passed through CappedCapture.
+    '''
+    started_at = time.time()
+    try:
+        cmd_args = shell_command.split(' ')
+        if output_cap:
+            stdout, stderr = PIPE, PIPE
+        else:
+            stdout, stderr = output_file, error_file
+        proc = Popen(cmd_args, stdout=stdout, stderr=stderr,
+                     preexec_fn=os.setpgrp if on_start else None)
+        if on_start is not None:
+            on_start(proc.pid)
+        if output_cap:
+            try:
+                pump_output(proc, (CappedCapture(output_file, output_cap),
+                                   CappedCapture(error_file, output_cap)))
+            finally:
+                proc.stdout.close()
+                proc.stderr.close()
+        # Reap it ourselves to get resource usage of the process.
+        pid, status, rusage = os.wait4(proc.pid, 0)
+        usage = from_rusage(status, rusage, time.time() - started_at)
+        if usage['exit_code'] < 0:
+            return False, usage, 'Killed by signal %d' % -usage['exit_code']
+        if usage['exit_code'] > 0:
+            return False, usage, 'Exited with exit code %d' % \
+                usage['exit_code']
+        return True, usage, ''
+    except Exception as exception:
+        return False, dict(), repr(exception)
+
+
+def make_event(exit_code, started_at, finished_at):
+    '''Completion event of a job, see LocalRunner.get_result()'''
+    return dict(exit_code=exit_code, started_at=started_at,
+                finished_at=finished_at)
+
+
+def copy_bytes(source, target, count=None):
+    '''Copy count bytes (or all) in chunks of bounded size.'''
+    while count is None or count > 0:
+        chunk_size = COPY_CHUNK_SIZE
+        if count is not None:
+            chunk_size = min(chunk_size, count)
+            count -= chunk_size
+        chunk = source.read(chunk_size)
+        if not chunk:
+            break
+        target.write(chunk)
+
+
+def copy_output(source, target):
+    '''Copy captured output, capped already while captured, into the report.'''
+    source.seek(0)
+    copy_bytes(source, target)
+
+
+def write_report(report, shell_command, elapsed, success, output_file,
+                 error_file, usage=None, error_message=''):
+    '''Append job report as parsed by LocalRunner.parse_report()'''
+    report.write('Elapsed time: %s \n' % strfdelta(elapsed, LOCAL_TIME_FMT))
+    report.write('Your job looked like:\n')
+    report.write(shell_command + '\n')
+    if success:
+        report.write('Successfully completed.\n')
+    else:
+        report.write('Job failed with an error: %s.\n' % error_message)
+    if usage:
+        report.write('Resource usage summary:\n')
+        for line in format_usage(usage):
+            report.write(line + '\n')
+    report.write('The output (if any) follows:\n')
+    report.write('Process output was:\n')
+    copy_output(output_file, report)
+    report.write('Process stderror was:\n')
+    copy_output(error_file, report)
+    if not usage:
+        # Command has not run, e.g. it was not found.
+        report.write(error_message)
+
+
+def run_job(shell_command, report_filename, output_cap=0, on_start=None):
+    '''
+    Run the command of a job streaming its output and error into capture
+    files next to the report, so they can be watched while the job runs and
+    never have to fit into memory. Captured output is appended to the
+    report at the end, only its head and tail if it is over output_cap
+    bytes. Returns exit code. See run_command() for on_start.
+    '''
+    started_at = datetime.now()
+    output_path = report_filename + OUTPUT_SUFFIX
+    error_path = report_filename + ERROR_SUFFIX
+    with open(output_path, 'w+') as output_file:
+        with open(error_path, 'w+') as error_file:
+            success, usage, error_message = run_command(
+                shell_command, output_file, error_file, on_start,
+                output_cap)
+            with open(report_filename, 'a+') as report:
+                write_report(report, shell_command,
+                             datetime.now() - started_at, success,
+                             output_file, error_file, usage,
+                             error_message)
+    os.remove(output_path)
+    os.remove(error_path)
+    return usage.get('exit_code')
+
+
+def work(tasks, connection, output_cap=0):
+    '''Worker process loop, a None task stops it.'''
+    for task in iter(tasks.get, None):
+        job_id, shell_command, report_filename = task
+        started_at = time.time()
+        # Pid of the job, the process group to kill it with.
+        on_start = lambda pid: connection.send(('run', job_id, pid,
+                                                started_at))
+        exit_code = None
+        try:
+            exit_code = run_job(shell_command, report_filename, output_cap,
+                                on_start)
+        except (IOError, OSError) as error:
+            logger.error('Failed to write report %s: %s', report_filename,
+                         error)
+        connection.send(('done', job_id, exit_code, started_at, time.time()))
+    connection.close()
+
+
+class WorkerPool(object):
+
+    def __init__(self, size=None, output_cap=0):
+        if not size:
+            import multiprocessing
+            size = multiprocessing.cpu_count()
+        self.size = size
+        self.output_cap = output_cap
+        self.tasks = None
+        self.workers = list()
+        # Job id -> 'pending', 'run' or 'done'
+        self.states = dict()
+        # Job id -> completion event, until popped by pop_finished()
+        self.finished = dict()
+        # Worker index -> id of the job it runs
+        self.running = dict()
+        # Job id -> pid (and process group) of the running job
+        self.pids = dict()
+        # Ids of jobs to kill as soon as they start
+        self.killed = set()
+
+    def start(self):
+        # Imported once the pool is used, not by every plato command.
+        import multiprocessing
+        self.tasks = multiprocessing.Queue()
+        self.workers = [self.start_worker() for index in xrange(self.size)]
+        logger.info('Started pool of (%d) local workers', self.size)
+
+    def start_worker(self):
+        import multiprocessing
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        worker = multiprocessing.Process(target=work, args=(
+            self.tasks, sender, self.output_cap))
+        worker.daemon = True
+        worker.start()
+        sender.close()
+        return worker, receiver
+
+    @property
+    def is_started(self):
+        return self.tasks is not None
+
+    def submit(self, job_id, shell_command, report_filename):
+        if not self.is_started:
+            self.start()
+        self.states[job_id] = 'pending'
+        self.tasks.put((job_id, shell_command, report_filename))
+
+    def receive(self):
+        '''Collect notices sent by workers so far.'''
+        for index, (worker, receiver) in enumerate(self.workers):
+            try:
+                while receiver.poll():
+                    notice = receiver.recv()
+                    self.states[notice[1]] = notice[0]
+                    if notice[0] == 'run':
+                        self.running[index] = notice[1]
+                        self.pids[notice[1]] = notice[2]
+                        if notice[1] in self.killed:
+                            self.kill(notice[1])
+                    else:
+                        self.running.pop(index, None)
+                        self.pids.pop(notice[1], None)
+                        self.killed.discard(notice[1])
+                        self.finished[notice[1]] = make_event(*notice[2:])
+            except (EOFError, IOError):
+                # Worker is gone, its job is found failed by the report.
+                logger.warn('Local worker (%s) has died, replacing it.',
+                            worker.pid)
+                receiver.close()
+                self.workers[index] = self.start_worker()
+                job_id = self.running.pop(index, None)
+                if job_id is not None:
+                    self.pids.pop(job_id, None)
+                    self.states[job_id] = 'done'
+                    self.finished[job_id] = make_event(None, None, time.time())
+
+    def get_state(self, job_id):
+        '''State of the job, None if the pool does not know it.'''
+        self.receive()
+        return self.states.get(job_id)
+
+    def get_readers(self):
+        '''Pipes to wait on for notices, e.g. by select()'''
+        return [receiver for worker, receiver in self.workers]
+
+    def pop_finished(self):
+        '''Completion events of jobs finished since previous call.'''
+        self.receive()
+        finished = self.finished
+        self.finished = dict()
+        return finished
+
+    def kill(self, job_id, signum=signal.SIGTERM):
+        '''
+        Signal process group of the job, or do it as soon as a worker
+        starts it. Killed jobs complete with a failed report as usual.
+        '''
+        if self.states.get(job_id) not in ('pending', 'run'):
+            return
+        pid = self.pids.get(job_id)
+        if pid is None:
+            self.killed.add(job_id)
+            return
+        try:
+            os.killpg(pid, signum)
+        except OSError as error:
+            logger.debug('Failed to kill job [%s]: %s', job_id, error)
+
+    def forget(self, job_id):
+        self.states.pop(job_id, None)
+
+    def close(self):
+        if not self.is_started:
+            return
+        for worker in self.workers:
+            self.tasks.put(None)
+        for worker, receiver in self.workers:
+            worker.join()
+            receiver.close()
+        self.workers = list()
+        self.tasks = None
@@ -0,0 +1,50 @@
+import unittest
+import tempfile
+import os
+import shutil
+import threading
+from plato.schedule.allocator import IdAllocator
+from plato.schedule import Monitor
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.counter_path = os.path.join(self.folder, 'last_id')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def testReserve(self):
+        allocator = IdAllocator(self.counter_path)
+        self.assertEquals(allocator.reserve(), 1)
+        self.assertEquals(allocator.reserve(10), 2)
+        self.assertEquals(allocator.reserve(), 12)
+        self.assertEquals(open(self.counter_path).read(), '12')
+
+    def testConcurrentReserve(self):
+        issued = list()
+
+        def reserve_many():
+            allocator = IdAllocator(self.counter_path)
+            for num in range(50):
+                issued.append(allocator.reserve())
+
+        threads = [threading.Thread(target=reserve_many) for num in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(sorted(issued), range(1, 401))
+
+    def testMonitorBlocks(self):
+        monitor = Monitor(self.folder, 'TEST', id_block_size=100)
+        ids = [monitor.new_job('batch').id for num in range(150)]
+        self.assertEquals(ids, range(1, 151))
+        # Two blocks were reserved.
+        self.assertEquals(IdAllocator(self.counter_path).read_counter(), 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
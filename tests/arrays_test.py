@@ -0,0 +1,51 @@
+import unittest
+from plato.schedule import Job
+from plato.schedule import arrays
+from plato.schedule.slots import get_request
+
+
+class Test(unittest.TestCase):
+
+    def create_array(self, first, last):
+        return Job(1, 'batch', info={
+            'command': 'echo {index}',
+            'cores': 2,
+            'array': arrays.make_array_info(first, last),
+        })
+
+    def testParseRange(self):
+        self.assertEquals(arrays.parse_range('1-100'), (1, 100))
+        self.assertEquals(arrays.parse_range('7'), (7, 7))
+        self.assertRaises(ValueError, arrays.parse_range, '5-1')
+        self.assertRaises(ValueError, arrays.parse_range, 'x')
+
+    def testTaskStatuses(self):
+        job = self.create_array(1, 4)
+        self.assertEquals(arrays.expand_command(job.info['command'], 3),
+                          'echo 3')
+        self.assertEquals(arrays.get_indices(job, ['submit']), [1, 2, 3, 4])
+        self.assertTrue(arrays.set_task_status(job, 1, 'pending'))
+        self.assertFalse(arrays.set_task_status(job, 1, 'pending'))
+        self.assertEquals(arrays.get_array_status(job), 'pending')
+        # Held resources are counted per active task.
+        arrays.set_task_status(job, 2, 'run')
+        self.assertEquals(get_request(job), (4, 0))
+        self.assertEquals(arrays.get_array_status(job), 'run')
+        for index in range(1, 5):
+            self.assertFalse(arrays.is_complete(job))
+            arrays.set_task_status(job, index, 'done')
+        self.assertTrue(arrays.is_complete(job))
+        self.assertEquals(get_request(job), (2, 0))
+
+    def testMergeUsage(self):
+        usage = arrays.merge_usage([
+            dict(exit_code=0, wall_time=2.0, cpu_time=1.5, max_rss=100),
+            dict(exit_code=3, wall_time=1.0, cpu_time=0.5, max_rss=300),
+            dict(exit_code=0),
+        ])
+        self.assertEquals(usage, dict(exit_code=3, wall_time=2.0,
+                                      cpu_time=2.0, max_rss=300))
+
+
+if __name__ == "__main__":
+    unittest.main()
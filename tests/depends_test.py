@@ -0,0 +1,120 @@
+import unittest
+import tempfile
+import os
+import shutil
+from plato.schedule import (Scheduler, Monitor, JobRunner, JobResult)
+from plato.schedule.depends import parse_parents
+from plato.schedule.cancel import JobSelector
+
+
+class AcceptingRunner(JobRunner):
+
+    def execute(self, job):
+        return JobResult(has_failed=False)
+
+
+class PassingRunner(AcceptingRunner):
+
+    passes_dependencies = True
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def create_scheduler(self, RunnerCls=AcceptingRunner):
+        runner = RunnerCls(os.path.join(self.folder, 'reports'),
+                           os.path.join(self.folder, 'attachments'))
+        monitor = Monitor(self.folder, 'TEST', is_interactive=True)
+        return Scheduler(runner, monitor)
+
+    def get_statuses(self, scheduler):
+        return dict((job.id, job.status)
+                    for job in scheduler.monitor.load_jobs())
+
+    def finish(self, scheduler, job_id, has_failed=False):
+        job = [job for job in scheduler.monitor.load_jobs(['pending'])
+               if job.id == job_id][0]
+        scheduler.complete_job(job, JobResult(has_failed))
+
+    def testParseParents(self):
+        self.assertEquals(parse_parents('12, prepare,,13'),
+                          [12, 'prepare', 13])
+
+    def testAfterOk(self):
+        scheduler = self.create_scheduler()
+        scheduler.submit_many(['prepare 1', 'prepare 2'])
+        scheduler.submit_many(['merge'], resources={'after_ok': ['prepare']})
+        scheduler.submit_many(['report'], resources={'after_any': [3]})
+        scheduler.submit_jobs()
+        self.assertEquals(self.get_statuses(scheduler), {
+            1: 'pending', 2: 'pending', 3: 'submit', 4: 'submit'})
+        self.finish(scheduler, 1)
+        scheduler.submit_jobs()
+        self.assertEquals(self.get_statuses(scheduler)[3], 'submit')
+        # Released once the whole batch is done.
+        self.finish(scheduler, 2)
+        scheduler.submit_jobs()
+        self.assertEquals(self.get_statuses(scheduler)[3], 'pending')
+        self.finish(scheduler, 3, has_failed=True)
+        scheduler.submit_jobs()
+        self.assertEquals(self.get_statuses(scheduler)[4], 'pending')
+
+    def testBrokenDependencies(self):
+        scheduler = self.create_scheduler()
+        scheduler.submit_many(['prepare'])
+        scheduler.submit_many(['merge'], resources={'after_ok': [1]})
+        scheduler.submit_many(['report'], resources={'after_ok': ['nothing']})
+        scheduler.submit_jobs()
+        self.assertEquals(self.get_statuses(scheduler), {
+            1: 'pending', 2: 'submit', 3: 'failed'})
+        self.finish(scheduler, 1, has_failed=True)
+        scheduler.submit_jobs()
+        self.assertEquals(self.get_statuses(scheduler)[2], 'failed')
+
+    def testCancelledParent(self):
+        scheduler = self.create_scheduler()
+        scheduler.submit_many(['prepare 1', 'prepare 2'])
+        scheduler.submit_many(['merge'], resources={'after_ok': [1]})
+        scheduler.submit_many(['report'], resources={'after_any': [2]})
+        scheduler.submit_jobs()
+        scheduler.cancel_jobs(JobSelector(1, 2))
+        scheduler.submit_jobs()
+        self.assertEquals(self.get_statuses(scheduler), {
+            1: 'cancelled', 2: 'cancelled', 3: 'failed', 4: 'pending'})
+
+    def testPassDown(self):
+        scheduler = self.create_scheduler(PassingRunner)
+        scheduler.submit_many(['prepare'])
+        scheduler.submit_many(['merge'], resources={'after_ok': [1]})
+        scheduler.submit_jobs()
+        # Parent was accepted during this pass, the child goes next pass.
+        self.assertEquals(self.get_statuses(scheduler)[2], 'submit')
+        scheduler.submit_jobs()
+        job = scheduler.monitor.load_jobs(['pending'])[-1]
+        self.assertEquals(job.id, 2)
+        self.assertEquals(job.info['wait_for'], [['after_ok', 1]])
+
+    def testParentsSubmittedWithChild(self):
+        scheduler = self.create_scheduler()
+        scheduler.submit_many(['first'])
+        scheduler.submit_many(['second'], resources={'after_ok': [1]})
+        scheduler.submit_jobs()
+        # Tracker is loaded, parents and the child come in together.
+        scheduler.submit_many(['prep'] * 5, batch_name='prep')
+        scheduler.submit_many(['merge'], resources={'after_ok': ['prep']})
+        jobs = sorted(scheduler.monitor.load_jobs(['submit']),
+                      key=lambda job: job.id, reverse=True)
+        ready_jobs = scheduler.release_jobs(jobs)
+        self.assertEquals(sorted(job.id for job in ready_jobs),
+                          [3, 4, 5, 6, 7])
+        scheduler.submit_jobs()
+        self.assertEquals(self.get_statuses(scheduler)[8], 'submit')
+
+
+if __name__ == "__main__":
+    unittest.main()
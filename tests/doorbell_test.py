@@ -0,0 +1,52 @@
+import unittest
+import tempfile
+import os
+import shutil
+from select import select
+from plato.schedule import Scheduler, Monitor, JobRunner
+from plato.schedule.doorbell import Doorbell
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'doorbell')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def testRing(self):
+        # Nobody listens yet.
+        self.assertFalse(Doorbell(self.path).ring())
+        doorbell = Doorbell(self.path)
+        doorbell.open()
+        self.assertEquals(select([doorbell], [], [], 0)[0], [])
+        self.assertFalse(doorbell.drain())
+        for index in range(3):
+            self.assertTrue(Doorbell(self.path).ring())
+        self.assertEquals(select([doorbell], [], [], 0)[0], [doorbell])
+        self.assertTrue(doorbell.drain())
+        self.assertEquals(select([doorbell], [], [], 0)[0], [])
+        doorbell.close()
+        # Left behind by a daemon, nobody listens anymore.
+        self.assertFalse(Doorbell(self.path).ring())
+
+    def create_scheduler(self):
+        runner = JobRunner(os.path.join(self.folder, 'reports'),
+                           os.path.join(self.folder, 'attachments'))
+        monitor = Monitor(self.folder, 'TEST', is_interactive=True)
+        return Scheduler(runner, monitor)
+
+    def testSubmitWakesDaemon(self):
+        daemon = self.create_scheduler()
+        daemon.doorbell.open()
+        client = self.create_scheduler()
+        client.submit_many(['echo 1'])
+        self.assertEquals(select([daemon.doorbell], [], [], 0)[0],
+                          [daemon.doorbell])
+        daemon.doorbell.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import tempfile
+import os
+import shutil
+from ConfigParser import ConfigParser
+from plato.schedule import Scheduler
+from plato.schedule.cancel import JobSelector
+from plato.schedule.pipeline import StepPool
+from plato.schedule.fakelsf import FakeLsf, KILLED_EXIT_CODE, setup
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def create_scheduler(self, **simulation):
+        bin_path = os.path.join(self.folder, 'fakelsf')
+        home = setup(bin_path, os.path.join(self.folder, 'fakelsf_home'))
+        with open(os.path.join(home, 'fakelsf.conf'), 'w') as conf:
+            conf.write('[DEFAULT]\n')
+            for name, value in simulation.iteritems():
+                conf.write('%s = %s\n' % (name, value))
+        config = ConfigParser()
+        config.add_section('scheduler')
+        config.set('scheduler', 'isinteractive', '1')
+        config.set('scheduler', 'reports_path',
+                   os.path.join(self.folder, 'reports'))
+        config.set('scheduler', 'attachments_path',
+                   os.path.join(self.folder, 'attachments'))
+        config.add_section('lsf')
+        config.set('lsf', 'bin_path', bin_path)
+        config.set('lsf', 'query_cache_ttl', '0')
+        for folder in ('reports', 'attachments'):
+            os.mkdir(os.path.join(self.folder, folder))
+        self.home = home
+        return Scheduler.create('LSF', self.folder, config)
+
+    def run_jobs(self, scheduler, count):
+        for attempt in range(20):
+            scheduler.submit_jobs()
+            scheduler.process_jobs()
+            if len(scheduler.monitor.load_jobs(['done', 'failed'])) == count:
+                break
+        return dict((job.id, job) for job
+                    in scheduler.monitor.load_jobs(['done', 'failed']))
+
+    def testJobs(self):
+        scheduler = self.create_scheduler(run_time=0)
+        scheduler.submit_many(['echo %d' % num for num in range(3)])
+        scheduler.submit_array('echo {index}', 1, 4)
+        scheduler.submit_many(['echo merge'], resources={'after_ok': [4]})
+        jobs = self.run_jobs(scheduler, 5)
+        self.assertEquals(sorted(jobs), [1, 2, 3, 4, 5])
+        for job in jobs.itervalues():
+            self.assertEquals(job.status, 'done')
+            self.assertEquals(job.info['usage']['exit_code'], 0)
+        self.assertEquals(sorted(jobs[4].result.details['tasks']),
+                          ['1', '2', '3', '4'])
+
+    def testStepThreads(self):
+        scheduler = self.create_scheduler(run_time=0)
+        scheduler.config.set('scheduler', 'step_threads', '4')
+        scheduler.step_pool = StepPool.from_config(scheduler.config)
+        scheduler.submit_many(['echo %d' % num for num in range(8)])
+        scheduler.submit_many(['echo merge'], resources={'after_ok': [1, 8]})
+        jobs = self.run_jobs(scheduler, 9)
+        self.assertEquals(sorted(jobs), range(1, 10))
+        for job in jobs.itervalues():
+            self.assertEquals(job.status, 'done')
+        self.assertEquals(jobs[9].info['wait_for'],
+                          [['after_ok', 1], ['after_ok', 8]])
+        scheduler.step_pool.close()
+
+    def testFailures(self):
+        scheduler = self.create_scheduler(run_time=0, failure_rate=1)
+        scheduler.submit_many(['false'])
+        scheduler.submit_many(['echo merge'], resources={'after_ok': [1]})
+        jobs = self.run_jobs(scheduler, 2)
+        self.assertEquals([job.status for job in jobs.itervalues()],
+                          ['failed', 'failed'])
+        self.assertEquals(jobs[1].info['usage']['exit_code'], 1)
+
+    def testCancel(self):
+        scheduler = self.create_scheduler(run_time=600)
+        scheduler.submit_many(['sleep 600'] * 3, batch_name='slow')
+        scheduler.submit_array('sleep {index}', 1, 4, batch_name='slow')
+        scheduler.submit_many(['echo merge'], resources={'after_ok': [4]})
+        scheduler.submit_jobs()
+        cancelled = scheduler.cancel_jobs(JobSelector(first_id=2,
+                                                      batch_name='slow'))
+        self.assertEquals(sorted(job.id for job in cancelled), [2, 3, 4])
+        # One bkill for all, the array with all its tasks.
+        killed = FakeLsf(self.home).connection.execute(
+            'SELECT name FROM jobs WHERE exit_code = ? AND finished_at '
+            'IS NOT NULL', (KILLED_EXIT_CODE,)).fetchall()
+        self.assertEquals(sorted(row[0] for row in killed),
+                          ['plato_2', 'plato_3'] + ['plato_4'] * 4)
+        jobs = self.run_jobs(scheduler, 1)
+        self.assertEquals(jobs.keys(), [5])
+        self.assertEquals(jobs[5].status, 'failed')
+        self.assertEquals([job.id for job in scheduler.monitor.load_jobs(
+            ['pending', 'run'])], [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
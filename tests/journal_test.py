@@ -0,0 +1,92 @@
+import unittest
+import tempfile
+import os
+import shutil
+from ConfigParser import ConfigParser
+from plato.schedule import (Scheduler, JobRunner, JobResult)
+from plato.schedule.journal import JournalMonitor
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def create_monitor(self, compact_records=1000):
+        config = ConfigParser()
+        config.add_section('scheduler')
+        config.set('scheduler', 'journal_compact_records',
+                   str(compact_records))
+        runner = JobRunner(os.path.join(self.folder, 'reports'),
+                           os.path.join(self.folder, 'attachments'))
+        monitor = JournalMonitor(self.folder, 'TEST', is_interactive=True)
+        Scheduler(runner, monitor, config=config)
+        return monitor
+
+    def testTransitions(self):
+        monitor = self.create_monitor()
+        job = monitor.new_job('batch')
+        job.info = {'command': 'echo 1'}
+        monitor.attach_job(job)
+        job.info['pending_since'] = 1
+        monitor.change_status(job, 'pending')
+        job.result = JobResult(False, output='1')
+        monitor.change_status(job, 'done')
+        # Another process sees the same state.
+        reader = self.create_monitor()
+        jobs = reader.load_jobs(['done'])
+        self.assertEquals(len(jobs), 1)
+        self.assertEquals(jobs[0].info['pending_since'], 1)
+        self.assertEquals(jobs[0].result.output, '1')
+        self.assertEquals(reader.load_jobs(['submit', 'pending']), [])
+        monitor.detach_job(job)
+        self.assertEquals(reader.load_jobs(), [])
+
+    def testChangeStatuses(self):
+        monitor = self.create_monitor()
+        jobs = [monitor.new_job('batch') for index in range(3)]
+        monitor.attach_jobs(jobs)
+        monitor.change_statuses(jobs[1:], 'cancelled')
+        reader = self.create_monitor()
+        self.assertEquals([job.id for job
+                           in reader.load_jobs(['cancelled'])], [2, 3])
+        self.assertEquals([job.id for job in reader.load_jobs(['submit'])],
+                          [1])
+
+    def testCompaction(self):
+        monitor = self.create_monitor(compact_records=10)
+        reader = self.create_monitor(compact_records=10)
+        for num in range(25):
+            job = monitor.new_job('batch')
+            job.info = {'command': 'echo %d' % num}
+            monitor.attach_job(job)
+            monitor.change_status(job, 'pending')
+        monitor.wait_for_compaction()
+        self.assertTrue(os.path.exists(monitor.snapshot_path))
+        self.assertFalse(os.path.exists(monitor.get_log_path(0)))
+        self.assertEquals(len(reader.load_jobs(['pending'])), 25)
+        self.assertEquals(len(self.create_monitor().load_jobs()), 25)
+
+    def testStaleCompaction(self):
+        monitor = self.create_monitor(compact_records=10)
+        for num in range(25):
+            job = monitor.new_job('batch')
+            monitor.attach_job(job)
+            monitor.change_status(job, 'pending')
+            monitor.wait_for_compaction()
+        base = monitor.read_snapshot_base()
+        self.assertTrue(base > 1)
+        # Compaction of an older generation finishing late is dropped.
+        monitor.write_snapshot([], 1)
+        self.assertEquals(monitor.read_snapshot_base(), base)
+        self.assertEquals(len(self.create_monitor().load_jobs()), 25)
+        self.assertEquals(sorted(name for name in os.listdir(self.folder)
+                                 if name.startswith('TEST_journal.snapshot')),
+                          ['TEST_journal.snapshot'])
+
+
+if __name__ == "__main__":
+    unittest.main()
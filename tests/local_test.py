@@ -0,0 +1,216 @@
+import unittest
+import tempfile
+import os
+import shutil
+import time
+import logging
+import logging.handlers
+from ConfigParser import ConfigParser
+from plato.schedule import Scheduler
+from plato.schedule.cancel import JobSelector
+from plato.schedule.local import ProcessUtil
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def create_scheduler(self, executor):
+        config = ConfigParser()
+        config.add_section('scheduler')
+        config.set('scheduler', 'isinteractive', '1')
+        config.set('scheduler', 'reports_path',
+                   os.path.join(self.folder, 'reports'))
+        config.set('scheduler', 'attachments_path',
+                   os.path.join(self.folder, 'attachments'))
+        config.add_section('local')
+        config.set('local', 'pidfiles_path',
+                   os.path.join(self.folder, 'pidfiles'))
+        config.set('local', 'executor', executor)
+        config.set('local', 'pool_size', '2')
+        for folder in ('reports', 'attachments', 'pidfiles'):
+            os.mkdir(os.path.join(self.folder, folder))
+        return Scheduler.create('LOCAL', self.folder, config)
+
+    def run_jobs(self, executor):
+        scheduler = self.create_scheduler(executor)
+        scheduler.submit_many(['echo %d' % num for num in range(3)])
+        scheduler.submit_many(['false'])
+        for attempt in range(50):
+            scheduler.complete_finished_jobs()
+            scheduler.submit_jobs()
+            scheduler.runner.wait_events(0.1)
+            if len(scheduler.monitor.load_jobs(['done', 'failed'])) == 4:
+                break
+        jobs = scheduler.monitor.load_jobs(['done'])
+        self.assertEquals(len(jobs), 3)
+        # Non-zero exit code fails the job.
+        failed_jobs = scheduler.monitor.load_jobs(['failed'])
+        self.assertEquals([job.id for job in failed_jobs], [4])
+        self.assertEquals(failed_jobs[0].info['usage']['exit_code'], 1)
+        for job in jobs:
+            self.assertEquals(job.result.details['local_exit_code'], 0)
+            self.assertEquals(job.info['usage']['exit_code'], 0)
+            self.assertTrue(job.info['usage']['max_rss'] > 0)
+            self.assertEquals(job.result.output[1:2], [str(job.id - 1)])
+            self.assertTrue(job.result.details['local_finished_at'] >=
+                            job.result.details['local_started_at'])
+        if scheduler.runner.pool is not None:
+            # Finished jobs are forgotten by the pool.
+            self.assertEquals(scheduler.runner.pool.states, {})
+            scheduler.runner.pool.close()
+
+    def testPoolExecutor(self):
+        self.run_jobs('pool')
+
+    def testForkExecutor(self):
+        self.run_jobs('fork')
+
+    def testAdmission(self):
+        scheduler = self.create_scheduler('pool')
+        scheduler.config.set('local', 'cores', '4')
+        scheduler.config.set('local', 'memory', '1000')
+        scheduler.submit_many(['sleep 1'] * 2, resources={'cores': 2})
+        scheduler.submit_many(['sleep 1'], resources={'memory': 2000})
+        scheduler.submit_many(['sleep 1'])
+        scheduler.submit_jobs()
+        monitor = scheduler.monitor
+        self.assertEquals(len(monitor.load_jobs(['pending'])), 2)
+        # Submission order is kept, the smaller job does not overtake.
+        self.assertEquals(sorted(job.id for job
+                                 in monitor.load_jobs(['submit'])), [3, 4])
+        scheduler.runner.pool.close()
+
+    def testArrayAdmission(self):
+        scheduler = self.create_scheduler('pool')
+        scheduler.config.set('local', 'cores', '4')
+        scheduler.submit_array('sleep 1', 1, 5)
+        scheduler.submit_many(['sleep 1'], resources={'cores': 2})
+        scheduler.submit_jobs()
+        monitor = scheduler.monitor
+        self.assertEquals(len(monitor.load_jobs(['pending'])), 2)
+        # Array leaves the cores admitted to the job after it.
+        array_job = [job for job in monitor.load_jobs(['pending'])
+                     if job.id == 1][0]
+        self.assertEquals(array_job.info['array']['tasks'].values().count(
+            'pending'), 2)
+        scheduler.runner.pool.close()
+
+    def run_array(self, executor):
+        scheduler = self.create_scheduler(executor)
+        scheduler.config.set('local', 'cores', '2')
+        job = scheduler.submit_array('echo {index}', 1, 5)
+        scheduler.submit_jobs()
+        # Tasks are expanded lazily, as many as there are cores.
+        self.assertEquals(scheduler.monitor.load_jobs(['pending'])[0].info[
+            'array']['tasks'].values().count('pending'), 2)
+        for attempt in range(100):
+            scheduler.complete_finished_jobs()
+            scheduler.runner.wait_events(0.1)
+            scheduler.process_jobs()
+            if scheduler.monitor.load_jobs(['done']):
+                break
+        jobs = scheduler.monitor.load_jobs(['done'])
+        self.assertEquals([job.id for job in jobs], [job.id])
+        tasks = jobs[0].result.details['tasks']
+        self.assertEquals(sorted(tasks, key=int), ['1', '2', '3', '4', '5'])
+        for task in tasks.itervalues():
+            self.assertFalse(task['has_failed'])
+            self.assertEquals(task['usage']['exit_code'], 0)
+        self.assertEquals(jobs[0].info['usage']['exit_code'], 0)
+        report_path = scheduler.runner.get_task_report_filepath(jobs[0], 4)
+        self.assertTrue('4' in open(report_path).read().split('\n'))
+        if scheduler.runner.pool is not None:
+            self.assertEquals(scheduler.runner.pool.states, {})
+            scheduler.runner.pool.close()
+
+    def testPoolArray(self):
+        self.run_array('pool')
+
+    def testForkArray(self):
+        self.run_array('fork')
+
+    def cancel_jobs(self, executor):
+        scheduler = self.create_scheduler(executor)
+        scheduler.config.set('local', 'cores', '4')
+        scheduler.submit_many(['sleep 30'] * 2, batch_name='slow')
+        scheduler.submit_many(['echo merge'], resources={'after_ok': [1]})
+        scheduler.submit_jobs()
+        scheduler.runner.wait_events(0.5)
+        cancelled = scheduler.cancel_jobs(JobSelector(batch_name='slow'))
+        self.assertEquals(sorted(job.id for job in cancelled), [1, 2])
+        monitor = scheduler.monitor
+        for attempt in range(50):
+            scheduler.complete_finished_jobs()
+            scheduler.submit_jobs()
+            scheduler.runner.wait_events(0.1)
+            if monitor.load_jobs(['failed']):
+                break
+        self.assertEquals(sorted(job.id for job
+                                 in monitor.load_jobs(['cancelled'])), [1, 2])
+        # Child of a cancelled job never runs.
+        self.assertEquals([job.id for job in monitor.load_jobs(['failed'])],
+                          [3])
+        self.assertEquals(monitor.load_jobs(['pending', 'run', 'done']), [])
+        return scheduler
+
+    def testPoolCancel(self):
+        scheduler = self.cancel_jobs('pool')
+        pool = scheduler.runner.pool
+        for attempt in range(50):
+            if not pool.pids:
+                break
+            pool.receive()
+            time.sleep(0.1)
+        self.assertEquals(pool.pids, {})
+        pool.close()
+
+    def testPoolCancelElsewhere(self):
+        scheduler = self.create_scheduler('pool')
+        scheduler.submit_many(['sleep 30'], batch_name='slow')
+        scheduler.submit_jobs()
+        pool = scheduler.runner.pool
+        for attempt in range(50):
+            if pool.get_state(1) == 'run':
+                break
+            time.sleep(0.1)
+        # E.g. `plato cancel` working without the daemon
+        other = Scheduler.create('LOCAL', self.folder, scheduler.config)
+        handler = logging.handlers.BufferingHandler(10)
+        local_logger = logging.getLogger('plato.schedule.local')
+        local_logger.addHandler(handler)
+        try:
+            other.cancel_jobs(JobSelector(batch_name='slow'))
+        finally:
+            local_logger.removeHandler(handler)
+        self.assertTrue(any('not killed' in record.getMessage()
+                            for record in handler.buffer))
+        self.assertEquals(pool.get_state(1), 'run')
+        pool.kill(1)
+        pool.close()
+
+    def testForkCancel(self):
+        scheduler = self.cancel_jobs('fork')
+        for job in scheduler.monitor.load_jobs(['cancelled']):
+            pidfile_path = job.info['local_pidfile_path']
+            for attempt in range(50):
+                if not ProcessUtil.process_runs(pidfile_path):
+                    break
+                time.sleep(0.1)
+            self.assertFalse(ProcessUtil.process_runs(pidfile_path))
+
+    def testListJobsByPid(self):
+        runner = self.create_scheduler('fork').runner
+        pid = str(os.getpid())
+        jobs = runner.list_jobs([pid, '999999999'])
+        self.assertEquals(jobs.keys(), [pid])
+        self.assertEquals(jobs[pid]['local_status'], 'RUN')
+        self.assertEquals(runner.list_jobs([]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
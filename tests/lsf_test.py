@@ -0,0 +1,61 @@
+import unittest
+import tempfile
+import os
+import shutil
+import json
+from time import time
+from plato.schedule.lsf import parse_job_list, LIST_DELIMITER
+from plato.schedule.querycache import QueryCache
+
+
+JOB_LIST = '''
+19460073|yyauhen|DONE|pub.1h|brutus4|a3241|Apr 17 14:54|plato_12
+19460074|yyauhen|RUN|pub.1h|brutus4|a3242|Apr 17 14:55|plato_13[2]
+19460074|yyauhen|PEND|pub.1h|brutus4|-|Apr 17 14:55|plato_13[3]
+19460075|yyauhen|PEND|pub.1h|brutus4|-|Apr 17 14:56|plato_|odd|name
+not a job line
+'''
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def testParseJobList(self):
+        jobs = parse_job_list(JOB_LIST)
+        self.assertEquals(sorted(jobs), ['19460073', '19460074[2]',
+                                         '19460074[3]', '19460075'])
+        self.assertEquals(jobs['19460073']['lsf_status'], 'DONE')
+        self.assertEquals(jobs['19460073']['lsf_submitted_time'],
+                          'Apr 17 14:54')
+        self.assertEquals(jobs['19460074[3]']['lsf_status'], 'PEND')
+        self.assertEquals(jobs['19460075']['lsf_job_name'].count(
+            LIST_DELIMITER), 2)
+
+    def testQueryCache(self):
+        path = os.path.join(self.folder, 'jobs.json')
+        cache = QueryCache(path, ttl=10)
+        self.assertEquals(cache.get('*'), None)
+        cache.put(['1', '2'], {'1': {'lsf_status': 'RUN'}})
+        self.assertEquals(QueryCache(path).get(['2'])['1']['lsf_status'],
+                          'RUN')
+        # Not covered by the snapshot.
+        self.assertEquals(cache.get(['3']), None)
+        self.assertEquals(cache.get('*'), None)
+        cache.put('*', {})
+        self.assertEquals(cache.get(['3']), {})
+        cache.ttl = 0
+        self.assertEquals(cache.get('*'), None)
+        # Expired snapshot
+        with open(path, 'w') as cache_file:
+            json.dump(dict(taken_at=time() - 20, query='*', jobs={}),
+                      cache_file)
+        self.assertEquals(QueryCache(path, ttl=10).get('*'), None)
+        self.assertEquals(os.listdir(self.folder), ['jobs.json'])
+
+if __name__ == "__main__":
+    unittest.main()
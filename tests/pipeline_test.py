@@ -0,0 +1,48 @@
+import unittest
+import time
+import threading
+from plato.schedule.pipeline import StepPool
+
+
+class Test(unittest.TestCase):
+
+    def testOrder(self):
+        step_pool = StepPool(4, chunk_size=1)
+        threads = set()
+
+        def square(number):
+            # Later jobs finish first.
+            time.sleep(0.01 * (10 - number))
+            threads.add(threading.current_thread().name)
+            return number * number
+
+        pairs = list(step_pool.map_jobs(square, range(10)))
+        self.assertEquals(pairs, [(number, number * number)
+                                  for number in range(10)])
+        self.assertTrue(len(threads) > 1)
+        step_pool.close()
+
+    def testError(self):
+        step_pool = StepPool(4)
+        seen = list()
+
+        def check(number):
+            if number == 5:
+                raise ValueError(number)
+            return number
+
+        with self.assertRaises(ValueError):
+            for number, value in step_pool.map_jobs(check, range(10)):
+                seen.append(value)
+        # Jobs before the failed one are handed out, as if sequential.
+        self.assertEquals(seen, range(5))
+        step_pool.close()
+
+    def testSequential(self):
+        step_pool = StepPool(1)
+        pairs = step_pool.map_jobs(lambda number: -number, [1, 2])
+        self.assertEquals(list(pairs), [(1, -1), (2, -2)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+from plato.schedule import Job
+from plato.schedule.polling import PollingSchedule
+
+
+class Test(unittest.TestCase):
+
+    def create_jobs(self, count, since):
+        return [Job(num, 'batch', status='run',
+                    info={'pending_since': since}) for num in range(count)]
+
+    def testBackoff(self):
+        polling = PollingSchedule(min_interval=1, max_interval=100,
+                                  backoff=0.5)
+        jobs = self.create_jobs(10, since=0)
+        # All jobs are due when seen first.
+        due_jobs = polling.select_due(jobs, 1000)
+        self.assertEquals(len(due_jobs), 10)
+        for job in due_jobs:
+            polling.reschedule(job, False, 1000)
+        # Old jobs back off up to the max interval.
+        self.assertEquals(polling.select_due(jobs, 1050), [])
+        self.assertEquals(len(polling.select_due(jobs, 1100)), 10)
+
+    def testZeroMinInterval(self):
+        polling = PollingSchedule(min_interval=0, max_interval=100,
+                                  backoff=0.5)
+        jobs = self.create_jobs(3, since=1000)
+        # Each job is due once per call, also if due again at once.
+        self.assertEquals(len(polling.select_due(jobs, 1000)), 3)
+        self.assertEquals(len(polling.select_due(jobs, 1000)), 3)
+        for job in jobs:
+            polling.reschedule(job, True, 1000)
+        self.assertEquals(len(polling.select_due(jobs, 1000)), 3)
+
+    def testNextDueAt(self):
+        polling = PollingSchedule(min_interval=1, max_interval=100,
+                                  backoff=0.5)
+        self.assertEquals(polling.next_due_at(), None)
+        jobs = self.create_jobs(2, since=900)
+        for job in polling.select_due(jobs, 1000):
+            polling.reschedule(job, job.id == 0, 1000)
+        self.assertEquals(polling.next_due_at(), 1001)
+        # Stale items of forgotten jobs are skipped.
+        polling.select_due(jobs[1:], 1000)
+        self.assertEquals(polling.next_due_at(), 1050)
+
+    def testChangedAndForgotten(self):
+        polling = PollingSchedule(min_interval=1, max_interval=100,
+                                  backoff=0.5)
+        jobs = self.create_jobs(2, since=0)
+        for job in polling.select_due(jobs, 1000):
+            polling.reschedule(job, job.id == 0, 1000)
+        self.assertEquals([job.id for job in polling.select_due(jobs, 1001)],
+                          [0])
+        jobs[1].status = 'done'
+        polling.reschedule(jobs[1], True, 1001)
+        self.assertFalse(1 in polling.due)
+        # Job 0 is not loaded anymore, e.g. completed by another process.
+        self.assertEquals(polling.select_due([], 2000), [])
+        self.assertEquals(polling.due, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+from StringIO import StringIO
+from plato.schedule import JobResult
+from plato.schedule.usage import parse_lsf_usage, parse_lsf_exit_code
+from plato.schedule.reports import ReportParser, read_lines, SKIPPED_MARK
+
+
+LSF_REPORT = '''Sender: LSF System <lsfadmin@a3241>
+Subject: Job 19460073: <echo> Done
+
+Your job looked like:
+
+------------------------------------------------------------
+# LSBATCH: User input
+echo
+------------------------------------------------------------
+
+Exited with exit code 3.
+
+Resource usage summary:
+
+    CPU time   :      2.45 sec.
+    Max Memory :         3 MB
+    Run time : 12 sec.
+
+The output (if any) follows:
+
+%s
+'''
+
+
+class Test(unittest.TestCase):
+
+    def parse(self, output, **options):
+        parser = ReportParser(parse_lsf_usage, parse_lsf_exit_code,
+                              keep_usage=True, **options)
+        result = JobResult(has_failed=True)
+        parser.parse_file(StringIO(LSF_REPORT % output), result)
+        return result
+
+    def testSections(self):
+        result = self.parse('line 1\nline 2')
+        self.assertTrue(result.has_failed)
+        self.assertEquals(result.output, ['', 'line 1', 'line 2'])
+        self.assertEquals(result.details['usage'], {
+            'exit_code': 3, 'cpu_time': 2.45, 'wall_time': 12.0,
+            'max_rss': 3 * 1024 ** 2})
+        self.assertTrue('# LSBATCH: User input' in result.details['input'])
+        self.assertEquals(result.details['header'][0],
+                          'Sender: LSF System <lsfadmin@a3241>')
+
+    def testLongOutput(self):
+        output = '\n'.join('line %d' % num for num in range(10000))
+        result = self.parse(output, max_lines=10)
+        self.assertEquals(result.output[-1], 'line 8')
+        result = self.parse(output, max_lines=10, tail_lines=3)
+        self.assertEquals(result.output[10:], [SKIPPED_MARK, 'line 9997',
+                                               'line 9998', 'line 9999'])
+        # Output just a bit longer than the head has no gap.
+        result = self.parse('\n'.join('%d' % num for num in range(11)),
+                            max_lines=10, tail_lines=3)
+        self.assertEquals(result.output, [''] + map(str, range(11)))
+
+    def testLongLines(self):
+        report = StringIO('a' * 100 + '\nb\n')
+        self.assertEquals(list(read_lines(report, 10)), ['a' * 10, 'b'])
+
+
+if __name__ == "__main__":
+    unittest.main()
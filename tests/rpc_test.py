@@ -0,0 +1,131 @@
+import unittest
+import tempfile
+import os
+import shutil
+import socket
+import threading
+import logging
+import logging.handlers
+from select import select
+from plato.schedule import Scheduler, Monitor, JobRunner, JobResult
+from plato.commands import get_methods
+from plato.rpc import (RpcServer, RpcClient, RpcError, DaemonNotRunning,
+                       SocketPathTooLong)
+
+
+class AcceptingRunner(JobRunner):
+
+    def execute(self, job):
+        return JobResult(has_failed=False)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'plato.sock')
+        self.is_serving = True
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def create_scheduler(self):
+        runner = AcceptingRunner(os.path.join(self.folder, 'reports'),
+                                 os.path.join(self.folder, 'attachments'))
+        monitor = Monitor(self.folder, 'TEST', is_interactive=True)
+        return Scheduler(runner, monitor)
+
+    def serve(self, server):
+        while self.is_serving:
+            if select([server], [], [], 0.05)[0]:
+                server.serve_ready()
+
+    def start_daemon(self, scheduler):
+        server = RpcServer(self.path, get_methods(scheduler))
+        server.open()
+        thread = threading.Thread(target=self.serve, args=(server,))
+        thread.start()
+        return server, thread
+
+    def stop_daemon(self, server, thread):
+        self.is_serving = False
+        thread.join()
+        server.close()
+
+    def testRequests(self):
+        scheduler = self.create_scheduler()
+        server, thread = self.start_daemon(scheduler)
+        try:
+            client = RpcClient(self.path)
+            self.assertEquals(client.call(
+                'submit', commands=['prepare 1', 'prepare 2'],
+                batch_name='prepare'), {'count': 2})
+            self.assertEquals(client.call(
+                'submit', commands=['merge'], after_ok='prepare'),
+                {'count': 1})
+            result = client.call('submit', commands=['echo {index}'],
+                                 array='1-3', resources={'cores': 2})
+            self.assertEquals(result, {'count': 1, 'id': 4, 'tasks': 3})
+            self.assertEquals(client.call('cancel', batch_name='prepare'),
+                              [1, 2])
+            result = client.call('status', ids='2-3')
+            self.assertEquals(result['counts']['cancelled'], 2)
+            self.assertEquals(result['counts']['submit'], 2)
+            self.assertEquals(result['jobs'], [[2, 'cancelled', 'prepare'],
+                                               [3, 'submit', 'merge']])
+            with self.assertRaises(RpcError):
+                client.call('cancel', statuses='done')
+            with self.assertRaises(RpcError):
+                client.call('submit', commands=['echo'], array='3-1')
+            with self.assertRaises(RpcError):
+                client.call('unknown')
+            jobs = scheduler.monitor.load_jobs(['submit'])
+            self.assertEquals(jobs[0].info['after_ok'], ['prepare'])
+            self.assertEquals(jobs[1].info['cores'], 2)
+        finally:
+            self.stop_daemon(server, thread)
+        self.assertFalse(os.path.exists(self.path))
+
+    def testNoDaemon(self):
+        with self.assertRaises(DaemonNotRunning):
+            RpcClient(self.path).call('status')
+        # Socket left by a daemon which did not exit cleanly.
+        stale_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale_socket.bind(self.path)
+        stale_socket.close()
+        with self.assertRaises(DaemonNotRunning):
+            RpcClient(self.path).call('status')
+        server = RpcServer(self.path, {})
+        server.open()
+        with self.assertRaises(RpcError):
+            RpcServer(self.path, {}).open()
+        server.close()
+
+    def testPathTooLong(self):
+        path = os.path.join(self.folder, 'x' * 120, 'plato.sock')
+        # The command line falls back to working by itself.
+        with self.assertRaises(DaemonNotRunning):
+            RpcClient(path).call('status')
+        with self.assertRaises(SocketPathTooLong):
+            RpcServer(path, {}).open()
+
+    def testInvalidArguments(self):
+        def fail(ids):
+            raise ValueError('Invalid index range: %s' % ids)
+        handler = logging.handlers.BufferingHandler(10)
+        rpc_logger = logging.getLogger('plato.rpc')
+        rpc_logger.addHandler(handler)
+        try:
+            response = RpcServer(self.path, {'status': fail}).handle(
+                '{"method": "status", "params": {"ids": "x"}}')
+        finally:
+            rpc_logger.removeHandler(handler)
+        self.assertEquals(response,
+                          {'error': 'ValueError: Invalid index range: x'})
+        # Logged without a traceback
+        self.assertEquals([record.exc_info for record in handler.buffer],
+                          [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
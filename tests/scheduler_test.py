@@ -0,0 +1,107 @@
+import unittest
+import tempfile
+import os
+import shutil
+from plato import schedule
+from plato.schedule import (Scheduler, Monitor, JobRunner, JobResult, Job)
+from plato.schedule.sqlitedb import SqliteMonitor
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def create_scheduler(self, MonitorCls=Monitor):
+        runner = JobRunner(os.path.join(self.folder, 'reports'),
+                           os.path.join(self.folder, 'attachments'))
+        monitor = MonitorCls(self.folder, 'TEST', is_interactive=True)
+        return Scheduler(runner, monitor)
+
+    def testSubmitMany(self):
+        for MonitorCls in (Monitor, SqliteMonitor):
+            scheduler = self.create_scheduler(MonitorCls)
+            commands = ('echo %d\n' % num for num in range(25))
+            count = scheduler.submit_many(commands, chunk_size=10)
+            self.assertEquals(count, 25)
+            jobs = scheduler.monitor.load_jobs(['submit'])
+            self.assertEquals(len(jobs), 25)
+            self.assertEquals(sorted(job.id for job in jobs), range(1, 26))
+            self.assertTrue(all(job.batch_name == 'echo' for job in jobs))
+            shutil.rmtree(self.folder)
+            os.mkdir(self.folder)
+
+    def testMonitorIndex(self):
+        scheduler = self.create_scheduler()
+        monitor = scheduler.monitor
+        monitor.index.racy_secs = 0
+        scheduler.submit_many(['echo %d' % num for num in range(5)])
+        jobs = monitor.load_jobs(['submit'])
+        read_files = list()
+        read_description = monitor.read_description
+        monitor.read_description = lambda job_file: \
+            read_files.append(job_file) or read_description(job_file)
+        # Nothing changed, jobs are served from the index.
+        self.assertEquals(len(monitor.load_jobs(['submit'])), 5)
+        self.assertEquals(read_files, [])
+        # Changes which are not saved do not leak into the index.
+        command = jobs[1].info['command']
+        jobs[1].info['command'] = 'changed'
+        jobs[1].status = 'run'
+        job = [job for job in monitor.load_jobs(['submit'])
+               if job.id == jobs[1].id][0]
+        self.assertEquals(job.info['command'], command)
+        self.assertEquals(job.status, 'submit')
+        self.assertFalse(job is jobs[1])
+        jobs[1].status = 'submit'
+        monitor.change_status(jobs[0], 'pending')
+        self.assertEquals(len(monitor.load_jobs(['submit'])), 4)
+        self.assertEquals(monitor.load_jobs(['pending'])[0].id, jobs[0].id)
+
+    def testResultStore(self):
+        scheduler = self.create_scheduler()
+        monitor = scheduler.monitor
+        scheduler.submit_many(['echo 1'])
+        job = monitor.load_jobs(['submit'])[0]
+        scheduler.complete_job(job, JobResult(False, output=['1'] * 1000))
+        job_file = os.path.join(self.folder, 'done', monitor.get_job_file(1))
+        self.assertTrue(os.path.getsize(job_file) < 1000)
+        job = monitor.load_jobs(['done'])[0]
+        self.assertEquals(len(job.result.output), 1000)
+        self.assertFalse(job.result.has_failed)
+
+    def testCompactJob(self):
+        scheduler = self.create_scheduler()
+        monitor = scheduler.monitor
+        scheduler.submit_many(['echo %d' % num for num in range(2)])
+        first, second = monitor.load_jobs(['submit'])
+        self.assertFalse(hasattr(first, '__dict__'))
+        self.assertTrue(first.status is second.status)
+        self.assertTrue(first.batch_name is second.batch_name)
+        # Info is decoded on first access only.
+        self.assertEquals(first.info['command'].split()[0], 'echo')
+        description = monitor.describe_job(second)
+        self.assertEquals(description['info_json'], second.get_info_json())
+        # Defaults are not shared between jobs.
+        first.file_attachments['a'] = 'b'
+        self.assertEquals(monitor.new_job('echo').file_attachments, {})
+        self.assertEquals(JobResult(False).details, {})
+
+    def testInternedStringsBound(self):
+        max_interned = schedule.MAX_INTERNED_STRINGS
+        schedule.MAX_INTERNED_STRINGS = 10
+        try:
+            jobs = [Job(num, u'batch_%d' % num) for num in range(25)]
+            self.assertTrue(len(schedule.interned_strings) <= 10)
+            self.assertEquals(jobs[0].batch_name, 'batch_0')
+            self.assertTrue(Job(30, u'batch_24').batch_name
+                            is jobs[24].batch_name)
+        finally:
+            schedule.MAX_INTERNED_STRINGS = max_interned
+
+
+if __name__ == "__main__":
+    unittest.main()
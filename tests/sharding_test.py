@@ -0,0 +1,82 @@
+import unittest
+import tempfile
+import os
+import shutil
+from plato.schedule import (Scheduler, Monitor, JobRunner)
+from plato.schedule.sharding import ShardLayout, reshard_state_path
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def create_scheduler(self, levels):
+        runner = JobRunner(os.path.join(self.folder, 'reports'),
+                           os.path.join(self.folder, 'attachments'))
+        monitor = Monitor(self.folder, 'TEST', is_interactive=True)
+        monitor.layout = runner.layout = ShardLayout(levels)
+        return Scheduler(runner, monitor)
+
+    def testLayout(self):
+        layout = ShardLayout(2)
+        self.assertEquals(layout.get_path('/tmp', 12, 'TEST_12.st'),
+                          '/tmp/c2/0a/TEST_12.st')
+        self.assertEquals(ShardLayout().get_path('/tmp', 12, 'TEST_12.st'),
+                          '/tmp/TEST_12.st')
+        self.assertRaises(ValueError, ShardLayout, 5)
+
+    def testShardedMonitor(self):
+        scheduler = self.create_scheduler(2)
+        monitor = scheduler.monitor
+        scheduler.submit_many(['echo %d' % num for num in range(20)])
+        job_file = os.path.join(self.folder, 'submit', 'c2', '0a',
+                                monitor.get_job_file(12))
+        self.assertTrue(os.path.exists(job_file))
+        jobs = monitor.load_jobs(['submit'])
+        self.assertEquals(sorted(job.id for job in jobs), range(1, 21))
+        monitor.change_status(jobs[0], 'pending')
+        self.assertEquals(len(monitor.load_jobs(['submit'])), 19)
+        self.assertEquals(len(monitor.load_jobs(['pending'])), 1)
+
+    def testUnchangedShardsNotListed(self):
+        scheduler = self.create_scheduler(2)
+        monitor = scheduler.monitor
+        monitor.index.racy_secs = 0
+        scheduler.submit_many(['echo %d' % num for num in range(20)])
+        jobs = monitor.load_jobs(['submit'])
+        listed = list()
+        listdir = os.listdir
+        os.listdir = lambda folder: listed.append(folder) or listdir(folder)
+        try:
+            self.assertEquals(len(monitor.load_jobs(['submit'])), 20)
+            self.assertEquals(listed, [])
+            monitor.change_status(jobs[0], 'pending')
+            self.assertEquals(len(monitor.load_jobs(['submit'])), 19)
+            # Only the shard folder of the job and its parents
+            self.assertTrue(0 < len(listed) <= 3)
+        finally:
+            os.listdir = listdir
+
+    def testReshard(self):
+        scheduler = self.create_scheduler(0)
+        scheduler.submit_many(['echo %d' % num for num in range(20)])
+        # Monitor of the running daemon keeps the old layout.
+        monitor = scheduler.monitor
+        layout = ShardLayout(1)
+        count = reshard_state_path(self.folder, layout, 'TEST')
+        self.assertEquals(count, 20)
+        self.assertEquals(reshard_state_path(self.folder, layout, 'TEST'), 0)
+        jobs = monitor.load_jobs(['submit'])
+        self.assertEquals(len(jobs), 20)
+        for job in jobs:
+            monitor.change_status(job, 'pending')
+        self.assertEquals(len(monitor.load_jobs(['pending'])), 20)
+        self.assertEquals(len(monitor.load_jobs(['submit'])), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
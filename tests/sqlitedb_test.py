@@ -0,0 +1,64 @@
+import unittest
+import tempfile
+import shutil
+from plato.schedule import Monitor, JobResult
+from plato.schedule.sqlitedb import (SqliteMonitor, migrate_state_path)
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.monitor = SqliteMonitor(self.folder, 'TEST', is_interactive=True)
+        self.monitor.init_db()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def testJobLifecycle(self):
+        job = self.monitor.new_job('batch')
+        self.assertEquals(job.id, 1)
+        self.assertFalse(job.is_attached)
+        job.info = {'command': 'echo 1'}
+        self.monitor.attach_job(job)
+        jobs = self.monitor.load_jobs(['submit'])
+        self.assertEquals(len(jobs), 1)
+        self.assertEquals(jobs[0].info['command'], 'echo 1')
+        # Move to another status.
+        job.result = JobResult(False, output='1')
+        self.monitor.change_status(job, 'done')
+        self.assertEquals(len(self.monitor.load_jobs(['submit'])), 0)
+        jobs = self.monitor.load_jobs(['done'])
+        self.assertEquals(jobs[0].result.output, '1')
+        self.monitor.detach_job(job)
+        self.assertEquals(len(self.monitor.load_jobs()), 0)
+        self.assertEquals(self.monitor.new_job('batch').id, 2)
+
+    def testChangeStatuses(self):
+        jobs = [self.monitor.new_job('batch') for index in range(3)]
+        self.monitor.attach_jobs(jobs)
+        self.monitor.change_statuses(jobs[:2], 'cancelled')
+        self.assertEquals([job.id for job
+                           in self.monitor.load_jobs(['cancelled'])], [1, 2])
+        self.assertEquals([job.id for job
+                           in self.monitor.load_jobs(['submit'])], [3])
+
+    def testMigrate(self):
+        source_folder = tempfile.mkdtemp()
+        try:
+            source = Monitor(source_folder, 'TEST', is_interactive=True)
+            source.init_db()
+            for num in range(5):
+                job = source.new_job('batch')
+                job.info = {'command': 'echo %d' % num}
+                source.attach_job(job)
+            count = migrate_state_path(source_folder, self.monitor)
+        finally:
+            shutil.rmtree(source_folder)
+        self.assertEquals(count, 5)
+        self.assertEquals(len(self.monitor.load_jobs(['submit'])), 5)
+        self.assertEquals(self.monitor.new_job('batch').id, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
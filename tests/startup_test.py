@@ -0,0 +1,46 @@
+import unittest
+import tempfile
+import os
+import sys
+import shutil
+import subprocess
+
+
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Load the command line as it does before parsing arguments, connect a
+# client, and print the modules which have been imported by then.
+STARTUP = '''
+import imp, sys
+cli = imp.load_source('plato_cli', %r)
+cli.Backend()
+print ' '.join(sys.modules)
+''' % os.path.join(ROOT_PATH, 'bin', 'plato')
+# Needed only by the daemon or to work without one
+HEAVY_MODULES = ('plato.schedule', 'plato.commands', 'multiprocessing',
+                 'sqlite3', 'daemon', 'daemoncxt', 'sh', 'lockfile')
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.home)
+
+    def testStartupImportsNoScheduler(self):
+        env = dict(os.environ, HOME=self.home,
+                   PYTHONPATH=os.path.join(ROOT_PATH, 'src'))
+        process = subprocess.Popen([sys.executable, '-c', STARTUP], env=env,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        output, errors = process.communicate()
+        self.assertEquals(process.returncode, 0, errors)
+        modules = set(output.split())
+        self.assertTrue('plato.application' in modules)
+        for name in HEAVY_MODULES:
+            self.assertFalse(name in modules, name + ' is imported')
+
+
+if __name__ == '__main__':
+    unittest.main()
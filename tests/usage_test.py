@@ -0,0 +1,42 @@
+import unittest
+from plato.schedule import Job
+from plato.schedule.usage import (parse_lsf_usage, parse_lsf_exit_code,
+    parse_local_usage, format_usage, summarize)
+
+
+LSF_SUMMARY = '''
+    CPU time   :      2.45 sec.
+    Max Memory :         3 MB
+    Average Memory :     3.00 MB
+    Max Processes : 1
+    Run time : 12 sec.
+'''.split('\n')
+
+
+class Test(unittest.TestCase):
+
+    def testLsfUsage(self):
+        usage = parse_lsf_usage(LSF_SUMMARY)
+        self.assertEquals(usage, {'cpu_time': 2.45, 'wall_time': 12.0,
+                                  'max_rss': 3 * 1024 ** 2})
+        self.assertEquals(parse_lsf_exit_code('Successfully completed.'), 0)
+        self.assertEquals(parse_lsf_exit_code('Exited with exit code 2.'), 2)
+        self.assertEquals(parse_lsf_exit_code('Your job looked like:'), None)
+
+    def testLocalUsage(self):
+        usage = {'exit_code': -9, 'wall_time': 0.5, 'max_rss': 4096}
+        self.assertEquals(parse_local_usage(format_usage(usage)), usage)
+
+    def testSummarize(self):
+        jobs = [Job(num, 'echo', info={'usage': {
+            'exit_code': num % 2, 'wall_time': 1.5, 'max_rss': num}})
+            for num in range(1, 5)]
+        summary = summarize(jobs)['echo']
+        self.assertEquals(summary['jobs'], 4)
+        self.assertEquals(summary['failed'], 2)
+        self.assertEquals(summary['total_wall_time'], 6.0)
+        self.assertEquals(summary['max_max_rss'], 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
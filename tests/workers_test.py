@@ -0,0 +1,99 @@
+import unittest
+import tempfile
+import os
+import shutil
+import time
+from StringIO import StringIO
+from plato.schedule.workers import WorkerPool, CappedCapture
+
+
+class Test(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def wait_done(self, pool, job_ids, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if all(pool.get_state(job_id) == 'done' for job_id in job_ids):
+                return True
+            time.sleep(0.01)
+        return False
+
+    def testPool(self):
+        pool = WorkerPool(2)
+        reports = dict()
+        for job_id in range(1, 6):
+            reports[job_id] = os.path.join(self.folder, 'report.%d' % job_id)
+            pool.submit(job_id, 'echo %d' % job_id, reports[job_id])
+        self.assertEquals(len(pool.workers), 2)
+        self.assertTrue(self.wait_done(pool, reports.keys()))
+        pool.close()
+        for job_id, report_filename in reports.iteritems():
+            report = open(report_filename).read()
+            self.assertTrue('Successfully completed.' in report)
+            self.assertTrue('Process output was:\n%d\n' % job_id in report)
+        pool.forget(1)
+        self.assertEquals(pool.get_state(1), None)
+
+    def testFailedCommand(self):
+        pool = WorkerPool(1)
+        report_filename = os.path.join(self.folder, 'report.1')
+        pool.submit(1, '/nonexistent/command', report_filename)
+        self.assertTrue(self.wait_done(pool, [1]))
+        pool.close()
+        self.assertTrue('Job failed with an error' in
+                        open(report_filename).read())
+
+    def testNonZeroExitCode(self):
+        pool = WorkerPool(1)
+        report_filename = os.path.join(self.folder, 'report.1')
+        pool.submit(1, 'false', report_filename)
+        self.assertTrue(self.wait_done(pool, [1]))
+        pool.close()
+        report = open(report_filename).read()
+        self.assertTrue('Job failed with an error: Exited with exit code 1.'
+                        in report)
+        self.assertFalse('Successfully completed.' in report)
+        self.assertEquals(pool.pop_finished()[1]['exit_code'], 1)
+
+    def testOutputCap(self):
+        pool = WorkerPool(1, output_cap=1000)
+        report_filename = os.path.join(self.folder, 'report.1')
+        pool.submit(1, 'seq 1 100000', report_filename)
+        self.assertTrue(self.wait_done(pool, [1]))
+        pool.close()
+        report = open(report_filename).read()
+        self.assertTrue(len(report) < 2000)
+        self.assertTrue('bytes skipped' in report)
+        self.assertTrue('\n1\n2\n' in report)
+        self.assertTrue('99999\n100000\n' in report)
+        self.assertEquals(os.listdir(self.folder), ['report.1'])
+
+    def testCappedCapture(self):
+        capture_file = StringIO()
+        capture = CappedCapture(capture_file, cap=100)
+        for num in range(1000):
+            capture.write('%04d\n' % num)
+            # Only the head is written while the job runs.
+            self.assertTrue(len(capture_file.getvalue()) <= 50)
+        capture.finish()
+        output = capture_file.getvalue()
+        self.assertTrue(output.startswith('0000\n0001\n'))
+        self.assertTrue('[4900 bytes skipped]' in output)
+        self.assertTrue(output.endswith('0998\n0999\n'))
+        self.assertEquals(len(output.split('...')[-1]), 51)
+        # Output below the cap is kept whole.
+        capture_file = StringIO()
+        capture = CappedCapture(capture_file, cap=100)
+        capture.write('a' * 30)
+        capture.write('b' * 40)
+        capture.finish()
+        self.assertEquals(capture_file.getvalue(), 'a' * 30 + 'b' * 40)
+
+
+if __name__ == "__main__":
+    unittest.main()